@@ -1,3 +1,4 @@
+import os
 import pytest
 from magma import clear_cachedFunctions
 import magma
@@ -12,7 +13,19 @@ def kratos_test():
 def pytest_addoption(parser):
     parser.addoption('--longrun', action='store_true', dest="longrun",
                      default=False, help="enable longrun decorated tests")
+    parser.addoption('--rebuild', action='store_true', dest="rebuild",
+                     default=False, help="rebuild cached Verilator simulators (see xgcd_sim.py)")
 
 def pytest_configure(config):
     if not config.option.longrun:
-        setattr(config.option, 'markexpr', 'not longrun')
\ No newline at end of file
+        setattr(config.option, 'markexpr', 'not longrun')
+    if config.option.rebuild:
+        os.environ["XGCD_SIM_REBUILD"] = "1"
+
+def pytest_terminal_summary(terminalreporter):
+    from xgcd.utils.tests_helper.xgcd_sim import latency_reports, format_latency_report
+    reports = latency_reports()
+    if reports:
+        terminalreporter.section("XGCD hardware latency")
+        for (config, constant_time), report in reports.items():
+            terminalreporter.write_line(format_latency_report(config, constant_time, report))
@@ -27,6 +27,10 @@ setup(
         "mflowgen==0.4.0",
         "gnureadline==8.1.2"
     ],
+    extras_require={
+        # optional big integer backend for the functional models
+        "gmpy2": ["gmpy2"]
+    },
     python_requires='>=3.7',
     long_description=long_description,
     long_description_content_type="text/markdown"
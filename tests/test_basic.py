@@ -50,6 +50,28 @@ def test_xgcd(bit_length,
                    use_external=use_external)
 
 
+@pytest.mark.parametrize("bit_length", [255, 1024])
+@pytest.mark.parametrize("shift_factor_a, shift_factor_b, shift_factor_b_odd", [(2, 2, 4), (4, 4, 4), (8, 8, 4), (4, 4, 8)])
+@pytest.mark.parametrize("A, B", numbers)
+def test_xgcd_deferred_halving(bit_length,
+                               A,
+                               B,
+                               shift_factor_a,
+                               shift_factor_b,
+                               shift_factor_b_odd):
+
+    xgcd_test_core(bit_length=bit_length,
+                   dw_path=dw_path,
+                   A=A,
+                   B=B,
+                   shift_factor_a=shift_factor_a,
+                   shift_factor_b=shift_factor_b,
+                   shift_factor_b_odd=shift_factor_b_odd,
+                   constant_time=0,
+                   constant_time_support=False,
+                   deferred_halving=True)
+
+
 if __name__ == "__main__":
     # Used to debug specific test cases (without pytest)
     print(f"Test parameters: bit_length {bit_length}, use_seed {use_seed}")
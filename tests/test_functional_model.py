@@ -0,0 +1,757 @@
+import asyncio
+import csv
+import json
+import math
+import os
+import pytest
+import random
+
+from xgcd.functional_models.xgcd_model import xgcd_model, main_testing
+from xgcd.functional_models.xgcd_helper import bezout_table, update_a_b_even, update_a_b_odd, inverse_mod_pow2
+from xgcd.functional_models.xgcd_model_fast import xgcd_model_fast, xgcd_iterations
+from xgcd.functional_models.xgcd_model_jump import xgcd_model_jump
+from xgcd.functional_models.xgcd_model_batch import xgcd_model_batch
+from xgcd.functional_models.xgcd_model_iter import xgcd_model_iter
+from xgcd.functional_models.xgcd_case_trace import CaseTrace, read_case_trace
+from xgcd.functional_models.xgcd_csa_emulator import *
+from xgcd.functional_models.xgcd_control_model import control_timing, xgcd_control_timing
+from xgcd.functional_models.xgcd_benchmark import import_time, light_modules
+from xgcd.functional_models.xgcd_model_many import xgcd_model_many, write_xgcd_model_many, read_xgcd_model_many, words_to_ints
+from xgcd.functional_models.xgcd_model_deferred import xgcd_model_deferred, remove_scale, deferred_widths, deferred_adversarial_inputs
+from xgcd.functional_models.xgcd_policy import DeltaPolicy, BitLengthPolicy, ThresholdPolicy, SaturatingDeltaPolicy, compare_policies
+from xgcd.functional_models.xgcd_model_alt import algorithms, safegcd_iterations, binary_xgcd_iterations, pornin_iterations
+from xgcd.functional_models.xgcd_widths import WidthStats, xgcd_model_widths, recommend_widths, signed_width, width_sweep
+from xgcd.utils.tests_helper.generate_random_inputs import generate_random_inputs
+from xgcd.utils.tests_helper.xgcd_sim import XGCDConfig, SimResult, VectorResult, prepare_vectors, check_vectors, latency_reports, \
+    generator_sources, evict, lock_build, METADATA
+from xgcd.utils.tests_helper.xgcd_sim_server import serve_xgcd_sim, XGCDSimClient
+
+
+# Test Parameters
+bit_length = 255
+use_seed = True
+num_inputs = 20
+
+numbers = [(1, 1), (3, 5), (5, 3), (16, 11), (11, 16), (12, 18)]
+numbers += generate_random_inputs(bit_length=bit_length,
+                                  use_seed=use_seed,
+                                  num_inputs=num_inputs)
+
+@pytest.mark.parametrize("power", [2, 4, 8])
+def test_bezout_table(power):
+
+    random.seed(power)
+    for (og_a, og_b) in [(3, 5), (1, 1), (7, 9)] + [(2 * random.getrandbits(bit_length) + 1, 2 * random.getrandbits(bit_length) + 1) for i in range(num_inputs)]:
+        table = bezout_table(og_b, og_a)
+        for log_power in [1, 2, 3, 4, 7, 8, 62, bit_length]:
+            assert og_b * inverse_mod_pow2(og_b, 2 ** log_power) % 2 ** log_power == 1
+        for i in range(num_inputs):
+            # u * og_a + l * og_b (the updated a) must be divisible by power
+            u = random.randint(-og_b, og_b)
+            l = (-u * og_a * inverse_mod_pow2(og_b, power)) % power + power * random.randint(-og_a, og_a)
+            a = u * og_a + l * og_b
+
+            assert update_a_b_even([], power, a, u, l, og_b, og_a, False, 1, table) == \
+                update_a_b_even([], power, a, u, l, og_b, og_a, False, 1)
+
+            y = random.randint(-og_b, og_b)
+            n = random.randint(-og_a, og_a)
+            b = y * og_a + n * og_b
+            for sub in [False, True]:
+                # a + b or a - b must be divisible by power
+                y_sub, n_sub, b_sub = (-y, -n, -b) if sub else (y, n, b)
+                u = random.randint(-og_b, og_b) * power - y_sub
+                l = (-(u + y_sub) * og_a * inverse_mod_pow2(og_b, power) - n_sub) % power + power * random.randint(-og_a, og_a)
+                a = u * og_a + l * og_b
+
+                assert update_a_b_odd([], power, a, b, sub, u, l, y, n, og_b, og_a, False, 5, table) == \
+                    update_a_b_odd([], power, a, b, sub, u, l, y, n, og_b, og_a, False, 5)
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", [(2, 4), (4, 4), (8, 4), (4, 8)])
+@pytest.mark.parametrize("constant_time", [True, False])
+@pytest.mark.parametrize("min_pair_bezout", [True, False])
+def test_xgcd_model_fast(reduction_factor_even,
+                         reduction_factor_odd,
+                         constant_time,
+                         min_pair_bezout):
+
+    for (A, B) in numbers:
+        kwargs = dict(bit_length=bit_length,
+                      constant_time=constant_time,
+                      min_pair_bezout=min_pair_bezout,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+
+        expected = xgcd_model(A, B, **kwargs)
+        assert xgcd_model_fast(A, B, record_cases=True, **kwargs) == expected
+        assert xgcd_model_fast(A, B, **kwargs)[:4] == expected[:4]
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", [(2, 4), (4, 4), (8, 4), (4, 8), (4, 2), (8, 8)])
+@pytest.mark.parametrize("constant_time", [True, False])
+def test_xgcd_iterations(reduction_factor_even,
+                         reduction_factor_odd,
+                         constant_time):
+
+    for (A, B) in numbers:
+        kwargs = dict(bit_length=bit_length,
+                      constant_time=constant_time,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+
+        assert xgcd_iterations(A, B, **kwargs) == xgcd_model_fast(A, B, **kwargs)[3]
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", [(2, 4), (4, 4), (8, 4), (4, 8)])
+@pytest.mark.parametrize("constant_time", [True, False])
+@pytest.mark.parametrize("jump_iterations", [1, 7, 62])
+def test_xgcd_model_jump(reduction_factor_even,
+                         reduction_factor_odd,
+                         constant_time,
+                         jump_iterations):
+
+    for (A, B) in numbers:
+        kwargs = dict(bit_length=bit_length,
+                      constant_time=constant_time,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+
+        expected = xgcd_model(A, B, **kwargs)
+        assert xgcd_model_jump(A, B, record_cases=True, jump_iterations=jump_iterations, **kwargs) == expected
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", [(2, 4), (4, 4), (8, 4), (4, 8)])
+@pytest.mark.parametrize("constant_time", [True, False])
+@pytest.mark.parametrize("chunk_size", [7, 1024])
+def test_xgcd_model_batch(reduction_factor_even,
+                          reduction_factor_odd,
+                          constant_time,
+                          chunk_size):
+
+    kwargs = dict(bit_length=bit_length,
+                  constant_time=constant_time,
+                  reduction_factor_even=reduction_factor_even,
+                  reduction_factor_odd=reduction_factor_odd)
+
+    expected = [xgcd_model(A, B, **kwargs)[:4] for (A, B) in numbers]
+    results = xgcd_model_batch(numbers, chunk_size=chunk_size, **kwargs)
+    assert [result[:4] for result in results] == expected
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", [(2, 4), (4, 4), (8, 4), (4, 8)])
+@pytest.mark.parametrize("constant_time", [True, False])
+def test_xgcd_model_iter(reduction_factor_even,
+                         reduction_factor_odd,
+                         constant_time):
+
+    for (A, B) in numbers:
+        kwargs = dict(bit_length=bit_length,
+                      constant_time=constant_time,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+
+        expected = xgcd_model(A, B, **kwargs)
+
+        records = []
+        model_iter = xgcd_model_iter(A, B, record_state=True, **kwargs)
+        try:
+            while True:
+                records.append(next(model_iter))
+        except StopIteration as result:
+            assert result.value == expected[:4]
+
+        # xgcd_model records 5, 6, 7, 8 before 16, 18, 20, 22
+        cases = []
+        for record in records:
+            if record.case in [16, 18, 20, 22]:
+                cases.append(record.case // 2 - 3)
+            cases.append(record.case)
+        assert cases == expected[4]
+        assert [record.iteration for record in records] == list(range(1, expected[3] + 1))
+
+        # stopping early
+        assert len(list(zip(range(3), xgcd_model_iter(A, B, **kwargs)))) == min(3, expected[3])
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", [(2, 4), (8, 4), (4, 8)])
+@pytest.mark.parametrize("constant_time", [True, False])
+@pytest.mark.parametrize("backend", ["int", "gmpy2"])
+def test_backend(reduction_factor_even,
+                 reduction_factor_odd,
+                 constant_time,
+                 backend):
+
+    for (A, B) in numbers:
+        kwargs = dict(bit_length=bit_length,
+                      constant_time=constant_time,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+
+        # falls back to Python ints if gmpy2 is not installed
+        expected = xgcd_model(A, B, min_pair_bezout=not constant_time, **kwargs)
+        assert xgcd_model(A, B, min_pair_bezout=not constant_time, backend=backend, **kwargs) == expected
+        assert xgcd_model_fast(A, B, min_pair_bezout=not constant_time, record_cases=True, backend=backend, **kwargs) == expected
+        assert xgcd_iterations(A, B, backend=backend, **kwargs) == expected[3]
+
+
+@pytest.mark.parametrize("backend", ["int", "gmpy2"])
+def test_backend_environment(monkeypatch, backend):
+
+    monkeypatch.setenv("XGCD_BACKEND", backend)
+    for (A, B) in numbers:
+        assert xgcd_model_fast(A, B, bit_length=bit_length, record_cases=True) == xgcd_model(A, B, bit_length=bit_length, backend="int")
+
+
+@pytest.mark.parametrize("run_length", [True, False])
+def test_case_trace(tmp_path, run_length):
+
+    executions = [xgcd_model(A, B, bit_length=bit_length, constant_time=True, reduction_factor_odd=8)[4] for (A, B) in numbers]
+
+    trace = CaseTrace(run_length=run_length)
+    expected_transitions = {}
+    for cases in executions:
+        trace.append_execution(cases)
+        for (from_case, to_case) in zip(cases, cases[1:]):
+            expected_transitions[(from_case, to_case)] = expected_transitions.get((from_case, to_case), 0) + 1
+
+    assert len(trace) == sum(len(cases) + 1 for cases in executions)
+    assert list(trace.executions()) == executions
+    assert trace.transition_counts() == expected_transitions
+
+    trace.write(tmp_path / "cases.bin")
+    with read_case_trace(tmp_path / "cases.bin") as mapped_trace:
+        assert list(mapped_trace.executions()) == executions
+        assert mapped_trace.transition_counts() == expected_transitions
+    assert mapped_trace.mmap is None and len(mapped_trace) == 0
+
+    CaseTrace().write(tmp_path / "empty.bin")
+    with read_case_trace(tmp_path / "empty.bin") as empty_trace:
+        assert list(empty_trace.executions()) == [] and len(empty_trace) == 0
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", [(16, 4), (8, 16), (32, 32), (64, 2)])
+@pytest.mark.parametrize("constant_time", [True, False])
+def test_generic_reduction_factors(reduction_factor_even,
+                                   reduction_factor_odd,
+                                   constant_time):
+
+    if constant_time and reduction_factor_odd == 2:
+        pytest.skip("constant-time XGCD requires an odd reduction factor of at least 4")
+
+    for (A, B) in numbers:
+        kwargs = dict(bit_length=bit_length,
+                      constant_time=constant_time,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+
+        # xgcd_model asserts gcd and Bezout coefficients are correct
+        expected = xgcd_model(A, B, **kwargs)
+        assert xgcd_iterations(A, B, **kwargs) == expected[3]
+
+        model_iter = xgcd_model_iter(A, B, **kwargs)
+        assert [record.iteration for record in model_iter] == list(range(1, expected[3] + 1))
+
+
+@pytest.mark.parametrize("is_random", [True, False])
+def test_main_testing_workers(capsys, is_random):
+
+    kwargs = dict(bit_length=64,
+                  num_tests=20,
+                  input_bit_length=64,
+                  is_random=is_random,
+                  test_data=[(B, A) for (A, B) in numbers],
+                  shard_size=8)
+
+    summaries = []
+    traces = []
+    for workers in [None, 1, 2]:
+        _, cases = main_testing(workers=workers, collect_cases=True, **kwargs)
+        traces.append(list(cases.executions()))
+        summaries.append(capsys.readouterr().out.split("Summary stats")[1])
+
+    assert all(summary == summaries[0] for summary in summaries)
+    assert all(trace == traces[0] for trace in traces)
+
+
+@pytest.mark.parametrize("results_file", ["results.csv", "results.jsonl"])
+@pytest.mark.parametrize("workers", [None, 2])
+def test_main_testing_results_file(tmp_path, results_file, workers):
+
+    stats, cases = main_testing(bit_length=64,
+                                num_tests=20,
+                                input_bit_length=64,
+                                is_random=False,
+                                test_data=[(B, A) for (A, B) in numbers],
+                                case_trace_file=tmp_path / "cases.bin",
+                                workers=workers,
+                                shard_size=8,
+                                results_file=str(tmp_path / results_file))
+
+    with open(tmp_path / results_file) as f:
+        if results_file.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f]
+        else:
+            rows = list(csv.DictReader(f))
+
+    # (1, 1) is skipped
+    expected = [(i, A, B, xgcd_model(A, B, bit_length=64)) for i, (A, B) in enumerate(numbers) if (A, B) != (1, 1)]
+    assert [int(row["test"]) for row in rows] == [i for (i, A, B, result) in expected]
+    assert [int(row["iterations"]) for row in rows] == [result[3] for (i, A, B, result) in expected]
+    with read_case_trace(tmp_path / "cases.bin") as case_trace:
+        assert list(case_trace.executions()) == [result[4] for (i, A, B, result) in expected]
+
+    # only running aggregates are kept by default, percentiles come from the histogram
+    assert cases is None
+    iterations = sorted(result[3] for (i, A, B, result) in expected)
+    assert stats.count == len(iterations) and stats.max == iterations[-1]
+    assert [stats.percentile(p) for p in [1, 50, 100]] == [iterations[0], iterations[(len(iterations) - 1) // 2], iterations[-1]]
+
+
+# recommended inter_bit_length - bit_length for numbers, the emulator checks each one
+# with an odd reduction factor of at least 4 below
+recommended_margins = {(2, 2): 4, (4, 4): 5, (8, 4): 6, (8, 8): 6, (2, 8): 5, (4, 2): 5}
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", recommended_margins.keys())
+def test_xgcd_model_widths(reduction_factor_even, reduction_factor_odd):
+
+    assert [signed_width(x) for x in [0, 1, -1, 2, -2, 255, -256]] == [1, 2, 1, 3, 2, 9, 9]
+
+    stats = WidthStats()
+    for (A, B) in numbers:
+        kwargs = dict(bit_length=bit_length,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+        assert xgcd_model_widths(A, B, stats, **kwargs) == xgcd_model(A, B, **kwargs)[3]
+
+    inter_bit_length, delta_bit_width = recommend_widths(stats)
+    assert inter_bit_length == bit_length + recommended_margins[(reduction_factor_even, reduction_factor_odd)]
+    # delta fits in 5 signed bits for numbers, inside the default clog2(bit_length) + 1
+    assert delta_bit_width == 5
+
+    # sweep includes adversarial inputs, so widths can only grow
+    sweep = width_sweep(bit_length, 0, [(reduction_factor_even, reduction_factor_odd)])
+    sweep_stats = sweep[(reduction_factor_even, reduction_factor_odd)]
+    sweep_stats.merge(stats)
+    assert recommend_widths(sweep_stats)[0] >= inter_bit_length
+
+
+@pytest.mark.parametrize("DW", [True, False])
+def test_csa_primitives(DW):
+
+    width = 16
+    random.seed(width)
+    # leave room for the largest shift (and a guard bit for the CSA shift)
+    values = [random.randint(-2 ** (width - 6), 2 ** (width - 6)) for i in range(4 * WORD_BITS)]
+    x, y, z = [to_bit_planes(random.sample(values, len(values)), width, 4) for i in range(3)]
+    num_lanes = len(values)
+
+    def value(carry, s):
+        return [csa_value(c, s, width) for (c, s) in zip(from_bit_planes(carry, num_lanes), from_bit_planes(s, num_lanes))]
+
+    expected = [sum(v) for v in zip(*[from_bit_planes(p, num_lanes, signed=True) for p in (x, y, z)])]
+    assert value(*csa(x, y, z, ZERO, DW)) == expected
+
+    carry, s = csa(x, y, z, ZERO, DW)
+    x_value = from_bit_planes(x, num_lanes, signed=True)
+    for is_add in [True, False]:
+        assert value(*csa_4(carry, s, x, z, is_add, DW)) == \
+            [v + (1 if is_add else -1) * (a + c) for (v, a, c) in zip(expected, x_value, from_bit_planes(z, num_lanes, signed=True))]
+
+    # shifting is exact for values divisible by 2^log_power
+    for log_power in [1, 2, 3]:
+        divisible = to_bit_planes([v << log_power for v in values], width, 4)
+        carry, s = csa(divisible, x, to_bit_planes([-v for v in x_value], width, 4), ZERO, DW)
+        assert value(*csa_shift_only(carry, s, log_power)) == values
+
+    assert list(mask_to_lanes(csa_is_zero(carry, s), num_lanes)) == [v == 0 for v in values]
+
+
+# with an odd reduction factor of 2 the hardware keeps delta unchanged on odd
+# updates, so the emulated datapath does not match the functional model
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd",
+                         [factors for factors in recommended_margins if factors[1] >= 4])
+@pytest.mark.parametrize("DW", [True, False])
+def test_csa_emulator(reduction_factor_even, reduction_factor_odd, DW):
+
+    # the hardware expects at least one odd input
+    pairs = [(A, B) for (A, B) in numbers if (A & 1) or (B & 1)]
+    # the recommended width from xgcd_widths (u + 7 * og_b needs bit_length + 6 with an even factor of 8)
+    width = bit_length + recommended_margins[(reduction_factor_even, reduction_factor_odd)]
+    kwargs = dict(bit_length=bit_length,
+                  reduction_factor_even=reduction_factor_even,
+                  reduction_factor_odd=reduction_factor_odd)
+
+    records = [list(xgcd_model_iter(A, B, record_state=True, **kwargs)) for (A, B) in pairs]
+    for iterations, registers in xgcd_csa_emulator_iter(pairs, inter_bit_length=width, DW=DW, **kwargs):
+        if iterations == 0:
+            continue
+        decoded = decode_registers(registers, len(pairs))
+        for i, lane_records in enumerate(records):
+            if iterations <= len(lane_records):
+                record = lane_records[iterations - 1]
+                # the inv_u_ogb_after_lsb_2 flags assume carry[0] = c[0] (handwritten
+                # CSA), so the Bezout coefficients only match without DW01_csa
+                for name in ["a", "b"] if DW else ["a", "b", "u", "l", "y", "n"]:
+                    assert csa_value(decoded[f"{name}_carry"][i], decoded[f"{name}_sum"][i], width) == getattr(record, name)
+                assert decoded["delta"][i] == record.delta
+
+    assert check_csa_emulator(pairs, inter_bit_length=width, DW=DW, **kwargs) == []
+
+
+def test_control_timing():
+
+    # default clock factors, after the testbench's idle cycles: a, b are
+    # sampled after iterations 4, 8, 12, ... and done rises 10 cycles after
+    # the last iteration
+    for zero_iteration, iterations in [(1, 4), (4, 4), (5, 8), (8, 8), (9, 12)]:
+        timing = control_timing(zero_iteration, bit_length=64)
+        assert timing.iterations == iterations
+        assert timing.first_iteration_cycle == 7
+        assert timing.done_cycle == iterations + 10
+        assert timing.total_cycle_count == iterations
+        assert timing.early_done == (1, 9)
+
+    # started right after reset: sampled after iterations 3, 7, 11, ...
+    for zero_iteration, iterations in [(1, 3), (3, 3), (4, 7), (7, 7), (8, 11)]:
+        timing = control_timing(zero_iteration, bit_length=64, idle_before_start=False)
+        assert timing.iterations == iterations
+        assert timing.first_iteration_cycle == 4
+        assert timing.done_cycle == iterations + 7
+        assert timing.early_done == (2, 5)
+
+    # total_cycle_count only counts once done is low, 3 iterations after the
+    # first one, so constant-time runs do 3 more iterations than the model
+    timing = control_timing(None, bit_length=64, constant_time=True)
+    assert timing.iterations == xgcd_model(3, 5, bit_length=64, constant_time=True)[3] + 3
+    assert (timing.done_cycle, timing.total_cycle_count) == (106, 100)
+    timing = control_timing(None, bit_length=64, constant_time=True, idle_before_start=False)
+    assert timing.iterations == xgcd_model(3, 5, bit_length=64, constant_time=True)[3]
+    assert timing.done_cycle == timing.total_cycle_count + 3
+    assert timing.early_done is None
+
+
+# done cycle and total_cycle_count of 64-bit XGCDTop (8/4 reduction factors,
+# handwritten CSA, constant_time_support) simulated with Verilator
+# (xgcd_sim.py), for constant_time 0 and 1
+verilator_timing = [(1, 1, (14, 4), (106, 100)),
+                    (16, 11, (18, 8), (106, 100)),
+                    (2 ** 63 - 1, 3, (94, 84), (106, 100)),
+                    (2 ** 64 - 1, 2 ** 63, (58, 48), (106, 100)),
+                    (5249979065832757499, 7399589115017606512, (82, 72), (106, 100)),
+                    (1164115433906158533, 2175216119781798973, (74, 64), (106, 100)),
+                    (3509319857134187871, 2177846766236628521, (86, 76), (106, 100))]
+
+
+@pytest.mark.parametrize("constant_time", [False, True])
+def test_control_timing_verilator(constant_time):
+
+    for (A, B, cycles, constant_time_cycles) in verilator_timing:
+        timing = xgcd_control_timing(A, B,
+                                     bit_length=64,
+                                     constant_time=constant_time,
+                                     reduction_factor_even=8,
+                                     reduction_factor_odd=4)
+        iterations = xgcd_model(A, B, bit_length=64, constant_time=constant_time,
+                                reduction_factor_even=8, reduction_factor_odd=4)[3]
+        assert (timing.done_cycle, timing.total_cycle_count) == (constant_time_cycles if constant_time else cycles)
+        # the default clock factors sample a, b in step with the model
+        assert timing.iterations == iterations + (3 if constant_time else 0)
+
+
+@pytest.mark.parametrize("start_clock_factor, final_clock_factor", [(2, 4), (2, 2), (4, 8)])
+@pytest.mark.parametrize("constant_time", [False, True])
+def test_xgcd_control_timing(start_clock_factor, final_clock_factor, constant_time):
+
+    for (A, B) in numbers:
+        cycles = xgcd_model(A, B, bit_length=bit_length, constant_time=constant_time)[3]
+        timing = xgcd_control_timing(A, B,
+                                     bit_length=bit_length,
+                                     constant_time=constant_time,
+                                     start_clock_factor=start_clock_factor,
+                                     final_clock_factor=final_clock_factor)
+        if not constant_time and final_clock_factor == 4:
+            # both stop on the first a, b sample after a or b is 0, in step
+            assert timing.iterations == cycles
+        elif not constant_time:
+            # the model samples every 4 iterations
+            assert cycles - 4 < timing.iterations < cycles + final_clock_factor
+        # xgcd_test_core simulates enough cycles for done to rise
+        assert timing.done_cycle <= cycles + start_clock_factor * 2 + final_clock_factor * 2 + 4
+
+
+@pytest.mark.parametrize("algorithm", list(algorithms))
+@pytest.mark.parametrize("constant_time", [False, True])
+def test_alt_models(algorithm, constant_time):
+
+    max_iterations = {"safegcd": safegcd_iterations,
+                      "binary_xgcd": binary_xgcd_iterations,
+                      "pornin": pornin_iterations}[algorithm](bit_length)
+
+    for (A, B) in numbers:
+        gcd, u, l, iterations, cases = algorithms[algorithm](A, B,
+                                                             bit_length=bit_length,
+                                                             constant_time=constant_time,
+                                                             record_cases=True)
+        assert gcd == math.gcd(A, B)
+        assert u * A + l * B == gcd
+        assert len(cases) == iterations
+        if constant_time:
+            assert iterations == max_iterations
+        else:
+            assert iterations <= max_iterations
+
+
+@pytest.mark.parametrize("path", [None, "results.npy", "results.npz"])
+def test_xgcd_model_many(tmp_path, path):
+
+    expected = [xgcd_model(A, B, bit_length=bit_length) for (A, B) in numbers]
+
+    if path is None:
+        # generator input (no len), small chunks
+        results = xgcd_model_many(iter(numbers), bit_length=bit_length, chunk_size=7)
+    else:
+        path = str(tmp_path / path)
+        assert write_xgcd_model_many(path, iter(numbers), bit_length=bit_length, chunk_size=7) == len(numbers)
+        results = read_xgcd_model_many(path)
+
+    assert words_to_ints(results["a"]) == [A for (A, B) in numbers]
+    assert words_to_ints(results["b"]) == [B for (A, B) in numbers]
+    assert words_to_ints(results["gcd"]) == [result[0] for result in expected]
+    assert words_to_ints(results["bezout_a"]) == [result[1] for result in expected]
+    assert words_to_ints(results["bezout_b"]) == [result[2] for result in expected]
+    assert list(results["iterations"]) == [result[3] for result in expected]
+    assert list(results["even_case"][:6]) == [2, 2, 2, 0, 1, 0]
+
+    columns = xgcd_model_many(numbers, bit_length=bit_length, columns=True)
+    assert list(columns["iterations"]) == list(results["iterations"])
+
+
+@pytest.mark.parametrize("module", light_modules)
+def test_import_time(module):
+
+    # the model (and test helper) must import without NumPy, gmpy2 or the
+    # hardware generation packages, e.g. for main_testing worker processes
+    cumulative, loaded = import_time(module)
+    assert loaded == []
+
+
+@pytest.mark.parametrize("constant_time", [False, True])
+def test_policies(constant_time):
+
+    # the default policy is the existing rule, the others still compute
+    # correct results (xgcd_model asserts the gcd and Bezout identity)
+    for (A, B) in numbers:
+        expected = xgcd_model(A, B, bit_length=bit_length, constant_time=constant_time)
+        assert xgcd_model(A, B, bit_length=bit_length, constant_time=constant_time, policy=DeltaPolicy()) == expected
+        assert xgcd_model(A, B, bit_length=bit_length, constant_time=constant_time, policy=SaturatingDeltaPolicy(10)) == expected
+
+        for policy in [BitLengthPolicy(), ThresholdPolicy(1)]:
+            gcd, u, l, iterations, _ = xgcd_model(A, B, bit_length=bit_length, constant_time=constant_time, policy=policy)
+            assert abs(gcd) == abs(expected[0])
+            assert u * A + l * B == abs(gcd)
+            assert iterations <= math.ceil(1.51 * bit_length + 1)
+
+    if not constant_time:
+        with pytest.raises(RuntimeError, match="max_iterations"):
+            xgcd_model(2 ** bit_length - 1, 2 ** (bit_length - 1) + 1, bit_length=bit_length, max_iterations=1)
+
+    results = compare_policies([DeltaPolicy(), BitLengthPolicy()], numbers[:20], bit_length=bit_length)
+    assert results["delta"][2] == 0
+    assert results["bit_length"][0] <= results["delta"][0]
+
+
+class LastDeltaPolicy:
+    # wraps a policy, keeping the last delta it returned
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.delta = 0
+
+    def update_a(self, delta, a, b):
+        return self.policy.update_a(delta, a, b)
+
+    def record(self, delta):
+        self.delta = delta
+        return delta
+
+    def shift_a(self, delta, s):
+        return self.record(self.policy.shift_a(delta, s))
+
+    def shift_b(self, delta, s):
+        return self.record(self.policy.shift_b(delta, s))
+
+    def odd_a(self, delta):
+        return self.record(self.policy.odd_a(delta))
+
+    def odd_b(self, delta):
+        return self.record(self.policy.odd_b(delta))
+
+
+@pytest.mark.parametrize("reduction_factor_even", [2, 4, 8, 16])
+@pytest.mark.parametrize("constant_time", [False, True])
+def test_idle_fast_forward_delta(reduction_factor_even, constant_time):
+
+    # the idle iterations done at once (once a or b is 0) update delta as the
+    # per-iteration loop of xgcd_model_iter does
+    kwargs = dict(bit_length=bit_length,
+                  constant_time=constant_time,
+                  reduction_factor_even=reduction_factor_even,
+                  reduction_factor_odd=4)
+
+    for (A, B) in numbers:
+        records = list(xgcd_model_iter(A, B, **kwargs))
+        policy = LastDeltaPolicy(DeltaPolicy())
+        result = xgcd_model(A, B, policy=policy, **kwargs)
+        assert result[3] == len(records)
+        assert policy.delta == records[-1].delta
+
+        # through the policy: a long constant-time tail saturates delta
+        policy = LastDeltaPolicy(SaturatingDeltaPolicy(4))
+        xgcd_model(A, B, policy=policy, **kwargs)
+        assert policy.delta in [-8, 7] if constant_time else -8 <= policy.delta <= 7
+
+
+@pytest.mark.parametrize("reduction_factor_even, reduction_factor_odd", [(2, 2), (4, 4), (8, 4), (8, 8)])
+def test_deferred_halving(reduction_factor_even, reduction_factor_odd):
+
+    kwargs = dict(bit_length=bit_length,
+                  reduction_factor_even=reduction_factor_even,
+                  reduction_factor_odd=reduction_factor_odd)
+
+    for (A, B) in numbers:
+        gcd, u, l, iterations, _ = xgcd_model(A, B, **kwargs)
+        result = xgcd_model_deferred(A, B, **kwargs)
+
+        assert result.gcd == gcd
+        assert result.iterations == iterations
+        assert result.u * A + result.l * B == abs(gcd)
+        # same Bezout coefficients up to a multiple of (B, -A) / gcd
+        assert (result.u - u) % (B // abs(gcd)) == 0
+        # results fit in the Bezout coefficient outputs
+        assert abs(result.u) < 2 ** bit_length and abs(result.l) < 2 ** bit_length
+
+    # small odd inputs with all-ones inputs reach about 3 * bit_length halvings
+    # and 2 * bit_length coefficient bits, inside the default bezout_bit_length
+    max_scale, max_bits = deferred_widths(deferred_adversarial_inputs(bit_length), **kwargs)
+    assert (max_scale, max_bits) == {(2, 2): (516, 265),
+                                     (4, 4): (767, 514),
+                                     (8, 4): (766, 515),
+                                     (8, 8): (769, 517)}[(reduction_factor_even, reduction_factor_odd)]
+    assert max_bits <= 2 * bit_length + 16
+
+    # one halving at a time is a modular division by 2^scale
+    og_a, og_b = 11, 13
+    u, l = 5 * 2 ** 10 + 3 * og_b, 7 * 2 ** 10 - 3 * og_a
+    u, l = remove_scale(u, l, og_a, og_b, 10)
+    assert u * og_a + l * og_b == 5 * og_a + 7 * og_b
+    assert u % og_b == 5
+    # og_a^-1 mod og_b (og_b is prime)
+    u = pow(og_a, og_b - 2, og_b) * 2 ** 4
+    u, l = remove_scale(u, (2 ** 4 - u * og_a) // og_b, og_a, og_b, 4)
+    assert u * og_a + l * og_b == 1
+
+
+def test_check_vectors():
+
+    # results as the simulator would return them: exact, done one cycle late,
+    # and timed out (done never rose)
+    config = XGCDConfig(48, 8, 8, 4, constant_time_support=False, use_external=False)
+    vectors = [(3, 5, 0), (11, 16, 0), (2 ** 47 - 1, 3, 0)]
+    prepared = prepare_vectors(config, vectors)
+    sim_results = [SimResult(1, timing.done_cycle + late, s, t, timing.total_cycle_count)
+                   for (((s, t, cycles, iterations), timing), late) in zip(prepared[:2], [0, 1])]
+    sim_results.append(SimResult(0, 2 * prepared[2][0][2], 0, 0, 0))
+
+    results = check_vectors(config, vectors, prepared, sim_results)
+    assert [(r.passed, r.cycles_passed) for r in results] == [(True, True), (True, False), (False, False)]
+    # only the vectors that finished are in the latency report
+    report = latency_reports()[(config, 0)]
+    assert report.vectors == 2 and report.cycle_mismatches == 2
+    assert report.max == prepared[1][1].done_cycle + 1
+
+
+class StubSim:
+    # stands in for AsyncXGCDSim without a simulator, with results as large as
+    # the real ones (the inputs as Bezout coefficients)
+
+    async def submit(self, vectors):
+        return [VectorResult(A, B, constant_time, 2400, B, -A, 1, 1210, B, -A, 1200, True, 1200, 1210, 1200, True)
+                for (A, B, constant_time) in vectors]
+
+
+def test_sim_server(tmp_path):
+
+    # a realistic batch of 1024-bit vectors is much longer than the asyncio
+    # default line limit (64 KiB) both ways
+    rng = random.Random(0)
+    vectors = [(rng.getrandbits(1024) | 1, rng.getrandbits(1024), 0) for i in range(200)]
+    path = str(tmp_path / "xgcd_sim.sock")
+
+    async def run():
+        server = await serve_xgcd_sim(StubSim(), path)
+        client = await XGCDSimClient.connect(path)
+        results = await client.submit(vectors)
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+        # a request longer than the server's limit is answered with an error,
+        # and the connection still serves the next batch
+        server = await serve_xgcd_sim(StubSim(), path, limit=2 ** 16)
+        client = await XGCDSimClient.connect(path)
+        with pytest.raises(RuntimeError, match="stream limit"):
+            await client.submit(vectors)
+        small_results = await client.submit(vectors[:2])
+        await client.close()
+        server.close()
+        await server.wait_closed()
+        return results, small_results
+
+    results, small_results = asyncio.run(run())
+    assert len(json.dumps([list(v) for v in vectors])) > 2 ** 16
+    assert [(r.A, r.B, r.constant_time) for r in results] == vectors
+    assert results == asyncio.run(StubSim().submit(vectors))
+    assert small_results == results[:2]
+
+
+def test_generator_sources(tmp_path, monkeypatch):
+
+    # xgcd modules the hardware generators import (also through other xgcd
+    # modules) are part of the cache key, other modules are not
+    files = {"xgcd/__init__.py": "",
+             "xgcd/hardware/__init__.py": "",
+             "xgcd/hardware/top.py": "import math\nfrom kratos import *\nfrom xgcd.utils.helper import width\n",
+             "xgcd/hardware/AhaResetSync.v": "",
+             "xgcd/utils/__init__.py": "",
+             "xgcd/utils/helper.py": "def width(n):\n    import xgcd.utils.other\n",
+             "xgcd/utils/other.py": "",
+             "xgcd/utils/unused.py": ""}
+    for (name, source) in files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(source)
+    monkeypatch.setattr("xgcd.utils.tests_helper.xgcd_sim.PACKAGE_ROOT", str(tmp_path))
+    monkeypatch.setattr("xgcd.utils.tests_helper.xgcd_sim.HARDWARE_PATH", str(tmp_path / "xgcd" / "hardware"))
+
+    assert generator_sources() == sorted(str(tmp_path / name) for name in files if name != "xgcd/utils/unused.py")
+
+
+def test_evict(tmp_path, monkeypatch):
+
+    # builds locked by a process (here, this one) are not removed
+    for name in ["old", "used", "new"]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / METADATA).write_text("{}")
+        (tmp_path / name / "xgcd_sim").write_bytes(bytes(2 ** 20))
+    for (i, name) in enumerate(["old", "used", "new"]):
+        os.utime(tmp_path / name, (i, i))
+    lock = lock_build(str(tmp_path / "used"))
+    monkeypatch.setenv("XGCD_SIM_CACHE_SIZE", "1")
+
+    evict(str(tmp_path), keep=str(tmp_path / "new"))
+    assert sorted(os.listdir(tmp_path)) == ["new", "used"]
+
+    lock.close()
+    evict(str(tmp_path), keep=str(tmp_path / "new"))
+    assert os.listdir(tmp_path) == ["new"]
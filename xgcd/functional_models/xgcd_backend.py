@@ -0,0 +1,41 @@
+import os
+
+
+# Big integer backends for the functional models
+#
+# A backend is the type the inputs are converted to before pre-processing,
+# all arithmetic in the models then uses that type (Python int or gmpy2.mpz).
+# Results are converted back to Python ints, so they are identical for every
+# backend.
+#
+# gmpy2 is optional and only imported the first time it is used, so the
+# models import with the standard library only.
+
+backends = ["int", "gmpy2"]
+
+# gmpy2.mpz once imported (int if gmpy2 is not installed)
+gmpy2_mpz = None
+
+
+def load_gmpy2():
+    global gmpy2_mpz
+    if gmpy2_mpz is None:
+        try:
+            import gmpy2
+            gmpy2_mpz = gmpy2.mpz
+        except ImportError:
+            # fall back to Python ints if gmpy2 is not installed
+            gmpy2_mpz = int
+    return gmpy2_mpz
+
+
+def get_backend(backend=None):
+    # backend: "int", "gmpy2" or None to use the XGCD_BACKEND environment
+    # variable (default: "int")
+    if backend is None:
+        backend = os.environ.get("XGCD_BACKEND", "int")
+
+    assert backend in backends, f"Unknown big integer backend {backend}, use int or gmpy2."
+
+    # transparently fall back to Python ints
+    return load_gmpy2() if backend == "gmpy2" else int
@@ -0,0 +1,203 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+from xgcd.functional_models.xgcd_model import xgcd_model
+from xgcd.functional_models.xgcd_model_fast import xgcd_model_fast
+from xgcd.functional_models.xgcd_model_jump import xgcd_model_jump
+from xgcd.functional_models.xgcd_model_batch import xgcd_model_batch
+from xgcd.functional_models.xgcd_model_alt import algorithms
+from xgcd.functional_models.xgcd_results import percentile
+from xgcd.functional_models.xgcd_backend import backends
+
+
+# engines compared against xgcd_model (all must return identical results)
+engines = {
+    "xgcd_model_fast": xgcd_model_fast,
+    "xgcd_model_jump": xgcd_model_jump,
+}
+
+
+def time_model(model, tests, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for (A, B) in tests:
+        results.append(model(A, B, **kwargs))
+    return time.perf_counter() - start, results
+
+
+def benchmark_engines(bit_lengths,
+                      num_tests,
+                      constant_time=False,
+                      reduction_factor_even=8,
+                      reduction_factor_odd=4):
+
+    print()
+    print(f"{'bits':>6} {'engine':>16} {'time (s)':>10} {'speedup':>8} {'pairs/s':>10}")
+
+    for bit_length in bit_lengths:
+        max_num = 2**bit_length - 1
+        min_num = 2**(bit_length - 1) - 1
+        tests = [(random.randint(min_num, max_num), random.randint(min_num, max_num)) for i in range(num_tests)]
+
+        kwargs = dict(bit_length=bit_length,
+                      constant_time=constant_time,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+
+        ref_time, ref_results = time_model(xgcd_model, tests, **kwargs)
+        print(f"{bit_length:>6} {'xgcd_model':>16} {ref_time:>10.3f} {1:>7.1f}x {num_tests / ref_time:>10.0f}")
+
+        for name, engine in engines.items():
+            engine_time, engine_results = time_model(engine, tests, record_cases=True, **kwargs)
+            assert engine_results == ref_results, f"{name} results differ from xgcd_model"
+            print(f"{bit_length:>6} {name:>16} {engine_time:>10.3f} {ref_time / engine_time:>7.1f}x {num_tests / engine_time:>10.0f}")
+
+        # batch engine runs all tests in lockstep (no case recording)
+        start = time.perf_counter()
+        batch_results = xgcd_model_batch(tests, **kwargs)
+        batch_time = time.perf_counter() - start
+        assert [result[:4] for result in batch_results] == [result[:4] for result in ref_results], \
+            "xgcd_model_batch results differ from xgcd_model"
+        print(f"{bit_length:>6} {'xgcd_model_batch':>16} {batch_time:>10.3f} {ref_time / batch_time:>7.1f}x {num_tests / batch_time:>10.0f}")
+    print()
+
+
+def benchmark_backends(bit_lengths,
+                       num_tests,
+                       constant_time=False,
+                       reduction_factor_even=8,
+                       reduction_factor_odd=4):
+
+    print()
+    print(f"{'bits':>6} {'backend':>8} {'model':>16} {'time (s)':>10} {'speedup':>8}")
+
+    for bit_length in bit_lengths:
+        max_num = 2**bit_length - 1
+        min_num = 2**(bit_length - 1) - 1
+        tests = [(random.randint(min_num, max_num), random.randint(min_num, max_num)) for i in range(num_tests)]
+
+        kwargs = dict(bit_length=bit_length,
+                      constant_time=constant_time,
+                      reduction_factor_even=reduction_factor_even,
+                      reduction_factor_odd=reduction_factor_odd)
+
+        for model in [xgcd_model, xgcd_model_fast]:
+            int_time, int_results = time_model(model, tests, backend="int", **kwargs)
+            print(f"{bit_length:>6} {'int':>8} {model.__name__:>16} {int_time:>10.3f} {1:>7.1f}x")
+
+            for backend in backends:
+                if backend == "int":
+                    continue
+                backend_time, backend_results = time_model(model, tests, backend=backend, **kwargs)
+                assert backend_results == int_results, f"{backend} results differ from int"
+                print(f"{bit_length:>6} {backend:>8} {model.__name__:>16} {backend_time:>10.3f} {int_time / backend_time:>7.1f}x")
+    print()
+
+
+# modules that must import with the standard library only (e.g. in
+# main_testing worker processes), and the packages they must not load
+light_modules = ["xgcd.functional_models.xgcd_model",
+                 "xgcd.functional_models.xgcd_model_fast",
+                 "xgcd.functional_models.xgcd_model_iter",
+                 "xgcd.functional_models.xgcd_model_jump",
+                 "xgcd.utils.tests_helper.xgcd_test_core"]
+heavy_packages = ["numpy", "gmpy2", "kratos", "magma", "fault"]
+
+
+def import_time(module):
+    # imports module in a fresh interpreter with python -X importtime,
+    # returns (cumulative import time in seconds, heavy packages loaded)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([root] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            env=env, capture_output=True, text=True, check=True)
+
+    # lines are "import time: self [us] | cumulative | imported package"
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1]) / 1e6
+    loaded = set(result.stdout.split())
+    return cumulative, [package for package in heavy_packages if package in loaded]
+
+
+def benchmark_import_time(modules=light_modules):
+    print()
+    print(f"{'module':>42} {'import (ms)':>12} {'heavy packages loaded':>24}")
+    for module in modules:
+        cumulative, loaded = import_time(module)
+        print(f"{module:>42} {cumulative * 1000:>12.1f} {', '.join(loaded) if loaded else '-':>24}")
+    print()
+
+
+def benchmark_algorithms(bit_lengths,
+                         num_tests,
+                         constant_time=False,
+                         reduction_factor_even=8,
+                         reduction_factor_odd=4):
+
+    print()
+    print(f"{'bits':>6} {'algorithm':>16} {'mean':>9} {'p50':>6} {'p99':>6} {'max':>6} {'iter/bit':>8} {'time (s)':>10} {'pairs/s':>10}")
+
+    for bit_length in bit_lengths:
+        max_num = 2**bit_length - 1
+        min_num = 2**(bit_length - 1) - 1
+        tests = [(random.randint(min_num, max_num), random.randint(min_num, max_num)) for i in range(num_tests)]
+
+        # xgcd_model_fast returns the same results as xgcd_model
+        models = {f"xgcd ({reduction_factor_even}/{reduction_factor_odd})": (xgcd_model_fast, dict(reduction_factor_even=reduction_factor_even,
+                                                                                                   reduction_factor_odd=reduction_factor_odd))}
+        models.update((name, (model, {})) for name, model in algorithms.items())
+
+        ref_results = None
+        for name, (model, kwargs) in models.items():
+            model_time, results = time_model(model, tests, bit_length=bit_length, constant_time=constant_time, **kwargs)
+            if ref_results is None:
+                ref_results = results
+            # Bezout coefficients differ between algorithms, the gcd does not
+            # (xgcd_model can return -gcd, with the Bezout coefficients negated)
+            assert [abs(result[0]) for result in results] == [abs(result[0]) for result in ref_results], f"{name} gcd differs from xgcd_model"
+            iterations = sorted(result[3] for result in results)
+            mean = sum(iterations) / num_tests
+            print(f"{bit_length:>6} {name:>16} {mean:>9.1f} {percentile(iterations, 50):>6} {percentile(iterations, 99):>6} "
+                  f"{iterations[-1]:>6} {mean / bit_length:>8.3f} {model_time:>10.3f} {num_tests / model_time:>10.0f}")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extended GCD functional model benchmarks")
+    parser.add_argument('--bit_lengths', type=int, nargs="+", default=[255, 512, 1024], help="bit_lengths to benchmark")
+    parser.add_argument('--num_tests', type=int, default=200, help="number of random tests per bit_length")
+    parser.add_argument('--constant_time', default=False, action="store_true", help="constant-time XGCD (worst-case number of iterations)")
+    parser.add_argument('--reduction_factor_even', type=int, default=8, help="Factor of 2 to reduce b by each cycle if even")
+    parser.add_argument('--reduction_factor_odd', type=int, default=4, help="Factor of 2 to reduce b when odd by each cycle if even")
+    parser.add_argument('--backends', default=False, action="store_true", help="compare big integer backends (int, gmpy2) instead of engines")
+    parser.add_argument('--import_time', default=False, action="store_true", help="report the import time of the functional model modules (python -X importtime)")
+    parser.add_argument('--algorithms', default=False, action="store_true", help="compare iterations with other extended GCD algorithms (safegcd, binary, Pornin) instead of engines")
+
+    args = parser.parse_args()
+
+    print("Benchmark Stats: ")
+    print(args)
+
+    random.seed(0)
+
+    if args.import_time:
+        benchmark_import_time()
+    else:
+        if args.algorithms:
+            benchmark = benchmark_algorithms
+        else:
+            benchmark = benchmark_backends if args.backends else benchmark_engines
+        benchmark(bit_lengths=args.bit_lengths,
+                  num_tests=args.num_tests,
+                  constant_time=args.constant_time,
+                  reduction_factor_even=args.reduction_factor_even,
+                  reduction_factor_odd=args.reduction_factor_odd)
@@ -0,0 +1,145 @@
+import mmap
+import os
+from array import array
+
+
+# Compact case transition traces
+#
+# Case ids (see xgcd_model) from many XGCD executions are stored as one byte
+# each in an array('B'), with SEPARATOR between executions so transitions
+# from the end of one execution to the start of the next are not counted.
+#
+# With run_length=True, consecutive repeated case ids are stored as a single
+# (case, count) entry instead, which is much smaller for long runs of the
+# same case (e.g. constant-time executions once a or b is 0).
+
+SEPARATOR = 255
+
+
+class CaseTrace:
+
+    def __init__(self, run_length=False):
+        self.run_length = run_length
+        # case ids (or the case id of each run if run_length)
+        self.cases = array('B')
+        # number of repeats of each case id if run_length
+        self.counts = array('I')
+        # memory-mapped file backing cases (see read_case_trace)
+        self.mmap = None
+
+    def append(self, case):
+        if self.run_length and len(self.cases) > 0 and self.cases[-1] == case and case != SEPARATOR:
+            self.counts[-1] += 1
+        else:
+            self.cases.append(case)
+            if self.run_length:
+                self.counts.append(1)
+
+    def append_execution(self, cases):
+        # cases for one XGCD execution (e.g. cases returned by xgcd_model)
+        if self.run_length:
+            for case in cases:
+                self.append(case)
+        else:
+            self.cases.extend(cases)
+        self.append(SEPARATOR)
+
+    def extend(self, trace):
+        # append all executions from another trace (with the same run_length)
+        assert self.run_length == trace.run_length, "Traces must both be run-length encoded or not."
+        self.cases.extend(trace.cases)
+        self.counts.extend(trace.counts)
+
+    def __len__(self):
+        # number of case ids (including separators)
+        return sum(self.counts) if self.run_length else len(self.cases)
+
+    def nbytes(self):
+        return self.cases.itemsize * len(self.cases) + self.counts.itemsize * len(self.counts)
+
+    def __iter__(self):
+        if self.run_length:
+            for case, count in zip(self.cases, self.counts):
+                for i in range(count):
+                    yield case
+        else:
+            yield from self.cases
+
+    def executions(self):
+        # case ids for each XGCD execution
+        execution = []
+        for case in self:
+            if case == SEPARATOR:
+                yield execution
+                execution = []
+            else:
+                execution.append(case)
+
+    def transitions(self):
+        # yields (from case, to case, count) without decoding the trace,
+        # transitions across executions are skipped
+        prev = SEPARATOR
+        if self.run_length:
+            for case, count in zip(self.cases, self.counts):
+                if prev != SEPARATOR and case != SEPARATOR:
+                    yield prev, case, 1
+                if count > 1:
+                    yield case, case, count - 1
+                prev = case
+        else:
+            for case in self.cases:
+                if prev != SEPARATOR and case != SEPARATOR:
+                    yield prev, case, 1
+                prev = case
+
+    def transition_counts(self):
+        counts = {}
+        for from_case, to_case, count in self.transitions():
+            counts[(from_case, to_case)] = counts.get((from_case, to_case), 0) + count
+        return counts
+
+    def write(self, path):
+        # one byte per case id, so the file can be mmap'd (see read_case_trace)
+        with open(path, "wb") as f:
+            self.tofile(f)
+
+    def tofile(self, f):
+        if self.run_length:
+            for case, count in zip(self.cases, self.counts):
+                f.write(bytes([case]) * count)
+        else:
+            f.write(bytes(self.cases))
+
+    def close(self):
+        # unmaps the file of a trace from read_case_trace (no-op otherwise)
+        if self.mmap is not None:
+            self.cases.release()
+            self.cases = array('B')
+            self.mmap.close()
+            self.mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_execution(f, cases):
+    # streams one XGCD execution to a file opened by the caller, in the same
+    # format as CaseTrace.write
+    f.write(bytes(cases) + bytes([SEPARATOR]))
+
+
+def read_case_trace(path):
+    # read only CaseTrace backed by a memory-mapped file written by
+    # CaseTrace.write, so executions / transitions can be iterated without
+    # loading the whole file (trace.cases can also be passed to numpy.frombuffer)
+    # the trace owns the mapping, use it as a context manager (or call close)
+    # an empty file (no executions) is an empty trace, it cannot be mapped
+    trace = CaseTrace()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            trace.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            trace.cases = memoryview(trace.mmap)
+    return trace
@@ -0,0 +1,258 @@
+import argparse
+import math
+import random
+from collections import namedtuple
+
+from xgcd.functional_models.xgcd_model_iter import xgcd_model_iter
+
+
+# Cycle-accurate model of the XGCDTop control timing
+#
+# xgcd_control_iter steps the XGCDTop control registers one clk cycle at a
+# time, the same way the Verilator testbench (xgcd_harness.cpp) drives the
+# design: after reset, idle cycles (start low) until done is high, then start
+# is high for the first cycle only:
+#
+# - keep_start, internal_start: internal_start is high for the 2 cycles after
+#   start, the Update_a_b / Update_Bezout / delta registers load the inputs
+# - start_counter, final_counter: clog2(clock_factor)-bit counters, the start
+#   and final clocks are the MSB of each counter (or clk if the factor is 0)
+# - og_cycle: PreProcessing register (start clock), high until the start
+#   clock samples internal_start low, og_a2 ... og_b7 are ready after that
+# - termination condition a, b registers (final clock): done_inter is
+#   (a == 0) | (b == 0), or total_cycle_count >= 1.51 * bit_length + 1 for
+#   constant-time runs
+# - done: PostProcessing done_output register (final clock)
+# - total_cycle_count: cleared by internal_start, counts while done is low
+#
+# An iteration (one update of a, b, u, l, y, n and delta) happens every clk
+# cycle that compute = done_inter | og_cycle is low. The datapath is not
+# modeled, only the iteration after which a or b is 0 (zero_iteration), which
+# stays 0 from then on.
+#
+# The divided clocks are generated by registers clocked by clk, so registers
+# on the start and final clocks sample the clk registers updated on the same
+# clk edge (Verilog non-blocking assignment order, as simulated by Verilator).
+# The counters run freely during the idle cycles, so whether loading them at
+# start is a divided clock edge depends on their phase before start. After
+# the testbench's idle cycles, with the default clock factors:
+#
+# - the first iteration is on cycle 7, and the termination condition samples
+#   a, b after iterations 4, 8, 12, ..., in phase with the 4 iteration groups
+#   of xgcd_model, so both run the same number of iterations (a final clock
+#   factor of 2 or 0 samples more often and can stop up to 2 iterations
+#   earlier than xgcd_model)
+# - done is high from the idle cycles until the termination condition samples
+#   the new a, b (see early_done)
+#
+# idle_before_start=False starts right after reset instead (the fault
+# testbench of xgcd_test_core_fault), which shifts the final clock by one
+# cycle: a, b are sampled after iterations 3, 7, 11, ...
+#
+# Cycles are numbered from 1 (the first clk cycle with start high), so
+# done_cycle is the number of cycles to step before done can be checked.
+
+CycleRecord = namedtuple("CycleRecord", ["cycle", "internal_start", "og_cycle", "compute", "done_inter",
+                                         "done", "total_cycle_count", "iterations"])
+
+ControlTiming = namedtuple("ControlTiming", ["iterations", "first_iteration_cycle", "done_cycle",
+                                             "total_cycle_count", "early_done"])
+
+
+class ClockDivider:
+    # start_counter / final_counter in XGCDTop, factor 0 is no divided clock
+
+    def __init__(self, factor):
+        assert factor == 0 or factor >= 2, "Clock factor must be 0 (no divided clock) or at least 2."
+        self.factor = factor
+        self.width = max(1, math.ceil(math.log2(factor))) if factor else 0
+        self.counter = 0
+
+    def step(self, load):
+        # returns True if the divided clock has a rising edge on this clk edge
+        if self.factor == 0:
+            return True
+        prev_msb = self.counter >> (self.width - 1)
+        if load:
+            self.counter = self.factor - 1
+        else:
+            self.counter = (self.counter + 1) % (2 ** self.width)
+        return prev_msb == 0 and (self.counter >> (self.width - 1)) == 1
+
+
+def xgcd_control_iter(zero_iteration,
+                      bit_length=1024,
+                      constant_time=False,
+                      start_clock_factor=2,
+                      final_clock_factor=4,
+                      cycle_count_bit_width=12,
+                      idle_before_start=True,
+                      max_cycles=None):
+    # zero_iteration: first iteration after which a or b is 0 (not used for
+    # constant-time runs), yields one CycleRecord per clk cycle from start
+    # until done is high for the real result (or max_cycles)
+
+    constant_time_cycles = math.ceil(1.51 * bit_length + 1)
+    if max_cycles is None:
+        max_cycles = 2 * (constant_time_cycles if constant_time else zero_iteration) + \
+            4 * (start_clock_factor + final_clock_factor) + 16
+
+    start_divider = ClockDivider(start_clock_factor)
+    final_divider = ClockDivider(final_clock_factor)
+
+    # register values after reset
+    keep_start = internal_start = False
+    total_cycle_count = 0
+    # Update_a_b registers: loaded with the inputs, number of iterations
+    loaded = False
+    iterations = 0
+    og_cycle = False
+    # termination condition a, b registers are 0 after reset
+    tc_zero = True
+    tc_loaded = False
+    done = False
+    done_loaded = False
+
+    # idle cycles are not numbered, the constant_time input is low during them
+    idle = idle_before_start
+    idle_cycles = 0
+
+    def get_done_inter(tc_zero, total_cycle_count):
+        if constant_time and not idle:
+            return total_cycle_count >= constant_time_cycles
+        return tc_zero
+
+    cycle = 0
+    while cycle < max_cycles:
+        if idle:
+            idle_cycles += 1
+            assert idle_cycles <= 4 * (start_clock_factor + final_clock_factor) + 16, "done did not rise after reset"
+        else:
+            cycle += 1
+        start = cycle == 1
+
+        # registers on clk (sample values from before this edge)
+        done_inter = get_done_inter(tc_zero, total_cycle_count)
+        compute = done_inter | og_cycle
+        pre = (internal_start, loaded, iterations, total_cycle_count)
+
+        next_keep_start = start
+        next_internal_start = start | keep_start
+        start_edge = start_divider.step(start)
+        final_edge = final_divider.step(internal_start)
+        if internal_start:
+            next_total_cycle_count = 0
+            loaded, iterations = True, 0
+        else:
+            next_total_cycle_count = total_cycle_count if done else (total_cycle_count + 1) % (2 ** cycle_count_bit_width)
+            if loaded and not compute:
+                iterations += 1
+        keep_start, internal_start = next_keep_start, next_internal_start
+        total_cycle_count = next_total_cycle_count
+
+        # registers on the divided clocks sample the clk registers after
+        # this edge (or before it if they are on clk)
+        if start_edge:
+            sampled_internal_start = pre[0] if start_clock_factor == 0 else internal_start
+            og_cycle = sampled_internal_start
+
+        if final_edge:
+            sampled_loaded, sampled_iterations, sampled_total_cycle_count = \
+                pre[1:] if final_clock_factor == 0 else (loaded, iterations, total_cycle_count)
+            # PostProcessing samples done_inter before the termination condition updates
+            done = get_done_inter(tc_zero, sampled_total_cycle_count)
+            done_loaded = (constant_time and not idle) or tc_loaded
+            tc_loaded = sampled_loaded
+            tc_zero = not sampled_loaded or (not constant_time and sampled_iterations >= zero_iteration)
+
+        if idle:
+            idle = not done
+            continue
+
+        yield CycleRecord(cycle, internal_start, og_cycle, compute, get_done_inter(tc_zero, total_cycle_count),
+                          done, total_cycle_count, iterations)
+
+        if done and done_loaded:
+            return
+
+
+def control_timing(zero_iteration, **kwargs):
+    # ControlTiming for the first iteration after which a or b is 0, kwargs
+    # are passed to xgcd_control_iter
+    first_iteration_cycle = None
+    # first and last cycle that done is high before the real done
+    early_done = None
+    prev_done = False
+    for record in xgcd_control_iter(zero_iteration, **kwargs):
+        if first_iteration_cycle is None and record.iterations == 1:
+            first_iteration_cycle = record.cycle
+        if prev_done and not record.done:
+            early_done = (early_done_start, record.cycle - 1)
+        if record.done and not prev_done:
+            early_done_start = record.cycle
+        prev_done = record.done
+    assert record.done, f"done did not rise within {record.cycle} cycles"
+    return ControlTiming(record.iterations, first_iteration_cycle, record.cycle, record.total_cycle_count, early_done)
+
+
+def xgcd_control_timing(a,
+                        b,
+                        bit_length=1024,
+                        constant_time=False,
+                        reduction_factor_even=4,
+                        reduction_factor_odd=4,
+                        **kwargs):
+    # ControlTiming of XGCDTop for inputs a, b, the iteration after which a
+    # or b is 0 is taken from xgcd_model_iter (the hardware only matches the
+    # model for reduction_factor_odd >= 4, see xgcd_csa_emulator)
+    zero_iteration = None
+    if not constant_time:
+        for record in xgcd_model_iter(a, b,
+                                      bit_length=bit_length,
+                                      reduction_factor_even=reduction_factor_even,
+                                      reduction_factor_odd=reduction_factor_odd,
+                                      record_state=True):
+            if record.a == 0 or record.b == 0:
+                zero_iteration = record.iteration
+                break
+    return control_timing(zero_iteration, bit_length=bit_length, constant_time=constant_time, **kwargs)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="XGCDTop control timing model")
+    parser.add_argument('--bit_length', type=int, default=1024, help="bitwidth for XGCD")
+    parser.add_argument('--num_tests', type=int, default=1000, help="number of random tests")
+    parser.add_argument('--constant_time', default=False, action="store_true", help="(default: False) constant-time XGCD (worst-case number of iterations)")
+    parser.add_argument('--reduction_factor_even', type=int, default=4, help="reduction factor for even cases")
+    parser.add_argument('--reduction_factor_odd', type=int, default=4, help="reduction factor for odd cases")
+    parser.add_argument('--start_clock_factor', type=int, default=2, help="XGCDTop start_clock_factor")
+    parser.add_argument('--final_clock_factor', type=int, default=4, help="XGCDTop final_clock_factor")
+    parser.add_argument('--cycle_count_bit_width', type=int, default=12, help="XGCDTop cycle_count_bit_width")
+    parser.add_argument('--start_after_reset', default=False, action="store_true", help="(default: False) start right after reset (fault testbench) instead of after idle cycles (Verilator testbench)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the random tests")
+    args = parser.parse_args()
+
+    print(args)
+
+    rng = random.Random(args.seed)
+    latencies = {}
+    max_padding = 0
+    for i in range(args.num_tests):
+        A, B = rng.randint(1, 2 ** args.bit_length - 1), rng.randint(1, 2 ** args.bit_length - 1)
+        timing = xgcd_control_timing(A, B,
+                                     bit_length=args.bit_length,
+                                     constant_time=args.constant_time,
+                                     reduction_factor_even=args.reduction_factor_even,
+                                     reduction_factor_odd=args.reduction_factor_odd,
+                                     start_clock_factor=args.start_clock_factor,
+                                     final_clock_factor=args.final_clock_factor,
+                                     cycle_count_bit_width=args.cycle_count_bit_width,
+                                     idle_before_start=not args.start_after_reset)
+        latencies[timing.done_cycle] = latencies.get(timing.done_cycle, 0) + 1
+        max_padding = max(max_padding, timing.done_cycle - timing.iterations)
+
+    total = sum(cycles * count for cycles, count in latencies.items())
+    print(f"Average done cycle: {total / args.num_tests}")
+    print(f"Max done cycle: {max(latencies)}")
+    print(f"Max cycles on top of the iterations: {max_padding}")
@@ -0,0 +1,608 @@
+import argparse
+import math
+import random
+import numpy as np
+
+from xgcd.functional_models.xgcd_model_fast import xgcd_iterations
+
+
+# Bit-sliced, carry-save accurate emulator of the XGCD datapath
+#
+# Reproduces the carry / sum register contents of Update_a_b, the four
+# Update_Bezout instances (u, l, y, n with their UpdateBezoutOdd children) and
+# the delta register in XGCDTop bit for bit, using the same CSA modules as the RTL
+# (DW01_csa, DW01_csa_4, CSAArithRightShift(_4, _8), HalfAdder and
+# DW01_csa_shift_only(_4, _8) in csa.py), one update per iteration (i.e. per
+# cycle where compute is low, see XGCDTop).
+#
+# Values are bit-sliced: a w-bit variable is a (w, num_words) uint64 array of
+# bit planes, where bit j of word i in plane k is bit k of the variable for
+# input (lane) 64 * i + j. Every CSA operation is then a few bitwise
+# operations on whole planes, and shifts only move planes, so all lanes are
+# updated together without any carry propagation. 1-bit registers (e.g.
+# a_after_lsb) are (num_words,) masks.
+#
+# The Bezout registers are named after the instance (u_carry, l_sum, ...),
+# with the per-instance inv_u_ogb_after_lsb flags as e.g. l_inv_ogb_after_lsb_2
+# and the u_after_lsb flags of the u and y instances as u_after_lsb, y_after_lsb
+# (l and n use the flags of u and y).
+
+WORD_BITS = 64
+ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+ZERO = np.uint64(0)
+
+
+def to_bit_planes(values, width, num_words):
+    # values are taken mod 2^width (two's complement for negative values)
+    num_bytes = (width + 7) // 8
+    mask = (1 << width) - 1
+    data = b"".join((v & mask).to_bytes(num_bytes, "little") for v in values)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(len(values), num_bytes), axis=1, bitorder="little")
+    lanes = np.zeros((num_words * WORD_BITS, width), dtype=np.uint8)
+    lanes[:len(values)] = bits[:, :width]
+    planes = np.packbits(lanes.T, axis=1, bitorder="little")
+    return np.ascontiguousarray(planes).view("<u8").astype(np.uint64)
+
+
+def from_bit_planes(planes, num_lanes, signed=False):
+    width = planes.shape[0]
+    bits = np.unpackbits(planes.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+    data = np.packbits(bits[:, :num_lanes].T, axis=1, bitorder="little")
+    values = [int.from_bytes(row.tobytes(), "little") for row in data]
+    if signed:
+        values = [v - (1 << width) if v >> (width - 1) else v for v in values]
+    return values
+
+
+def mask_to_lanes(mask, num_lanes):
+    # (num_words,) mask to a bool per lane
+    return np.unpackbits(mask.astype("<u8").view(np.uint8), bitorder="little")[:num_lanes].astype(bool)
+
+
+def mux(select, x, y):
+    # select ? x : y for each lane
+    return y ^ ((x ^ y) & select)
+
+
+def csa(a, b, c, ci, DW=True):
+    # DW01_csa: carry + sum = a + b + c + ci (mod 2^width)
+    a_b = a ^ b
+    s = a_b ^ c
+    carry = np.empty_like(a)
+    # majority(a, b, c) shifted left by one
+    np.bitwise_and(a[:-1], b[:-1], out=carry[1:])
+    carry[1:] |= a_b[:-1] & c[:-1]
+    if DW:
+        # DesignWare CSA shifts ci into carry[0]
+        carry[0] = ci
+    else:
+        # handwritten CSA (DW=False) adds ci at bit 0 and passes c[0] to carry[0]
+        carry[0] = c[0]
+        carry[1] = (a[0] & b[0]) | (a_b[0] & ci)
+        s[0] = a_b[0] ^ ci
+    return carry, s
+
+
+def csa_4(a_carry, a_sum, b_carry, b_sum, is_add, DW=True):
+    # DW01_csa_4: (a_carry + a_sum) +/- (b_carry + b_sum)
+    if is_add:
+        ci, b1, c2 = ZERO, b_carry, b_sum
+    else:
+        ci, b1, c2 = ONES, ~b_carry, ~b_sum
+    out_carry, out_sum = csa(a_carry, b1, a_sum, ci, DW)
+    return csa(out_sum, out_carry, c2, ci, DW)
+
+
+def csa_arith_right_shift(carry, s):
+    # CSAArithRightShift
+    xcn, xcn_1, xsn = carry[-1], carry[-2], s[-1]
+    out_carry, out_sum = np.empty_like(carry), np.empty_like(s)
+    out_carry[:-2] = carry[1:-1]
+    out_sum[:-2] = s[1:-1]
+    out_carry[-1] = xcn_1 | (xcn ^ xsn)
+    out_sum[-1] = xcn & xsn
+    out_carry[-2] = xcn & xsn
+    out_sum[-2] = xcn | xsn
+    return out_carry, out_sum
+
+
+def csa_arith_right_shift_4(carry, s):
+    # CSAArithRightShift_4 (chain_two_shifts=False)
+    xcn, xcn_1, xsn = carry[-1], carry[-2], s[-1]
+    out_carry, out_sum = np.empty_like(carry), np.empty_like(s)
+    out_carry[:-3] = carry[2:-1]
+    out_sum[:-3] = s[2:-1]
+    out_carry[-1] = xcn | xsn | xcn_1
+    out_sum[-1] = xcn & xcn_1 & xsn
+    out_carry[-2] = xcn & xcn_1 & xsn
+    out_sum[-2] = xcn | xsn | xcn_1
+    out_carry[-3] = xcn & xsn
+    out_sum[-3] = xcn | xsn
+    return out_carry, out_sum
+
+
+def csa_arith_right_shift_8(carry, s):
+    # CSAArithRightShift_8
+    xcn, xcn_1, xsn = carry[-1], carry[-2], s[-1]
+    shifted_carry, shifted_sum = np.empty_like(carry), np.empty_like(s)
+    shifted_carry[:-3] = carry[2:-1]
+    shifted_sum[:-3] = s[2:-1]
+    shifted_carry[-1] = xcn | xsn | xcn_1
+    shifted_sum[-1] = xcn & xcn_1 & xsn
+    shifted_carry[-2] = shifted_sum[-1]
+    shifted_sum[-2] = shifted_carry[-1]
+    shifted_carry[-3] = xcn & xsn
+    shifted_sum[-3] = xcn | xsn
+
+    out_carry, out_sum = np.empty_like(carry), np.empty_like(s)
+    out_carry[-1] = shifted_carry[-1]
+    out_sum[-1] = shifted_sum[-1]
+    out_carry[-2] = shifted_sum[-1]
+    out_sum[-2] = shifted_carry[-1]
+    out_carry[:-2] = shifted_carry[1:-1]
+    out_sum[:-2] = shifted_sum[1:-1]
+    return out_carry, out_sum
+
+
+def half_adder(a, b, cin):
+    # HalfAdder
+    carry = np.empty_like(a)
+    carry[0] = cin
+    np.bitwise_and(a[:-1], b[:-1], out=carry[1:])
+    return carry, a ^ b
+
+
+def csa_shift_only(carry, s, log_power):
+    # DW01_csa_shift_only (log_power 1), _4 (2) and _8 (3), with support_signed
+    if log_power == 1:
+        inter_carry, inter_sum = csa_arith_right_shift(carry, s)
+        cin = carry[0] & s[0]
+    elif log_power == 2:
+        inter_carry, inter_sum = csa_arith_right_shift_4(carry, s)
+        cin = carry[1] | s[1]
+    else:
+        inter_carry, inter_sum = csa_arith_right_shift_8(carry, s)
+        cin = carry[2] | s[2]
+    return half_adder(inter_carry, inter_sum, cin)
+
+
+def csa_is_zero(carry, s):
+    # lanes where carry + sum == 0 (mod 2^width), without carry propagation:
+    # carry + sum == 0 iff carry ^ sum == (carry | sum) << 1
+    shifted = np.empty_like(carry)
+    shifted[0] = ZERO
+    shifted[1:] = (carry | s)[:-1]
+    return ~np.bitwise_or.reduce((carry ^ s) ^ shifted, axis=0)
+
+
+def planes_add(x, y):
+    # ripple-carry x + y (mod 2^width), only used for delta and the start values
+    out = np.empty_like(x)
+    c = np.zeros_like(x[0])
+    for i in range(x.shape[0]):
+        out[i] = x[i] ^ y[i] ^ c
+        c = (x[i] & y[i]) | (c & (x[i] ^ y[i]))
+    return out
+
+
+def const_planes(value, width, select):
+    # value (two's complement) in the lanes of select and 0 elsewhere
+    return np.stack([select if (value >> i) & 1 else np.zeros_like(select) for i in range(width)])
+
+
+def flag(condition):
+    # constant generator parameter as a mask
+    return ONES if condition else ZERO
+
+
+def mux_csa(select, x, y):
+    # mux for (carry, sum) pairs
+    return tuple(mux(select, xi, yi) for (xi, yi) in zip(x, y))
+
+
+def shift_left(x, k):
+    # x << k (mod 2^width)
+    out = np.zeros_like(x)
+    out[k:] = x[:-k]
+    return out
+
+
+def og_multiples(og):
+    # [0, og, 2 * og, ..., 7 * og] (mod 2^width, see og_b2 ... og_b7 in PreProcessing)
+    og2, og4 = shift_left(og, 1), shift_left(og, 2)
+    og3 = planes_add(og, og2)
+    return [np.zeros_like(og), og, og2, og3, og4, planes_add(og, og4), shift_left(og3, 1), planes_add(og3, og4)]
+
+
+def inv_ogb_lsb_2(carry, s, ci):
+    # inv_u_ogb_after_lsb_2 (Update_Bezout) and inv_u_y_ogb_lsb_2
+    # (UpdateBezoutOdd) of x + og_b (x - og_a, ci = 1): bit 1 of carry + sum
+    # inverted, assuming carry[0] is 1 for og_b and 0 for og_a (no bit 0 carry)
+    if ci is ZERO:
+        return carry[1] ^ s[1]
+    return carry[1] & s[1]
+
+
+def update_bezout_odd(u, y, og, ci, sub, u_y_after_lsb, reduction_factor_odd, DW=True):
+    # UpdateBezoutOdd (testing=True): (u +/- y) / 2 or 4, adding og_b (og[1],
+    # og[2] or og[3], complemented with ci = 1 for og_a) to make it divisible
+    u_y = csa_4(*u, *y, not sub, DW)
+    u_y_ogb = csa(*u_y, og[1], ci, DW)
+    if reduction_factor_odd == 2:
+        return mux_csa(u_y_after_lsb, csa_shift_only(*u_y_ogb, 1), csa_shift_only(*u_y, 1))
+
+    inv_u_y_ogb_lsb_2 = inv_ogb_lsb_2(*u_y_ogb, ci)
+    u_y_after_lsb_2_used = csa_is_zero(u_y[0][:2], u_y[1][:2])
+    odd = mux_csa(inv_u_y_ogb_lsb_2, csa_shift_only(*u_y_ogb, 2), csa_shift_only(*csa(*u_y, og[3], ci, DW), 2))
+    even = mux_csa(u_y_after_lsb_2_used, csa_shift_only(*u_y, 2), csa_shift_only(*csa(*u_y, og[2], ci, DW), 2))
+    return mux_csa(u_y_after_lsb, odd, even)
+
+
+def update_bezout_delta(u, y, og, ci, u_y_after_lsb, ab2, ab3, amb3, reduction_factor_odd, DW=True):
+    # u_delta_update_* in the u_l Update_Bezout instances, the y (n) instance
+    # selects the same value through the _out ports
+    if reduction_factor_odd == 2:
+        return update_bezout_odd(u, y, og, ci, True, u_y_after_lsb, reduction_factor_odd, DW)
+
+    add, sub_first = [update_bezout_odd(u, y, og, ci, sub, u_y_after_lsb, reduction_factor_odd, DW)
+                      for sub in [False, True]]
+    if reduction_factor_odd >= 8:
+        # one more divide by 2 (u_delta_update_*_by_2 or *_ogb_by_2)
+        add, sub_first = [mux_csa(select,
+                                  mux_csa(~(x[0][0] ^ x[1][0]), csa_shift_only(*x, 1), csa_shift_only(*csa(*x, og[1], ci, DW), 1)),
+                                  x)
+                          for (select, x) in [(ab3, add), (amb3, sub_first)]]
+    return mux_csa(ab2, add, sub_first)
+
+
+def update_bezout_even(u, u1, u2, u3, inv2, inv3, og, ci, a2, a3, reduction_factor_even, DW=True):
+    # even branch of set_u in Update_Bezout: u / 2, 4 or 8, adding the multiple
+    # of og_b selected by the u_after_lsb and inv_u_ogb_after_lsb flags
+    u_ogb = csa(*u, og[1], ci, DW)
+    new = mux_csa(u1, csa_shift_only(*u_ogb, 1), csa_shift_only(*u, 1))
+
+    if reduction_factor_even >= 4:
+        u_ogb2, u_ogb3 = csa(*u, og[2], ci, DW), csa(*u, og[3], ci, DW)
+        by_4 = mux_csa(~u2 & ~u1, csa_shift_only(*u, 2),
+                       mux_csa(~u1, csa_shift_only(*u_ogb2, 2),
+                               mux_csa(inv2, csa_shift_only(*u_ogb, 2), csa_shift_only(*u_ogb3, 2))))
+        new = mux_csa(~a2, by_4, new)
+
+    if reduction_factor_even >= 8:
+        inv_u_ogb2_lsb_3 = ~((u_ogb2[0][1] | u_ogb2[1][1]) ^ u_ogb2[0][2] ^ u_ogb2[1][2])
+        inv_u_ogb3_lsb_3 = ~((u_ogb3[0][1] | u_ogb3[1][1]) ^ u_ogb3[0][2] ^ u_ogb3[1][2])
+        u_odd = mux_csa(inv3 & inv2, csa_shift_only(*u_ogb, 3),
+                        mux_csa(inv2, csa_shift_only(*csa(*u, og[5], ci, DW), 3),
+                                mux_csa(inv_u_ogb3_lsb_3, csa_shift_only(*u_ogb3, 3),
+                                        csa_shift_only(*csa(*u, og[7], ci, DW), 3))))
+        u_by_2 = mux_csa(inv_u_ogb2_lsb_3, csa_shift_only(*u_ogb2, 3), csa_shift_only(*csa(*u, og[6], ci, DW), 3))
+        by_8 = mux_csa(~u3 & ~u2 & ~u1, csa_shift_only(*u, 3),
+                       mux_csa(~u2 & ~u1, csa_shift_only(*csa(*u, og[4], ci, DW), 3),
+                               mux_csa(~u1, u_by_2, u_odd)))
+        new = mux_csa(~a2 & ~a3, by_8, new)
+
+    return new
+
+
+def xgcd_csa_emulator_iter(pairs,
+                           bit_length=1024,
+                           inter_bit_length=None,
+                           delta_bit_width=None,
+                           constant_time=False,
+                           reduction_factor_even=4,
+                           reduction_factor_odd=4,
+                           DW=True,
+                           max_iterations=None):
+    # generator yielding (iteration, registers) after the start cycle
+    # (iteration 0) and after each update, where registers maps the Update_a_b
+    # register names (and delta) to bit planes; stops once a or b is 0 in
+    # every lane (or after the constant-time number of iterations)
+
+    assert reduction_factor_even in [2, 4, 8] and reduction_factor_odd in [2, 4, 8], \
+        "The hardware supports reduction factors 2, 4 and 8."
+    assert all((A & 1) or (B & 1) for (A, B) in pairs), "The hardware expects at least one odd input."
+
+    inter_bit_length = bit_length + 5 if inter_bit_length is None else inter_bit_length
+    delta_bit_width = max(1, math.ceil(math.log2(bit_length))) + 1 if delta_bit_width is None else delta_bit_width
+    num_words = (len(pairs) + WORD_BITS - 1) // WORD_BITS
+
+    shift_a_8 = shift_b_8 = flag(reduction_factor_even >= 8)
+    shift_a_4 = shift_b_4 = flag(reduction_factor_even >= 4)
+    shift_b_2_odd = flag(reduction_factor_odd == 2)
+    shift_b_8_odd = flag(reduction_factor_odd >= 8)
+
+    # start cycle (internal_start)
+    A = to_bit_planes([A for (A, B) in pairs], inter_bit_length, num_words)
+    B = to_bit_planes([B for (A, B) in pairs], inter_bit_length, num_words)
+    A_B_carry, A_B_sum = csa(A, B, np.zeros_like(A), ZERO, DW)
+    a_even, b_even = ~A[0], ~B[0]
+
+    r = {}
+    r["a_carry"] = mux(a_even, A_B_carry, np.zeros_like(A))
+    r["a_sum"] = mux(a_even, A_B_sum, A)
+    r["b_carry"] = mux(b_even, A_B_carry, np.zeros_like(B))
+    r["b_sum"] = mux(b_even, A_B_sum, B)
+    for name in ["a_after_lsb", "a_after_lsb_2", "a_after_lsb_3", "b_after_lsb", "b_after_lsb_2", "b_after_lsb_3"]:
+        r[name] = np.full(num_words, ONES)
+
+    # 3-bit sums of the start values (see set_ab_signals)
+    other = mux(a_even, B[:3], A[:3])
+    A_B_3 = planes_add(A_B_carry[:3], A_B_sum[:3])
+    ab_3 = mux(a_even | b_even, planes_add(A_B_3, other), planes_add(A[:3], B[:3]))
+    a_minus_b_3 = mux(a_even | b_even, planes_add(A_B_3, planes_add(~other, const_planes(1, 3, ONES))),
+                      planes_add(A[:3], planes_add(~B[:3], const_planes(1, 3, ONES))))
+    r["ab_after_lsb_2"] = mux(a_even | b_even, A_B_carry[1] ^ A_B_sum[1] ^ other[1], A[1] ^ B[1])
+    r["ab_after_lsb_3"] = mux(a_even | b_even, ~(ab_3[0] | ab_3[1] | ab_3[2]), ~((A[1] | B[1]) ^ A[2] ^ B[2]))
+    r["a_minus_b_after_lsb_3"] = ~(a_minus_b_3[0] | a_minus_b_3[1] | a_minus_b_3[2])
+    r["delta"] = np.zeros((delta_bit_width, num_words), dtype=np.uint64)
+
+    # Bezout coefficients (u, l, y, n = 1, 0, 0, 1, see Update_Bezout) and the
+    # multiples of og_b (added to u, y) and og_a (subtracted from l, n)
+    A_B = planes_add(A, B)
+    og_a = mux(a_even, A_B, A)
+    og_b = mux(a_even, B, mux(b_even, A_B, B))
+    og = {"u": (og_multiples(og_b), ZERO), "y": (og_multiples(og_b), ZERO)}
+    og["l"] = og["n"] = ([~x for x in og_multiples(og_a)], ONES)
+    for name, initial in [("u", 1), ("l", 0), ("y", 0), ("n", 1)]:
+        r[f"{name}_carry"] = np.zeros_like(A)
+        r[f"{name}_sum"] = const_planes(initial, inter_bit_length, np.full(num_words, ONES))
+        # inv_u_ogb_after_lsb_2/3 are not reset (unused until a or b is even)
+        r[f"{name}_inv_ogb_after_lsb_2"] = np.full(num_words, ZERO)
+        r[f"{name}_inv_ogb_after_lsb_3"] = np.full(num_words, ZERO)
+    # u_after_lsb flags of the u_y instances (l and n use the flags of u and y)
+    for name, initial in [("u", ONES), ("y", ZERO)]:
+        r[f"{name}_after_lsb"] = np.full(num_words, initial)
+        r[f"{name}_after_lsb_2"] = np.full(num_words, ZERO)
+        r[f"{name}_after_lsb_3"] = np.full(num_words, ZERO)
+    # parity of u + y (u - y) and l + n (l - n) in XGCDTop
+    r["updated_u_y_after_lsb"] = np.full(num_words, ONES)
+    r["updated_l_n_after_lsb"] = np.full(num_words, ONES)
+
+    iterations = 0
+    yield iterations, r
+
+    constant_time_iterations = math.ceil(1.51 * bit_length + 1)
+    # lanes that never reach a or b == 0 (e.g. from a CSA bug) stop here
+    max_iterations = 2 * constant_time_iterations if max_iterations is None else max_iterations
+
+    while iterations < max_iterations:
+        if constant_time:
+            if iterations >= constant_time_iterations:
+                break
+        else:
+            a_zero = csa_is_zero(r["a_carry"][:bit_length], r["a_sum"][:bit_length])
+            b_zero = csa_is_zero(r["b_carry"][:bit_length], r["b_sum"][:bit_length])
+            if not (~(a_zero | b_zero)).any():
+                break
+
+        iterations += 1
+
+        a, b = (r["a_carry"], r["a_sum"]), (r["b_carry"], r["b_sum"])
+        a1, a2, a3 = r["a_after_lsb"], r["a_after_lsb_2"], r["a_after_lsb_3"]
+        b1, b2, b3 = r["b_after_lsb"], r["b_after_lsb_2"], r["b_after_lsb_3"]
+        ab2, ab3, amb3 = r["ab_after_lsb_2"], r["ab_after_lsb_3"], r["a_minus_b_after_lsb_3"]
+        delta_sign = r["delta"][-1]
+
+        # odd update (a +/- b divided by 2, 4 or 8, see Update_a_b_odd)
+        add_preshift = csa_4(*a, *b, True, DW)
+        sub_preshift = csa_4(*a, *b, False, DW)
+        add_by_4 = csa_shift_only(*add_preshift, 2)
+        sub_by_4 = csa_shift_only(*sub_preshift, 2)
+        if reduction_factor_odd == 2:
+            odd_comb = csa_shift_only(*sub_preshift, 1)
+        elif reduction_factor_odd >= 8:
+            add_by_8 = csa_shift_only(*add_preshift, 3)
+            sub_by_8 = csa_shift_only(*sub_by_4, 1)
+            odd_comb = [mux(ab2, mux(ab3, x8, x4), mux(amb3, y8, y4))
+                        for (x8, x4, y8, y4) in zip(add_by_8, add_by_4, sub_by_8, sub_by_4)]
+        else:
+            odd_comb = [mux(ab2, x4, y4) for (x4, y4) in zip(add_by_4, sub_by_4)]
+
+        # even updates
+        a_by_8 = shift_a_8 & ~a3 & ~a2 & ~a1
+        a_by_4 = ~a_by_8 & shift_a_4 & ~a2 & ~a1
+        a_by_2 = ~a_by_8 & ~a_by_4 & ~a1
+        b_by_8 = a1 & shift_b_8 & ~b3 & ~b2 & ~b1
+        b_by_4 = a1 & ~b_by_8 & shift_b_4 & ~b2 & ~b1
+        b_by_2 = a1 & ~b_by_8 & ~b_by_4 & ~b1
+        odd = a1 & b1
+
+        update_a = ~a1 | (b1 & ~delta_sign)
+        update_b = a1 & (~b1 | delta_sign)
+
+        # registers after the update (a_carry_comb etc. where update_a or
+        # update_b is set, the comb values are not stored otherwise)
+        a_new = [mux(odd & ~delta_sign, x, y) for (x, y) in zip(odd_comb, a)]
+        b_new = [mux(odd & delta_sign, x, y) for (x, y) in zip(odd_comb, b)]
+        for log_power, a_select, b_select in [(1, a_by_2, b_by_2), (2, a_by_4, b_by_4), (3, a_by_8, b_by_8)]:
+            if a_select.any():
+                a_shifted = csa_shift_only(*a, log_power)
+                a_new = [mux(a_select, x, y) for (x, y) in zip(a_shifted, a_new)]
+            if b_select.any():
+                b_shifted = csa_shift_only(*b, log_power)
+                b_new = [mux(b_select, x, y) for (x, y) in zip(b_shifted, b_new)]
+
+        new_r = {}
+        new_r["a_carry"], new_r["a_sum"] = a_new
+        new_r["b_carry"], new_r["b_sum"] = b_new
+
+        for name, update, (c, s) in [("a", update_a, a_new), ("b", update_b, b_new)]:
+            new_r[f"{name}_after_lsb"] = mux(update, c[0] ^ s[0], r[f"{name}_after_lsb"])
+            new_r[f"{name}_after_lsb_2"] = mux(update, c[1] ^ s[1] ^ c[0], r[f"{name}_after_lsb_2"])
+            new_r[f"{name}_after_lsb_3"] = mux(update, (c[1] | s[1]) ^ c[2] ^ s[2], r[f"{name}_after_lsb_3"])
+
+        # control signals from the 3 lsbs of the updated a and b
+        a_3 = [x[:3] for x in (new_r["a_carry"], new_r["a_sum"])]
+        b_3 = [x[:3] for x in (new_r["b_carry"], new_r["b_sum"])]
+        ab_carry, ab_sum = csa_4(*a_3, *b_3, True, DW)
+        a_minus_b_carry, a_minus_b_sum = csa_4(*a_3, *b_3, False, DW)
+        new_r["ab_after_lsb_2"] = ~(ab_carry[1] ^ ab_sum[1] ^ ab_carry[0])
+        new_r["ab_after_lsb_3"] = ~((ab_carry[1] | ab_sum[1]) ^ ab_carry[2] ^ ab_sum[2])
+        new_r["a_minus_b_after_lsb_3"] = csa_is_zero(a_minus_b_carry, a_minus_b_sum)
+
+        # update_delta in XGCDTop
+        odd_update = odd & ~shift_b_2_odd
+        odd_by_8 = odd_update & shift_b_8_odd & mux(ab2, ab3, amb3)
+        odd_by_4 = odd_update & ~odd_by_8
+        width = delta_bit_width
+        increment = (const_planes(-3, width, a_by_8) | const_planes(-2, width, a_by_4) | const_planes(-1, width, a_by_2) |
+                     const_planes(3, width, b_by_8) | const_planes(2, width, b_by_4) | const_planes(1, width, b_by_2) |
+                     const_planes(-2, width, odd_by_8 & ~delta_sign) | const_planes(-1, width, odd_by_4 & ~delta_sign) |
+                     const_planes(2, width, odd_by_8 & delta_sign) | const_planes(1, width, odd_by_4 & delta_sign))
+        new_r["delta"] = planes_add(r["delta"], increment)
+
+        # Bezout updates: u, l follow a and y, n follow b (Update_Bezout with
+        # the a and b controls swapped for y, n)
+        for pair, (first, second), lsb in [("u_y", ("u", "y"), r["updated_u_y_after_lsb"]),
+                                           ("l_n", ("l", "n"), r["updated_l_n_after_lsb"])]:
+            og_k, ci = og[first]
+            delta_update = update_bezout_delta((r[f"{first}_carry"], r[f"{first}_sum"]),
+                                               (r[f"{second}_carry"], r[f"{second}_sum"]),
+                                               og_k, ci, lsb, ab2, ab3, amb3, reduction_factor_odd, DW)
+            for name, flags, controls in [(first, "u", (a1, a2, a3, b1, ~delta_sign)),
+                                          (second, "y", (b1, b2, b3, a1, delta_sign))]:
+                x_lsb, x_lsb_2, x_lsb_3, other_lsb, x_delta_sign = controls
+                u = (r[f"{name}_carry"], r[f"{name}_sum"])
+                inv2, inv3 = r[f"{name}_inv_ogb_after_lsb_2"], r[f"{name}_inv_ogb_after_lsb_3"]
+                even = update_bezout_even(u, r[f"{flags}_after_lsb"], r[f"{flags}_after_lsb_2"], r[f"{flags}_after_lsb_3"],
+                                          inv2, inv3, og_k, ci, x_lsb_2, x_lsb_3, reduction_factor_even, DW)
+                update_odd = x_lsb & other_lsb & x_delta_sign
+                update = ~x_lsb | update_odd
+                new_u = mux_csa(~x_lsb, even, mux_csa(update_odd, delta_update, u))
+                new_r[f"{name}_carry"], new_r[f"{name}_sum"] = new_u
+
+                # set_inv_u_ogb_after_lsb_2 / _3 (and set_u_after_lsbs for
+                # the u_y instances) from the 3 lsbs of the updated value
+                c, s = new_u
+                t_carry, t_sum = csa(c[:3], s[:3], og_k[1][:3], ci, DW)
+                new_inv2 = inv_ogb_lsb_2(t_carry, t_sum, ci)
+                new_r[f"{name}_inv_ogb_after_lsb_2"] = mux(update, new_inv2, inv2)
+                new_r[f"{name}_inv_ogb_after_lsb_3"] = mux(update, ~((t_carry[1] | t_sum[1]) ^ t_carry[2] ^ t_sum[2]), inv3)
+                if name == flags:
+                    new_r[f"{name}_after_lsb"] = mux(update, c[0] ^ s[0], r[f"{name}_after_lsb"])
+                    new_r[f"{name}_after_lsb_2"] = mux(update, c[1] ^ s[1] ^ c[0], r[f"{name}_after_lsb_2"])
+                    new_r[f"{name}_after_lsb_3"] = mux(update, (c[1] | s[1]) ^ c[2] ^ s[2], r[f"{name}_after_lsb_3"])
+
+            new_r[f"updated_{pair}_after_lsb"] = (new_r[f"{first}_carry"][0] ^ new_r[f"{first}_sum"][0] ^
+                                                  new_r[f"{second}_carry"][0] ^ new_r[f"{second}_sum"][0])
+
+        r = new_r
+        yield iterations, r
+
+
+def decode_registers(registers, num_lanes):
+    # register contents for each lane as Python ints (carry / sum words are
+    # unsigned as stored, delta is signed)
+    decoded = {}
+    for name, planes in registers.items():
+        if planes.ndim == 1:
+            decoded[name] = [int(x) for x in mask_to_lanes(planes, num_lanes)]
+        else:
+            decoded[name] = from_bit_planes(planes, num_lanes, signed=(name == "delta"))
+    return decoded
+
+
+def csa_value(carry, s, width):
+    # carry + sum as a signed width-bit value
+    value = (carry + s) & ((1 << width) - 1)
+    return value - (1 << width) if value >> (width - 1) else value
+
+
+def xgcd_csa_emulator(pairs,
+                      bit_length=1024,
+                      inter_bit_length=None,
+                      delta_bit_width=None,
+                      constant_time=False,
+                      reduction_factor_even=4,
+                      reduction_factor_odd=4,
+                      DW=True):
+    # returns (a, b, iterations) for each pair, where a, b are the final
+    # carry-save values and iterations is the iteration count of the
+    # functional model (which checks for a or b == 0 every 4 iterations)
+    num_lanes = len(pairs)
+    inter_bit_length = bit_length + 5 if inter_bit_length is None else inter_bit_length
+    first_zero = np.zeros(num_lanes, dtype=np.int64)
+
+    for iterations, registers in xgcd_csa_emulator_iter(pairs,
+                                                        bit_length=bit_length,
+                                                        inter_bit_length=inter_bit_length,
+                                                        delta_bit_width=delta_bit_width,
+                                                        constant_time=constant_time,
+                                                        reduction_factor_even=reduction_factor_even,
+                                                        reduction_factor_odd=reduction_factor_odd,
+                                                        DW=DW):
+        if not constant_time:
+            zero = csa_is_zero(registers["a_carry"][:bit_length], registers["a_sum"][:bit_length]) | \
+                   csa_is_zero(registers["b_carry"][:bit_length], registers["b_sum"][:bit_length])
+            first_zero = np.where((first_zero == 0) & mask_to_lanes(zero, num_lanes), iterations, first_zero)
+
+    if constant_time:
+        lane_iterations = [iterations] * num_lanes
+    else:
+        lane_iterations = [4 * math.ceil(t / 4) for t in first_zero.tolist()]
+
+    a = [csa_value(c, s, inter_bit_length) for (c, s) in zip(from_bit_planes(registers["a_carry"], num_lanes),
+                                                              from_bit_planes(registers["a_sum"], num_lanes))]
+    b = [csa_value(c, s, inter_bit_length) for (c, s) in zip(from_bit_planes(registers["b_carry"], num_lanes),
+                                                              from_bit_planes(registers["b_sum"], num_lanes))]
+    return list(zip(a, b, lane_iterations))
+
+
+def check_csa_emulator(pairs, check_iterations=True, **kwargs):
+    # returns the pairs where the emulated datapath does not produce the gcd
+    # (or the iteration count of the functional model)
+    mismatches = []
+    for (A, B), (a, b, iterations) in zip(pairs, xgcd_csa_emulator(pairs, **kwargs)):
+        if abs(a + b) != math.gcd(A, B) or (a != 0 and b != 0):
+            mismatches.append((A, B))
+        elif check_iterations and iterations != xgcd_iterations(A, B,
+                                                                bit_length=kwargs.get("bit_length", 1024),
+                                                                constant_time=kwargs.get("constant_time", False),
+                                                                reduction_factor_even=kwargs.get("reduction_factor_even", 4),
+                                                                reduction_factor_odd=kwargs.get("reduction_factor_odd", 4)):
+            mismatches.append((A, B))
+    return mismatches
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Bit-sliced carry-save XGCD datapath emulator")
+    parser.add_argument('--bit_length', type=int, default=1024, help="bitwidth for XGCD")
+    parser.add_argument('--num_tests', type=int, default=4096, help="number of random tests")
+    parser.add_argument('--batch_size', type=int, default=4096, help="number of tests emulated together")
+    parser.add_argument('--constant_time', default=False, action="store_true", help="(default: False) constant-time XGCD (worst-case number of iterations)")
+    parser.add_argument('--reduction_factor_even', type=int, default=4, help="Factor of 2 to reduce a or b by each cycle if even")
+    parser.add_argument('--reduction_factor_odd', type=int, default=4, help="Factor of 2 to reduce a or b by each cycle when both are odd")
+    parser.add_argument('--inter_bit_length', type=int, default=None, help="(default: bit_length + 5) width of the a, b registers")
+    parser.add_argument('--delta_bit_width', type=int, default=None, help="(default: clog2(bit_length) + 1) width of the delta register")
+    parser.add_argument('--csa_handwritten', default=False, action="store_true", help="(default: False) emulate the handwritten CSA module instead of the DesignWare CSA module")
+    parser.add_argument('--skip_iterations', default=False, action="store_true", help="(default: False) only check the gcd, not the iteration count of the functional model")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the random tests")
+    args = parser.parse_args()
+
+    print(args)
+
+    rng = random.Random(args.seed)
+    num_mismatches = 0
+    for start in range(0, args.num_tests, args.batch_size):
+        pairs = []
+        for i in range(min(args.batch_size, args.num_tests - start)):
+            A, B = rng.randint(1, 2 ** args.bit_length - 1), rng.randint(1, 2 ** args.bit_length - 1)
+            # at least one input must be odd
+            pairs.append((A, B | 1) if (A & 1) == 0 and (B & 1) == 0 else (A, B))
+
+        mismatches = check_csa_emulator(pairs,
+                                        check_iterations=not args.skip_iterations,
+                                        bit_length=args.bit_length,
+                                        inter_bit_length=args.inter_bit_length,
+                                        delta_bit_width=args.delta_bit_width,
+                                        constant_time=args.constant_time,
+                                        reduction_factor_even=args.reduction_factor_even,
+                                        reduction_factor_odd=args.reduction_factor_odd,
+                                        DW=not args.csa_handwritten)
+        for (A, B) in mismatches:
+            print(f"Mismatch: A = {A}, B = {B}")
+        num_mismatches += len(mismatches)
+        print(f"Tests {start} - {start + len(pairs) - 1}: {len(mismatches)} mismatches")
+
+    print(f"Total mismatches: {num_mismatches} / {args.num_tests}")
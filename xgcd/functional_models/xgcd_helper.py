@@ -10,6 +10,47 @@ class EvenCase(IntEnum):
     BOTH_ODD = 2
 
 
+# case ids for reduction factors above 8 (the hardware supports up to 8)
+# - a (b) divisible by 2^log_power for log_power >= 4: 32 (64) + log_power
+# - a +/- b divisible by 4 and the result divisible by 2^extra (i.e. a +/- b
+#   divisible by 2^(extra + 2)): 5, 6, 7, 8 followed by 16, 18, 20, 22 for
+#   extra = 1 (same as reduction_factor_odd = 8) and 128 + 4 * (extra - 2) +
+#   0, 1, 2, 3 (a add, a sub, b add, b sub) for extra >= 2
+def even_case_id(update_a, log_power):
+    if log_power <= 3:
+        return [2, 1, 9][log_power - 1] if update_a else [4, 3, 10][log_power - 1]
+    return (32 if update_a else 64) + log_power
+
+def odd_extra_case_id(update_a, sub, extra):
+    offset = (0 if update_a else 2) + (1 if sub else 0)
+    if extra == 1:
+        return 16 + 2 * offset
+    return 128 + 4 * (extra - 2) + offset
+
+def log2_reduction_factor(reduction_factor):
+    assert reduction_factor >= 2 and reduction_factor & (reduction_factor - 1) == 0, \
+        f"Reduction factor {reduction_factor} must be a power of 2."
+    # case ids must fit in a byte (see xgcd_case_trace)
+    assert reduction_factor <= 2**32, f"Reduction factor {reduction_factor} must be at most 2^32."
+    return reduction_factor.bit_length() - 1
+
+def trailing_zeros(x, max_zeros):
+    # number of trailing zero bits of x, at most max_zeros (x = 0 has max_zeros)
+    if x == 0:
+        return max_zeros
+    return min((x & -x).bit_length() - 1, max_zeros)
+
+def inverse_mod_pow2(x, power):
+    # x^-1 mod power for odd x and power a power of 2 (pow(x, -1, power) is
+    # Python 3.8+), by Newton iteration: x * x = 1 mod 8 for odd x, and each
+    # step doubles the number of correct low bits
+    inv = x % power
+    bits = 3
+    while bits < power.bit_length() - 1:
+        inv = inv * (2 - x * inv) % power
+        bits *= 2
+    return inv
+
 # helper functions
 def bezout_update(u, l, og_b, og_a, debug_print):
     if u % 2 == 1:
@@ -27,20 +68,85 @@ def bezout_update(u, l, og_b, og_a, debug_print):
         l = l // 2
     return u, l
 
-def update_a_b_even(cases, power, a, u, l, og_b, og_a, debug_print, case):
+def bezout_table(og_b, og_a, max_log_power=3):
+    # built once per input pair (similar to og_b2 ... og_b7 in PreProcessing)
+    # table[log_power][u mod 2^log_power] = (m * og_b, m * og_a), where
+    # m = -u * og_b^-1 mod 2^log_power is the same as the og_b's (og_a's)
+    # added (subtracted) by calling bezout_update log_power times
+    # (the table has 2^(max_log_power + 1) entries, larger divides compute m)
+    table = [(og_b, og_a)]
+    for log_power in range(1, max_log_power + 1):
+        power = 2 ** log_power
+        inv_og_b = inverse_mod_pow2(og_b, power)
+        table.append([(m * og_b, m * og_a) for m in [(-r * inv_og_b) % power for r in range(power)]])
+    return table
+
+def bezout_table_lookup(table, u, log_power):
+    power = 2 ** log_power
+    if log_power < len(table):
+        return table[log_power][u % power]
+    og_b, og_a = table[0]
+    m = (-u * inverse_mod_pow2(og_b, power)) % power
+    return m * og_b, m * og_a
+
+def bezout_div_pow2(u, l, table, log_power):
+    # same as calling bezout_update log_power times
+    if log_power < len(table):
+        m_og_b, m_og_a = table[log_power][u & ((1 << log_power) - 1)]
+    else:
+        m_og_b, m_og_a = bezout_table_lookup(table, u, log_power)
+    return (u + m_og_b) >> log_power, (l - m_og_a) >> log_power
+
+def idle_fast_forward(remaining, a, u, l, y, n, delta, table, log_reduction_factor_even, cases, policy=None):
+    # once a (or b) is 0, every iteration divides it by the even reduction
+    # factor and only u, l (or y, n) change, so the remaining iterations are a
+    # single divide by 2^(remaining * log_reduction_factor_even) modulo og_b, og_a
+    # delta is updated as by each iteration, through policy (see xgcd_policy)
+    # if given, otherwise by the hardware rule (one step per bit shifted)
+    log_power = remaining * log_reduction_factor_even
+    if a == 0:
+        u, l = bezout_div_pow2(u, l, table, log_power)
+    else:
+        y, n = bezout_div_pow2(y, n, table, log_power)
+
+    if policy is None:
+        delta = delta - log_power if a == 0 else delta + log_power
+    else:
+        for i in range(remaining):
+            delta = policy.shift_a(delta, log_reduction_factor_even) if a == 0 else policy.shift_b(delta, log_reduction_factor_even)
+
+    if cases is not None:
+        cases.extend([even_case_id(a == 0, log_reduction_factor_even)] * remaining)
+    return u, l, y, n, delta
+
+def bezout_update_table(u, l, table, log_power, debug_print):
+    power = 2 ** log_power
+    m_og_b, m_og_a = bezout_table_lookup(table, u, log_power)
+    assert (u + m_og_b) % power == 0
+    assert (l - m_og_a) % power == 0
+
+    print_debug(debug_print, "in bezout_update_table ", u, u + m_og_b, (u + m_og_b) // power)
+    print_debug(debug_print, "in bezout_update_table ", l, l - m_og_a, (l - m_og_a) // power)
+
+    return (u + m_og_b) // power, (l - m_og_a) // power
+
+def update_a_b_even(cases, power, a, u, l, og_b, og_a, debug_print, case, table=None):
 
     print_debug(debug_print, f"even update_a_b: case {case}")
 
     a = a // power
     log_power = int(math.log2(power))
 
-    for i in range(log_power):
-        u, l = bezout_update(u, l, og_b, og_a, debug_print)  
+    if table is not None:
+        u, l = bezout_update_table(u, l, table, log_power, debug_print)
+    else:
+        for i in range(log_power):
+            u, l = bezout_update(u, l, og_b, og_a, debug_print)  
     
     cases.append(case)
     return a, u, l
 
-def update_a_b_odd(cases, power, a, b, sub, u, l, y, n, og_b, og_a, debug_print, case):
+def update_a_b_odd(cases, power, a, b, sub, u, l, y, n, og_b, og_a, debug_print, case, table=None):
 
     print_debug(debug_print, f"odd update_a_b: case {case} sub {sub}")
 
@@ -56,9 +162,13 @@ def update_a_b_odd(cases, power, a, b, sub, u, l, y, n, og_b, og_a, debug_print,
 
     print_debug(debug_print, f"odd update_a_b: u, l (after add/sub) {u} {l}", u, l)
 
-    for i in range(log_power):
-        u, l = bezout_update(u, l, og_b, og_a, debug_print)
-        print_debug(debug_print, f"odd update_a_b: u, l (loop divide by 2) {u} {l}")
+    if table is not None:
+        u, l = bezout_update_table(u, l, table, log_power, debug_print)
+        print_debug(debug_print, f"odd update_a_b: u, l (table divide by {power}) {u} {l}")
+    else:
+        for i in range(log_power):
+            u, l = bezout_update(u, l, og_b, og_a, debug_print)
+            print_debug(debug_print, f"odd update_a_b: u, l (loop divide by 2) {u} {l}")
     
     cases.append(case)
     return a, u, l
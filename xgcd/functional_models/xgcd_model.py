@@ -1,10 +1,13 @@
-import argparse
 import math
 import random
-import numpy as np
 
 from xgcd.utils.util import *
 from xgcd.functional_models.xgcd_helper import *
+from xgcd.functional_models.xgcd_model_fast import xgcd_iterations
+from xgcd.functional_models.xgcd_backend import get_backend
+from xgcd.functional_models.xgcd_case_trace import CaseTrace, write_execution
+from xgcd.functional_models.xgcd_results import IterationStats, ResultsWriter
+from xgcd.functional_models.xgcd_policy import DeltaPolicy
 
 
 def xgcd_model(a,
@@ -14,7 +17,15 @@ def xgcd_model(a,
                min_pair_bezout=False,
                reduction_factor_even=4,
                reduction_factor_odd=4,
-               debug_print=False):
+               debug_print=False,
+               backend=None,
+               policy=None,
+               max_iterations=None):
+
+    # policy: update selection (delta) policy, see xgcd_policy (default:
+    # DeltaPolicy, the rule in hardware)
+    # max_iterations: raise RuntimeError instead of looping forever (for
+    # experimental policies)
 
     og_debug_print = debug_print
 
@@ -26,6 +37,10 @@ def xgcd_model(a,
     # inputs to XGCD
     start_a, start_b = a, b
 
+    # big integer type used for all arithmetic (see xgcd_backend)
+    to_backend = get_backend(backend)
+    a, b = to_backend(a), to_backend(b)
+
     # iterations initialization
     iterations = 0
     # for debugging purposes, keep track of the case transitions
@@ -53,8 +68,16 @@ def xgcd_model(a,
     # initialize Bezout coefficient variables
     u, l, y, n = 1, 0, 0, 1
     delta = 0
+    if policy is None:
+        policy = DeltaPolicy()
     # store the odd inputs to iterations (aka a_m, b_m)
     og_a, og_b = a, b
+    # reduction factors can be any power of 2 (hardware supports up to 8)
+    log_reduction_factor_even = log2_reduction_factor(reduction_factor_even)
+    log_reduction_factor_odd = log2_reduction_factor(reduction_factor_odd)
+
+    # multiples of og_b, og_a for dividing Bezout coefficients by 2, 4 or 8 in one step
+    table = bezout_table(og_b, og_a)
 
     if constant_time:
         constant_time_iterations = math.ceil(1.51 * bit_length + 1)
@@ -72,90 +95,117 @@ def xgcd_model(a,
             print_debug(debug_print, f"a {a} b {b} y {y} n {n} u {u} l {l} delta {delta}")
 
             iterations += 1
+            update_a = policy.update_a(delta, a, b)
+
+            # a is divisible by 16 or more (reduction factors above 8 only)
+            if reduction_factor_even > 8 and a % 16 == 0:
+                log_power = trailing_zeros(a, log_reduction_factor_even)
+                a, u, l = update_a_b_even(cases, 2**log_power, a, u, l, og_b, og_a, debug_print, even_case_id(True, log_power), table)
+                delta = policy.shift_a(delta, log_power)
 
             # a is divisible by 8
-            if reduction_factor_even >= 8 and a % 8 == 0:
-                a, u, l = update_a_b_even(cases, 8, a, u, l, og_b, og_a, debug_print, 9)
-                delta = delta - 3
+            elif reduction_factor_even >= 8 and a % 8 == 0:
+                a, u, l = update_a_b_even(cases, 8, a, u, l, og_b, og_a, debug_print, 9, table)
+                delta = policy.shift_a(delta, 3)
 
             # a is divisible by 4 but not by 8
             elif reduction_factor_even >= 4 and a % 4 == 0:
-                a, u, l = update_a_b_even(cases, 4, a, u, l, og_b, og_a, debug_print, 1)
-                delta = delta - 2
+                a, u, l = update_a_b_even(cases, 4, a, u, l, og_b, og_a, debug_print, 1, table)
+                delta = policy.shift_a(delta, 2)
 
             # a is divisible by 2 but not by 4 or 8
             elif a % 2 == 0:
-                a, u, l = update_a_b_even(cases, 2, a, u, l, og_b, og_a, debug_print, 2)
-                delta = delta - 1
+                a, u, l = update_a_b_even(cases, 2, a, u, l, og_b, og_a, debug_print, 2, table)
+                delta = policy.shift_a(delta, 1)
+
+            # b is divisible by 16 or more (reduction factors above 8 only)
+            elif reduction_factor_even > 8 and b % 16 == 0:
+                log_power = trailing_zeros(b, log_reduction_factor_even)
+                b, y, n = update_a_b_even(cases, 2**log_power, b, y, n, og_b, og_a, debug_print, even_case_id(False, log_power), table)
+                delta = policy.shift_b(delta, log_power)
 
             # b is divisible by 8
             elif reduction_factor_even >= 8 and b % 8 == 0:
-                b, y, n = update_a_b_even(cases, 8, b, y, n, og_b, og_a, debug_print, 10)
-                delta = delta + 3
+                b, y, n = update_a_b_even(cases, 8, b, y, n, og_b, og_a, debug_print, 10, table)
+                delta = policy.shift_b(delta, 3)
 
             # b is divisible by 4 but not by 8
             elif reduction_factor_even >= 4 and b % 4 == 0:
-                b, y, n = update_a_b_even(cases, 4, b, y, n, og_b, og_a, debug_print, 3)
-                delta = delta + 2
+                b, y, n = update_a_b_even(cases, 4, b, y, n, og_b, og_a, debug_print, 3, table)
+                delta = policy.shift_b(delta, 2)
 
             # b is divisible by 2 but not by 4 or 8
             elif reduction_factor_even >= 2 and b % 2 == 0:
-                b, y, n = update_a_b_even(cases, 2, b, y, n, og_b, og_a, debug_print, 4)
-                delta = delta + 1
+                b, y, n = update_a_b_even(cases, 2, b, y, n, og_b, og_a, debug_print, 4, table)
+                delta = policy.shift_b(delta, 1)
 
             # if a, b are odd, then either a + b or a - b will be divisble by 4
 
-            # a + b is divisible by 4 and delta >= 0 indicates a should be updated
-            elif reduction_factor_odd >= 4 and delta >= 0 and (b + a) % 4 == 0:
-                a, u, l = update_a_b_odd(cases, 4, a, b, False, u, l, y, n, og_b, og_a, debug_print, 5)
-                delta = delta - 1
+            # a + b is divisible by 4 and the policy (delta >= 0) selects a
+            elif reduction_factor_odd >= 4 and update_a and (b + a) % 4 == 0:
+                a, u, l = update_a_b_odd(cases, 4, a, b, False, u, l, y, n, og_b, og_a, debug_print, 5, table)
+                delta = policy.odd_a(delta)
 
-                # (a + b) was divisible by 8
+                # (a + b) was divisible by 8 (or more)
                 if reduction_factor_odd >= 8 and a % 2 == 0:
-                    a, u, l = update_a_b_even(cases, 2, a, u, l, og_b, og_a, debug_print, 16)
-                    delta = delta - 1
+                    extra = trailing_zeros(a, log_reduction_factor_odd - 2)
+                    a, u, l = update_a_b_even(cases, 2**extra, a, u, l, og_b, og_a, debug_print, odd_extra_case_id(True, False, extra), table)
+                    delta = policy.shift_a(delta, extra)
 
-            # a - b is divisible by 4 and delta >= 0 indicates a should be updated
-            elif reduction_factor_odd >= 4 and delta >= 0:
-                a, u, l = update_a_b_odd(cases, 4, a, b, True, u, l, y, n, og_b, og_a, debug_print, 6)
-                delta = delta - 1
+            # a - b is divisible by 4 and the policy (delta >= 0) selects a
+            elif reduction_factor_odd >= 4 and update_a:
+                a, u, l = update_a_b_odd(cases, 4, a, b, True, u, l, y, n, og_b, og_a, debug_print, 6, table)
+                delta = policy.odd_a(delta)
 
-                # (a - b) was divisible by 8
+                # (a - b) was divisible by 8 (or more)
                 if reduction_factor_odd >= 8 and a % 2 == 0:
-                    a, u, l = update_a_b_even(cases, 2, a, u, l, og_b, og_a, debug_print, 18)
-                    delta = delta - 1
+                    extra = trailing_zeros(a, log_reduction_factor_odd - 2)
+                    a, u, l = update_a_b_even(cases, 2**extra, a, u, l, og_b, og_a, debug_print, odd_extra_case_id(True, True, extra), table)
+                    delta = policy.shift_a(delta, extra)
 
-            # a + b is divisible by 4 and delta < 0 indicates b should be updated
-            elif reduction_factor_odd >= 4 and delta < 0 and (b + a) % 4 == 0:
-                b, y, n = update_a_b_odd(cases, 4, a, b, False, u, l, y, n, og_b, og_a, debug_print, 7)
-                delta = delta + 1
+            # a + b is divisible by 4 and the policy (delta < 0) selects b
+            elif reduction_factor_odd >= 4 and not update_a and (b + a) % 4 == 0:
+                b, y, n = update_a_b_odd(cases, 4, a, b, False, u, l, y, n, og_b, og_a, debug_print, 7, table)
+                delta = policy.odd_b(delta)
 
-                # (a + b) was divisible by 8
+                # (a + b) was divisible by 8 (or more)
                 if reduction_factor_odd >= 8 and b % 2 == 0:
-                    b, y, n = update_a_b_even(cases, 2, b, y, n, og_b, og_a, debug_print, 20)
-                    delta = delta + 1
+                    extra = trailing_zeros(b, log_reduction_factor_odd - 2)
+                    b, y, n = update_a_b_even(cases, 2**extra, b, y, n, og_b, og_a, debug_print, odd_extra_case_id(False, False, extra), table)
+                    delta = policy.shift_b(delta, extra)
 
-            # a - b is divisible by 4 and delta < 0 indicates b should be updated
+            # a - b is divisible by 4 and the policy (delta < 0) selects b
             # if reduction_factor_odd >= 4, this is the last possible case
-            elif reduction_factor_odd >= 4 and delta < 0:
-                b, y, n = update_a_b_odd(cases, 4, a, b, True, u, l, y, n, og_b, og_a, debug_print, 8)
-                delta = delta + 1
+            elif reduction_factor_odd >= 4 and not update_a:
+                b, y, n = update_a_b_odd(cases, 4, a, b, True, u, l, y, n, og_b, og_a, debug_print, 8, table)
+                delta = policy.odd_b(delta)
 
-                # (a - b) was divisible by 8
+                # (a - b) was divisible by 8 (or more)
                 if reduction_factor_odd >= 8 and b % 2 == 0:
-                    b, y, n = update_a_b_even(cases, 2, b, y, n, og_b, og_a, debug_print, 22)
-                    delta = delta + 1
+                    extra = trailing_zeros(b, log_reduction_factor_odd - 2)
+                    b, y, n = update_a_b_even(cases, 2**extra, b, y, n, og_b, og_a, debug_print, odd_extra_case_id(False, True, extra), table)
+                    delta = policy.shift_b(delta, extra)
 
             # update with (a - b) / 2 for odd reduction factor of 2
-            # update a if delta >= 0
-            elif reduction_factor_odd == 2 and delta >= 0:
-                a, u, l = update_a_b_odd(cases, 2, a, b, True, u, l, y, n, og_b, og_a, debug_print, 11)
-                delta = delta - 1
+            # update a if the policy selects a (delta >= 0)
+            elif reduction_factor_odd == 2 and update_a:
+                a, u, l = update_a_b_odd(cases, 2, a, b, True, u, l, y, n, og_b, og_a, debug_print, 11, table)
+                delta = policy.odd_a(delta)
             
-            # update b if delta < 0
-            elif reduction_factor_odd == 2 and delta < 0:
-                b, y, n = update_a_b_odd(cases, 2, a, b, True, u, l, y, n, og_b, og_a, debug_print, 12)
-                delta = delta + 1
+            # update b otherwise (delta < 0)
+            elif reduction_factor_odd == 2 and not update_a:
+                b, y, n = update_a_b_odd(cases, 2, a, b, True, u, l, y, n, og_b, og_a, debug_print, 12, table)
+                delta = policy.odd_b(delta)
+
+            # a or b is 0, the remaining iterations (until the termination
+            # condition is sampled) only divide u, l (or y, n), do them at once
+            if a == 0 or b == 0:
+                remaining = constant_time_iterations - iterations if constant_time else sample_break_iterations - 1 - i
+                if remaining > 0:
+                    print_debug(debug_print, f"Idle iterations: {remaining}")
+                    u, l, y, n, delta = idle_fast_forward(remaining, a, u, l, y, n, delta, table, log_reduction_factor_even, cases, policy)
+                    iterations += remaining
+                break
 
         # constant time breaks after maximum (worst-case) number of iterations
         if constant_time:
@@ -165,6 +215,8 @@ def xgcd_model(a,
         # non constant time breaks when a or b is 0
         else:
             break_condition = (a != 0 and b != 0)
+            if max_iterations is not None and break_condition and iterations >= max_iterations:
+                raise RuntimeError(f"a: {start_a}, b: {start_b}, no result after max_iterations = {max_iterations} iterations")
     
     debug_print = og_debug_print
     print_debug(debug_print and constant_time, "Note that constant-time debug only prints while variables change.")
@@ -227,61 +279,50 @@ def xgcd_model(a,
     print_debug(debug_print, f"Returned results: l {l}")
     print_debug(debug_print, f"Returned results: iterations {iterations}")
 
-    return gcd, u, l, iterations, cases
-
-def main_testing(bit_length,
-                 num_tests,
-                 input_bit_length,
-                 is_random=True,
-                 test_data=None,
-                 print_summary=True,
-                 constant_time=False,
-                 min_pair_bezout=False,
-                 reduction_factor_even=4,
-                 reduction_factor_odd=4,
-                 debug_print=False):
-
-    if not is_random:
-        assert test_data is not None, "Please provide test data if not using randomized inputs."
+    return int(gcd), int(u), int(l), iterations, cases
 
+def iterate_tests(num_tests, input_bit_length, rng=random):
+    # random test inputs, generated lazily
     max_num = 2**input_bit_length - 1
 
-    total_iterations = 0
-    max_iterations = 0
-
-    cases = []
-  
-    if is_random:
-        if num_tests == 1:
-            min_num = 1
-            tests = [(random.randint(min_num, max_num), random.randint(min_num, max_num))]
-        else:
-            # min_num_list = [2**(input_bit_length - 1) - 1, 1]
-            min_num_list = [2**(input_bit_length - 1) - 1]
-            tests = []
-            for min_num in min_num_list:
-                tests += [(random.randint(min_num, max_num), random.randint(min_num, max_num)) for i in range(num_tests // len(min_num_list))]
+    if num_tests == 1:
+        min_num = 1
+        yield (rng.randint(min_num, max_num), rng.randint(min_num, max_num))
     else:
-        tests = test_data
-    
-    num_tests = len(tests)
-    num_tests_iterations = 0
-
-    print()
-    print(f"Running {num_tests} tests...")
-
-    for i in range(len(tests)):
-        if i % 100 == 0:
+        # min_num_list = [2**(input_bit_length - 1) - 1, 1]
+        min_num_list = [2**(input_bit_length - 1) - 1]
+        for min_num in min_num_list:
+            for i in range(num_tests // len(min_num_list)):
+                yield (rng.randint(min_num, max_num), rng.randint(min_num, max_num))
+
+
+def run_tests(tests,
+              is_random,
+              bit_length,
+              constant_time=False,
+              min_pair_bezout=False,
+              reduction_factor_even=4,
+              reduction_factor_odd=4,
+              debug_print=False,
+              cycles_only=False,
+              num_tests=None,
+              first_test=0):
+
+    # yields (test index, A, B, iterations, cases) for each test in tests
+    # (any iterable), prints progress if num_tests is given
+
+    for i, test in enumerate(tests, first_test):
+        if num_tests is not None and i % 100 == 0:
             print(f"{i} / {num_tests} tests have successfully completed.")
 
         if is_random:
-            (A, B) = tests[i]
+            (A, B) = test
         else:
-            assert (len(tests[i]) == 2) or len(tests[i] == 3), "Invalid test_data...please format test_data list consisting of tuples with pairs of XGCD inputs (e.g. [(4, 5),...,(6, 7)]"
-            if len(tests[i]) == 3:
-                (B, A, C) = tests[i]
-            elif len(tests[i]) == 2:
-                (B, A) = tests[i]
+            assert (len(test) == 2) or len(test == 3), "Invalid test_data...please format test_data list consisting of tuples with pairs of XGCD inputs (e.g. [(4, 5),...,(6, 7)]"
+            if len(test) == 3:
+                (B, A, C) = test
+            elif len(test) == 2:
+                (B, A) = test
 
         gcd = math.gcd(A, B)
         if gcd != 1:
@@ -298,26 +339,194 @@ def main_testing(bit_length,
         # while B % 2 == 0:
         #     B = B // 2
 
-        _, _, _, iterations, cases_list = \
-            xgcd_model(a=A,
-                       b=B, 
-                       bit_length=bit_length,
-                       debug_print=debug_print, 
-                       constant_time=constant_time,
-                       min_pair_bezout=min_pair_bezout,
-                       reduction_factor_even=reduction_factor_even,
-                       reduction_factor_odd=reduction_factor_odd)
+        if cycles_only:
+            iterations = xgcd_iterations(a=A,
+                                         b=B,
+                                         bit_length=bit_length,
+                                         constant_time=constant_time,
+                                         reduction_factor_even=reduction_factor_even,
+                                         reduction_factor_odd=reduction_factor_odd)
+            cases_list = []
+        if not cycles_only or i % 100 == 0:
+            _, _, _, model_iterations, cases_list = \
+                xgcd_model(a=A,
+                           b=B,
+                           bit_length=bit_length,
+                           debug_print=debug_print,
+                           constant_time=constant_time,
+                           min_pair_bezout=min_pair_bezout,
+                           reduction_factor_even=reduction_factor_even,
+                           reduction_factor_odd=reduction_factor_odd)
+            if cycles_only:
+                assert iterations == model_iterations, "xgcd_iterations does not match xgcd_model"
+                cases_list = []
+            iterations = model_iterations
+
+        yield i, A, B, iterations, cases_list
+
+
+# fields written to results_file for each test
+results_fields = ["test", "a", "b", "iterations"]
+
+
+def aggregate_results(results, stats, cases=None, case_trace=None, results_writer=None):
+    # folds results from run_tests into stats (IterationStats), and optionally
+    # cases (CaseTrace), case_trace (open file) and results_writer (ResultsWriter)
+    for (i, A, B, iterations, cases_list) in results:
+        stats.add(iterations)
+
+        # a separator is added between XGCD executions (so that we do not include
+        # the transition from the end of one iteration to the next in case
+        # transition stats
+        if cases is not None:
+            cases.append_execution(cases_list)
+        if case_trace is not None:
+            write_execution(case_trace, cases_list)
+
+        if results_writer is not None:
+            results_writer.write(dict(zip(results_fields, [i, A, B, iterations])))
+
+
+def shard_tests(shard, shard_size, seed, num_tests, input_bit_length):
+    # random test inputs of a shard, generated lazily from its own random stream
+    # derived from the seed and the shard index, so results do not depend on
+    # the number of workers (or whether the tests run serially)
+    rng = random.Random(f"{seed}:{shard}")
+    first_test = shard * shard_size
+    # same input range as iterate_tests for num_tests tests
+    max_num = 2**input_bit_length - 1
+    min_num = 1 if num_tests == 1 else 2**(input_bit_length - 1) - 1
+    for i in range(min(shard_size, num_tests - first_test)):
+        yield (rng.randint(min_num, max_num), rng.randint(min_num, max_num))
+
+
+def run_shard(shard, shard_size, seed, num_tests, input_bit_length, is_random, shard_data, collect_cases, collect_rows, kwargs):
+    # shard_data: the shard's tests if not is_random (sliced in the parent, so
+    # only the shard is sent to the worker)
+    first_test = shard * shard_size
+    tests = shard_tests(shard, shard_size, seed, num_tests, input_bit_length) if is_random else shard_data
+
+    stats = IterationStats()
+    cases = CaseTrace(run_length=kwargs["run_length_cases"]) if collect_cases else None
+    rows = [] if collect_rows else None
 
-        total_iterations += iterations
-        if iterations > max_iterations:
-            max_iterations = iterations
+    for (i, A, B, iterations, cases_list) in run_tests(tests, is_random, first_test=first_test, **kwargs["model"]):
+        stats.add(iterations)
+        if collect_cases:
+            cases.append_execution(cases_list)
+        if collect_rows:
+            rows.append(dict(zip(results_fields, [i, A, B, iterations])))
 
-        # -1 separates XGCD executions (so that we do not include the transition
-        # from the end of one iteration to the next in case transition stats
-        cases_list.append(-1)
-        cases += cases_list
+    return stats, cases, rows
 
-        num_tests_iterations += 1
+
+def main_testing(bit_length,
+                 num_tests,
+                 input_bit_length,
+                 is_random=True,
+                 test_data=None,
+                 print_summary=True,
+                 constant_time=False,
+                 min_pair_bezout=False,
+                 reduction_factor_even=4,
+                 reduction_factor_odd=4,
+                 debug_print=False,
+                 cycles_only=False,
+                 run_length_cases=False,
+                 case_trace_file=None,
+                 workers=None,
+                 seed=0,
+                 shard_size=256,
+                 collect_cases=False,
+                 results_file=None):
+
+    # cycles_only: only compute the number of iterations (no Bezout coefficients
+    # or case transitions), every 100th test is cross-checked against xgcd_model
+    # run_length_cases: run-length encode case transitions (see CaseTrace)
+    # case_trace_file: stream case transitions to this file (see read_case_trace)
+    # workers: if None, run tests serially, otherwise run them on a pool of
+    #          workers processes; random tests are generated in shards of
+    #          shard_size tests (each with its own random stream derived from
+    #          seed), so results are identical for any number of workers and
+    #          for serial runs
+    # collect_cases: return case transitions for all tests in a CaseTrace,
+    #                otherwise (default) memory does not depend on num_tests
+    #                (returns None for the cases)
+    # results_file: stream (test, a, b, iterations) for each test to this
+    #               CSV (or JSONL if it ends with .jsonl) file
+
+    if not is_random:
+        assert test_data is not None, "Please provide test data if not using randomized inputs."
+        num_tests = len(test_data)
+
+    model_kwargs = dict(bit_length=bit_length,
+                        constant_time=constant_time,
+                        min_pair_bezout=min_pair_bezout,
+                        reduction_factor_even=reduction_factor_even,
+                        reduction_factor_odd=reduction_factor_odd,
+                        debug_print=debug_print,
+                        cycles_only=cycles_only)
+
+    stats = IterationStats()
+    cases = CaseTrace(run_length=run_length_cases) if collect_cases else None
+    case_trace = open(case_trace_file, "wb") if case_trace_file is not None else None
+    results_writer = ResultsWriter(results_file, results_fields) if results_file is not None else None
+    num_shards = (num_tests + shard_size - 1) // shard_size
+
+    try:
+        if workers is None:
+            tests = (test for shard in range(num_shards)
+                     for test in shard_tests(shard, shard_size, seed, num_tests, input_bit_length)) if is_random else test_data
+
+            print()
+            print(f"Running {num_tests} tests...")
+
+            aggregate_results(run_tests(tests, is_random, num_tests=num_tests, **model_kwargs),
+                              stats, cases, case_trace, results_writer)
+        else:
+            assert workers > 0, "workers must be positive"
+
+            kwargs = dict(model=model_kwargs, run_length_cases=run_length_cases)
+            collect_shard_cases = collect_cases or case_trace is not None
+
+            print()
+            print(f"Running {num_tests} tests in {num_shards} shards on {workers} workers...")
+
+            if workers > 1:
+                # only imported when needed, so the model imports quickly in workers
+                import concurrent.futures
+                pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+            else:
+                pool = None
+
+            # submit a bounded number of shards at a time, merging results in shard order
+            window = 4 * workers
+            for first_shard in range(0, num_shards, window):
+                shards = [(shard, shard_size, seed, num_tests, input_bit_length, is_random,
+                           None if is_random else test_data[shard * shard_size:(shard + 1) * shard_size],
+                           collect_shard_cases, results_writer is not None, kwargs)
+                          for shard in range(first_shard, min(first_shard + window, num_shards))]
+                shard_results = pool.map(run_shard, *zip(*shards)) if pool is not None else map(run_shard, *zip(*shards))
+
+                for (shard_stats, shard_cases, shard_rows) in shard_results:
+                    stats.merge(shard_stats)
+                    if cases is not None:
+                        cases.extend(shard_cases)
+                    if case_trace is not None:
+                        shard_cases.tofile(case_trace)
+                    if results_writer is not None:
+                        for row in shard_rows:
+                            results_writer.write(row)
+
+                print(f"{first_shard + len(shards)} / {num_shards} shards have successfully completed.")
+
+            if pool is not None:
+                pool.shutdown()
+    finally:
+        if case_trace is not None:
+            case_trace.close()
+        if results_writer is not None:
+            results_writer.close()
 
     if print_summary:
         print()
@@ -326,12 +535,18 @@ def main_testing(bit_length,
         print()
         print("Summary stats for our algorithm")
         print("-------------------------------")
-        print(f"Average number of iterations across the {num_tests} tests: ", total_iterations / num_tests_iterations)
-        print(f"Maximum number of iterations across the {num_tests} tests:", max_iterations)
+        print(f"Average number of iterations across the {num_tests} tests: ", stats.mean())
+        print(f"Maximum number of iterations across the {num_tests} tests:", stats.max)
+        print(f"Median number of iterations across the {num_tests} tests: ", stats.percentile(50))
+        print(f"99th percentile of iterations across the {num_tests} tests: ", stats.percentile(99))
         print()
 
+    return stats, cases
+
 
 if __name__ == "__main__":
+    import argparse
+
     parser = argparse.ArgumentParser(description="Extended GCD functional model")
     parser.add_argument('--bit_length', type=int, default=1024, help="bit_length for XGCD")
     parser.add_argument('--diff_bit_lengths', default=False, action="store_true", help="XGCD design + input bit_lengths differ (intentionally)")
@@ -344,6 +559,11 @@ if __name__ == "__main__":
     parser.add_argument('--min_pair_bezout', default=False, action="store_true", help="return minimum Bezout coefficient values in XGCD")
     parser.add_argument('--reduction_factor_even', type=int, default=8, help="Factor of 2 to reduce b by each cycle if even")
     parser.add_argument('--reduction_factor_odd', type=int, default=4, help="Factor of 2 to reduce b when odd by each cycle if even")
+    parser.add_argument('--cycles_only', default=False, action="store_true", help="only compute number of iterations (no Bezout coefficients)")
+    parser.add_argument('--run_length_cases', default=False, action="store_true", help="run-length encode case transitions in memory")
+    parser.add_argument('--case_trace_file', type=str, default=None, help="file to write case transitions to (one byte per case)")
+    parser.add_argument('--workers', type=int, default=None, help="run tests in seeded shards on a pool of this many processes (default: serial)")
+    parser.add_argument('--results_file', type=str, default=None, help="CSV (or .jsonl) file to stream per-test results to")
 
     args = parser.parse_args()
 
@@ -363,4 +583,10 @@ if __name__ == "__main__":
                  min_pair_bezout=args.min_pair_bezout,
                  reduction_factor_even=args.reduction_factor_even,
                  reduction_factor_odd=args.reduction_factor_odd,
-                 debug_print=args.debug)
+                 debug_print=args.debug,
+                 cycles_only=args.cycles_only,
+                 run_length_cases=args.run_length_cases,
+                 case_trace_file=args.case_trace_file,
+                 workers=args.workers,
+                 seed=0 if args.use_seed else random.randrange(2**32),
+                 results_file=args.results_file)
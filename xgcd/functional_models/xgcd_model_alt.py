@@ -0,0 +1,216 @@
+import math
+
+from xgcd.functional_models.xgcd_helper import bezout_table, bezout_div_pow2, inverse_mod_pow2
+from xgcd.functional_models.xgcd_model_fast import xgcd_pre_processing, xgcd_post_processing
+
+
+# Reference models of other extended GCD algorithms
+#
+# Each model returns (gcd, u, l, iterations, cases) like xgcd_model, with
+# u * a + l * b = gcd. The inputs go through the same pre-processing and
+# post-processing as xgcd_model (common factors of 2 removed, an even input
+# replaced by a + b), and the Bezout coefficients are kept integral the same
+# way (adding multiples of og_b and og_a before dividing by a power of 2), so
+# only the iterations loop differs. One iteration is one step of each
+# algorithm as defined in its paper:
+#
+# - safegcd_model: Bernstein-Yang divsteps ("Fast constant-time gcd
+#   computation and modular inversion", 2019)
+#   0: delta > 0 and g odd, swap and subtract ((g - f) / 2)
+#   1: g odd, add ((g + f) / 2)
+#   2: g even, divide g by 2
+# - binary_xgcd_model: classic binary extended GCD (one divide by 2 or one
+#   subtraction per iteration)
+#   0: a even, divide a by 2
+#   1: b even, divide b by 2
+#   2: a >= b, a = a - b
+#   3: a < b, b = b - a
+# - pornin_model: Pornin's optimized binary GCD ("Optimized Binary GCD for
+#   Modular Inversion", 2020, algorithm 2), inner iterations run on 2k-bit
+#   approximations of a, b and the update matrix is applied to the full values
+#   every k - 1 iterations (k = 32)
+#   0: a even, divide a by 2
+#   1: a >= b, a = (a - b) / 2
+#   2: a < b, swap and a = (a - b) / 2
+#
+# With constant_time, each model runs its worst-case number of iterations for
+# bit_length-bit inputs (bit_length + 1 bits after pre-processing).
+
+pornin_k = 32
+
+
+def safegcd_iterations(bit_length):
+    # divsteps needed for inputs below 2^d (Bernstein-Yang, theorem 11.2)
+    d = bit_length + 1
+    return (49 * d + 80) // 17 if d < 46 else (49 * d + 57) // 17
+
+
+def binary_xgcd_iterations(bit_length):
+    # at most 2 * d divides (a * b < 2^(2 * d)), and each subtraction is
+    # followed by a divide (except the last one)
+    d = bit_length + 1
+    return 4 * d + 1
+
+
+def pornin_iterations(bit_length):
+    # 2 * d - 1 iterations, rounded up to groups of k - 1
+    d = bit_length + 1
+    return math.ceil((2 * d - 1) / (pornin_k - 1)) * (pornin_k - 1)
+
+
+def safegcd_model(a,
+                  b,
+                  bit_length=1024,
+                  constant_time=False,
+                  min_pair_bezout=False,
+                  record_cases=False):
+
+    start_a, start_b = a, b
+    iterations = 0
+    cases = []
+
+    f, g, k, even_case = xgcd_pre_processing(a, b)
+    table = bezout_table(g, f)
+
+    # f = u * og_a + l * og_b, g = y * og_a + n * og_b
+    u, l, y, n = 1, 0, 0, 1
+    delta = 1
+
+    max_iterations = safegcd_iterations(bit_length)
+    while (iterations < max_iterations) if constant_time else g != 0:
+        iterations += 1
+        if delta > 0 and (g & 1):
+            delta = 1 - delta
+            f, g = g, (g - f) >> 1
+            u, l, (y, n) = y, n, bezout_div_pow2(y - u, n - l, table, 1)
+            case = 0
+        elif g & 1:
+            delta = 1 + delta
+            g = (g + f) >> 1
+            y, n = bezout_div_pow2(y + u, n + l, table, 1)
+            case = 1
+        else:
+            delta = 1 + delta
+            g >>= 1
+            y, n = bezout_div_pow2(y, n, table, 1)
+            case = 2
+        if record_cases:
+            cases.append(case)
+
+    # f is +/- gcd
+    if f < 0:
+        f, u, l = -f, -u, -l
+    gcd, u, l = xgcd_post_processing(f, g, u, l, y, n, k, even_case,
+                                     start_a, start_b, min_pair_bezout)
+    return gcd, u, l, iterations, cases
+
+
+def binary_xgcd_model(a,
+                      b,
+                      bit_length=1024,
+                      constant_time=False,
+                      min_pair_bezout=False,
+                      record_cases=False):
+
+    start_a, start_b = a, b
+    iterations = 0
+    cases = []
+
+    a, b, k, even_case = xgcd_pre_processing(a, b)
+    table = bezout_table(b, a)
+
+    u, l, y, n = 1, 0, 0, 1
+
+    max_iterations = binary_xgcd_iterations(bit_length)
+    while (iterations < max_iterations) if constant_time else (a != 0 and b != 0):
+        iterations += 1
+        if (a & 1) == 0:
+            a >>= 1
+            u, l = bezout_div_pow2(u, l, table, 1)
+            case = 0
+        elif (b & 1) == 0:
+            b >>= 1
+            y, n = bezout_div_pow2(y, n, table, 1)
+            case = 1
+        elif a >= b:
+            a, u, l = a - b, u - y, l - n
+            case = 2
+        else:
+            b, y, n = b - a, y - u, n - l
+            case = 3
+        if record_cases:
+            cases.append(case)
+
+    gcd, u, l = xgcd_post_processing(a, b, u, l, y, n, k, even_case,
+                                     start_a, start_b, min_pair_bezout)
+    return gcd, u, l, iterations, cases
+
+
+def pornin_model(a,
+                 b,
+                 bit_length=1024,
+                 constant_time=False,
+                 min_pair_bezout=False,
+                 record_cases=False):
+
+    start_a, start_b = a, b
+    iterations = 0
+    cases = []
+
+    a, b, k, even_case = xgcd_pre_processing(a, b)
+    og_a, og_b = a, b
+    shift = pornin_k - 1
+    inv_og_b = inverse_mod_pow2(og_b, 2 ** shift)
+
+    u, l, y, n = 1, 0, 0, 1
+
+    def update(f, g, u, l, y, n):
+        # (f * (u, l) + g * (y, n)) / 2^shift, adding a multiple of (og_b, -og_a)
+        u, l = f * u + g * y, f * l + g * n
+        m = (-u * inv_og_b) & ((1 << shift) - 1)
+        return (u + m * og_b) >> shift, (l - m * og_a) >> shift
+
+    max_iterations = pornin_iterations(bit_length)
+    while (iterations < max_iterations) if constant_time else a != 0:
+        # approximations: low k - 1 bits and top k + 1 bits of a, b
+        length = max(a.bit_length(), b.bit_length(), 2 * pornin_k)
+        low_mask = (1 << (pornin_k - 1)) - 1
+        a_approx = (a & low_mask) | ((a >> (length - pornin_k - 1)) << (pornin_k - 1))
+        b_approx = (b & low_mask) | ((b >> (length - pornin_k - 1)) << (pornin_k - 1))
+
+        f0, g0, f1, g1 = 1, 0, 0, 1
+        for j in range(shift):
+            iterations += 1
+            if (a_approx & 1) == 0:
+                a_approx >>= 1
+                case = 0
+            else:
+                case = 1
+                if a_approx < b_approx:
+                    a_approx, b_approx = b_approx, a_approx
+                    f0, g0, f1, g1 = f1, g1, f0, g0
+                    case = 2
+                a_approx = (a_approx - b_approx) >> 1
+                f0, g0 = f0 - f1, g0 - g1
+            f1, g1 = f1 << 1, g1 << 1
+            if record_cases:
+                cases.append(case)
+
+        a, b = (a * f0 + b * g0) >> shift, (a * f1 + b * g1) >> shift
+        u, l, y, n = update(f0, g0, u, l, y, n) + update(f1, g1, u, l, y, n)
+        if a < 0:
+            a, u, l = -a, -u, -l
+        if b < 0:
+            b, y, n = -b, -y, -n
+
+    gcd, u, l = xgcd_post_processing(a, b, u, l, y, n, k, even_case,
+                                     start_a, start_b, min_pair_bezout)
+    return gcd, u, l, iterations, cases
+
+
+# algorithms compared with xgcd_model (see xgcd_benchmark.py)
+algorithms = {
+    "safegcd": safegcd_model,
+    "binary_xgcd": binary_xgcd_model,
+    "pornin": pornin_model,
+}
@@ -0,0 +1,204 @@
+import math
+import numpy as np
+
+from xgcd.functional_models.xgcd_model_fast import xgcd_pre_processing, xgcd_post_processing
+
+
+# Batch engine for the XGCD functional model
+#
+# Runs many independent (A, B) pairs in lockstep. Each variable (a, b, u, l,
+# y, n) is stored as an int64 array of limbs (num_limbs x num_lanes), and the
+# case for each lane is selected with NumPy masks on the lowest limb.
+#
+# Limbs are kept in a redundant form (similar to carry-save in the hardware):
+# a value is sum(limb[i] * 2^(LIMB_BITS * i)), and limbs are only partially
+# normalized after each update. Shifting right is still exact since the value
+# is divisible by 2^shift, and only a, b need to be fully normalized to check
+# the termination condition.
+
+# leaves enough headroom in int64 for p * a + q * b + m * og_b
+LIMB_BITS = 58
+LIMB_MASK = (1 << LIMB_BITS) - 1
+
+# count trailing zeros for a value mod 8 (3 for 0 mod 8)
+CTZ_8 = np.array([3, 0, 1, 0, 2, 0, 1, 0], dtype=np.int64)
+
+
+def to_limbs(values, num_limbs):
+    return np.array([[(v >> (LIMB_BITS * i)) & LIMB_MASK for v in values] for i in range(num_limbs - 1)] +
+                    [[v >> (LIMB_BITS * (num_limbs - 1)) for v in values]], dtype=np.int64)
+
+
+def from_limbs(limbs):
+    values = [0] * limbs.shape[1]
+    for i, limb in enumerate(limbs.tolist()):
+        for j, v in enumerate(limb):
+            values[j] += v << (LIMB_BITS * i)
+    return values
+
+
+def limbs_shift_right(x, shift):
+    # x is divisible by 2^shift (shift is per lane)
+    low_bits = x & ((1 << shift) - 1)
+    out = x >> shift
+    out[:-1] += low_bits[1:] << (LIMB_BITS - shift)
+    return out
+
+
+def limbs_partial_normalize(x):
+    carry = x[:-1] >> LIMB_BITS
+    x[:-1] &= LIMB_MASK
+    x[1:] += carry
+    return x
+
+
+def limbs_normalize(x):
+    for i in range(x.shape[0] - 1):
+        carry = x[i] >> LIMB_BITS
+        x[i] &= LIMB_MASK
+        x[i + 1] += carry
+    return x
+
+
+def xgcd_model_batch_lanes(og_a_list,
+                           og_b_list,
+                           num_limbs,
+                           bit_length=1024,
+                           constant_time=False,
+                           reduction_factor_even=4,
+                           reduction_factor_odd=4):
+    # og_a_list, og_b_list are odd inputs to the iterations loop
+    # returns the final a, b, u, l, y, n and number of iterations for each lane
+
+    num_lanes = len(og_a_list)
+    results = [None] * num_lanes
+
+    log_even = 3 if reduction_factor_even >= 8 else 2 if reduction_factor_even >= 4 else 1
+    even_shift = np.minimum(CTZ_8, log_even)
+    odd_8 = reduction_factor_odd >= 8
+    odd_4 = reduction_factor_odd >= 4
+
+    # original index of each active lane
+    lanes = np.arange(num_lanes)
+
+    og_a = to_limbs(og_a_list, num_limbs)
+    og_b = to_limbs(og_b_list, num_limbs)
+    a = og_a.copy()
+    b = og_b.copy()
+    u = to_limbs([1] * num_lanes, num_limbs)
+    l = np.zeros_like(a)
+    y = np.zeros_like(a)
+    n = u.copy()
+    delta = np.zeros(num_lanes, dtype=np.int64)
+
+    if constant_time:
+        constant_time_iterations = math.ceil(1.51 * bit_length + 1)
+
+    sample_break_iterations = 1 if constant_time else 4
+    iterations = 0
+    while len(lanes) > 0:
+        for i in range(sample_break_iterations):
+            iterations += 1
+
+            a_8 = a[0] & 7
+            b_8 = b[0] & 7
+            shift_a = even_shift[a_8]
+            shift_b = even_shift[b_8]
+            a_even = shift_a > 0
+            b_even = ~a_even & (shift_b > 0)
+            odd = ~a_even & ~b_even
+
+            # a and b are odd: update with (a + sel * b) / 2^shift_odd
+            if odd_4:
+                sel = np.where(((a_8 + b_8) & 3) == 0, 1, -1)
+                shift_odd = 2 + (odd_8 & (((a_8 + sel * b_8) & 7) == 0))
+                delta_odd = shift_odd - 1
+            else:
+                sel = -1
+                shift_odd = 1
+                delta_odd = 1
+
+            update_a = a_even | (odd & (delta >= 0))
+            shift = np.where(a_even, shift_a, np.where(b_even, shift_b, shift_odd))
+            delta += np.where(a_even, -shift_a, np.where(b_even, shift_b, np.where(update_a, -delta_odd, delta_odd)))
+
+            # updated variable (a or b) is p * a + q * b divided by 2^shift
+            p = (~b_even).astype(np.int64)
+            q = np.where(a_even, 0, np.where(b_even, 1, sel))
+
+            # number of og_b's (and og_a's) bezout_update adds while dividing
+            # by 2^shift, og_b is odd so og_b^-1 mod 8 = og_b mod 8
+            u_8 = (p * u[0] + q * y[0]) & 7
+            m = (-u_8 * (og_b[0] & 7)) & ((1 << shift) - 1)
+
+            a_b = limbs_partial_normalize(limbs_shift_right(p * a + q * b, shift))
+            u_y = limbs_partial_normalize(limbs_shift_right(p * u + q * y + m * og_b, shift))
+            l_n = limbs_partial_normalize(limbs_shift_right(p * l + q * n - m * og_a, shift))
+
+            a, b = np.where(update_a, a_b, a), np.where(update_a, b, a_b)
+            u, y = np.where(update_a, u_y, u), np.where(update_a, y, u_y)
+            l, n = np.where(update_a, l_n, l), np.where(update_a, n, l_n)
+
+        if constant_time:
+            if iterations < constant_time_iterations:
+                continue
+            done = np.ones(len(lanes), dtype=bool)
+        else:
+            a = limbs_normalize(a)
+            b = limbs_normalize(b)
+            done = ~a.any(axis=0) | ~b.any(axis=0)
+            if not done.any():
+                continue
+
+        # retire finished lanes
+        for i, values in zip(lanes[done], zip(*[from_limbs(x[:, done]) for x in (a, b, u, l, y, n)])):
+            results[i] = values + (iterations,)
+
+        keep = ~done
+        lanes = lanes[keep]
+        a, b, u, l, y, n = [x[:, keep] for x in (a, b, u, l, y, n)]
+        og_a, og_b = og_a[:, keep], og_b[:, keep]
+        delta = delta[keep]
+
+    return results
+
+
+def xgcd_model_batch(pairs,
+                     bit_length=1024,
+                     constant_time=False,
+                     min_pair_bezout=False,
+                     reduction_factor_even=4,
+                     reduction_factor_odd=4,
+                     chunk_size=1024):
+
+    assert reduction_factor_even in [2, 4, 8] and reduction_factor_odd in [2, 4, 8], \
+        "xgcd_model_batch supports reduction factors 2, 4 and 8, use xgcd_model or xgcd_iterations for larger factors."
+
+    pairs = list(pairs)
+    results = []
+
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+
+        pre_processed = [xgcd_pre_processing(A, B) for (A, B) in chunk]
+        og_a_list = [a for (a, b, k, even_case) in pre_processed]
+        og_b_list = [b for (a, b, k, even_case) in pre_processed]
+
+        # values (and intermediate sums) stay within a few bits of the inputs
+        max_bits = max(max(abs(x).bit_length() for x in og_a_list + og_b_list), bit_length)
+        num_limbs = (max_bits + 8) // LIMB_BITS + 2
+
+        lane_results = xgcd_model_batch_lanes(og_a_list,
+                                              og_b_list,
+                                              num_limbs,
+                                              bit_length=bit_length,
+                                              constant_time=constant_time,
+                                              reduction_factor_even=reduction_factor_even,
+                                              reduction_factor_odd=reduction_factor_odd)
+
+        for (A, B), (_, _, k, even_case), (a, b, u, l, y, n, iterations) in zip(chunk, pre_processed, lane_results):
+            gcd, u, l = xgcd_post_processing(a, b, u, l, y, n, k, even_case,
+                                             A, B, min_pair_bezout)
+            results.append((gcd, u, l, iterations, []))
+
+    return results
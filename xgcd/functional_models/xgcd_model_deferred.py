@@ -0,0 +1,201 @@
+import math
+import random
+from collections import namedtuple
+
+from xgcd.functional_models.xgcd_helper import EvenCase, log2_reduction_factor, trailing_zeros
+from xgcd.functional_models.xgcd_model_fast import xgcd_pre_processing, xgcd_post_processing
+
+
+# Deferred-halving Bezout coefficient mode for the XGCD functional model
+#
+# xgcd_model divides the Bezout coefficients of a (u, l) or b (y, n) every
+# time a or b is divided by 2, 4 or 8, adding multiples of og_b / og_a to keep
+# them integral (the Update_Bezout late-select datapath). In this mode the
+# coefficients are kept scaled by 2^scale instead:
+#
+#     u * og_a + l * og_b = 2^scale * a
+#     y * og_a + n * og_b = 2^scale * b
+#
+# so dividing a (b) by 2^s only shifts y, n (u, l) left by s and adds s to
+# scale, and an odd update is u +/- y, l +/- n without any correction. After
+# the iterations, remove_scale divides the coefficients of the non-zero one of
+# a, b by 2^scale modulo og_b / og_a, one halving at a time (the
+# PostProcessing deferred_halving option). Idle iterations after a or b is 0
+# only scale the non-zero side by a power of 2 that the first halvings remove
+# exactly, so the results do not depend on when the termination condition is
+# sampled.
+#
+# The coefficients grow to about scale - bit_length bits. scale is about 2x
+# bit_length for random inputs, but up to about 3x bit_length when a small odd
+# input meets an all-ones input (every odd update divides by 4 and doubles the
+# other side twice), see deferred_widths and deferred_adversarial_inputs.
+
+DeferredResult = namedtuple("DeferredResult", ["gcd", "u", "l", "iterations", "scale", "coefficient_bits"])
+
+
+def remove_scale(u, l, og_a, og_b, scale):
+    # u * og_a + l * og_b = 2^scale * g (og_a, og_b odd), returns (u, l) with
+    # u * og_a + l * og_b = g, u = u * 2^-scale mod og_b
+    # same halving steps as PostProcessing: u and l have the same parity, if
+    # odd add og_b to u and subtract og_a from l, then divide both by 2
+    for i in range(scale):
+        if u & 1:
+            u, l = u + og_b, l - og_a
+        u >>= 1
+        l >>= 1
+    return u, l
+
+
+def xgcd_model_deferred(a,
+                        b,
+                        bit_length=1024,
+                        min_pair_bezout=False,
+                        reduction_factor_even=4,
+                        reduction_factor_odd=4):
+
+    # returns a DeferredResult: gcd, Bezout coefficients (u, l), iterations
+    # (same as xgcd_model), the scale (number of halvings in post-processing)
+    # and the signed width the scaled coefficients reach
+    # non constant-time only: idle iterations scale by up to 8 each, so a
+    # constant-time run would need 3 * (1.51 * bit_length + 1) more bits
+    # and leak scale through the post-processing cycles
+
+    start_a, start_b = a, b
+    a, b, k, even_case = xgcd_pre_processing(a, b)
+    og_a, og_b = a, b
+
+    u, l, y, n = 1, 0, 0, 1
+    delta = 0
+    scale = 0
+    max_coefficient = 1
+    iterations = 0
+
+    log_even = log2_reduction_factor(reduction_factor_even)
+    log_odd = log2_reduction_factor(reduction_factor_odd)
+
+    break_condition = True
+    while break_condition:
+        # termination condition is sampled every 4 iterations, the idle
+        # iterations after a or b is 0 are run (they only scale the non-zero
+        # side, see remove_scale)
+        for i in range(4):
+            iterations += 1
+
+            # a (or a = 0) divisible by 2, 4 or 8
+            if (a & 1) == 0:
+                s = trailing_zeros(a, log_even)
+                a >>= s
+                y, n = y << s, n << s
+                delta -= s
+
+            # b divisible by 2, 4 or 8
+            elif (b & 1) == 0:
+                s = trailing_zeros(b, log_even)
+                b >>= s
+                u, l = u << s, l << s
+                delta += s
+
+            # a, b odd: update with (a +/- b) / 4 (or 8), or (a - b) / 2
+            else:
+                if log_odd >= 2 and ((a + b) & 3) == 0:
+                    a_b, u_y, l_n = a + b, u + y, l + n
+                else:
+                    a_b, u_y, l_n = a - b, u - y, l - n
+                s = trailing_zeros(a_b, log_odd) if log_odd >= 2 else 1
+
+                if delta >= 0:
+                    a = a_b >> s
+                    u, l = u_y, l_n
+                    y, n = y << s, n << s
+                    delta -= s - 1 if log_odd >= 2 else 1
+                else:
+                    b = a_b >> s
+                    y, n = u_y, l_n
+                    u, l = u << s, l << s
+                    delta += s - 1 if log_odd >= 2 else 1
+
+            scale += s
+            max_coefficient = max(max_coefficient, abs(u), abs(l), abs(y), abs(n))
+
+        break_condition = a != 0 and b != 0
+
+    # only the non-zero side's coefficients are needed
+    if b == 0:
+        u, l = remove_scale(u, l, og_a, og_b, scale)
+    else:
+        u, l = remove_scale(y, n, og_a, og_b, scale)
+
+    gcd, u, l = xgcd_post_processing(a, b, u, l, 0, 0, k, even_case,
+                                     start_a, start_b, min_pair_bezout)
+
+    return DeferredResult(gcd, u, l, iterations, scale, max_coefficient.bit_length() + 1)
+
+
+def deferred_adversarial_inputs(bit_length):
+    # small odd inputs with all-ones (2^m - 1) inputs: most iterations are odd
+    # updates dividing by 4 with delta >= 0, so scale reaches about
+    # 3 * bit_length and the scaled coefficients about 2 * bit_length bits
+    # (up to 2 * bit_length + 9 for 8/4 and 8/8 reduction factors)
+    pairs = []
+    for m in range(bit_length - 3, bit_length + 1):
+        for M in [2 ** m - 1, 2 ** m - 3, 2 ** (m - 1) + 1]:
+            for A in range(1, 64, 2):
+                pairs += [(A, M), (M, A)]
+    return pairs
+
+
+def deferred_widths(tests,
+                    bit_length=1024,
+                    reduction_factor_even=4,
+                    reduction_factor_odd=4):
+    # (max scale, max coefficient width) over tests, i.e. the scale counter
+    # range and Bezout coefficient register width (bezout_bit_length) the
+    # deferred_halving hardware needs for these inputs
+    max_scale, max_bits = 0, 0
+    for (A, B) in tests:
+        result = xgcd_model_deferred(A, B,
+                                     bit_length=bit_length,
+                                     reduction_factor_even=reduction_factor_even,
+                                     reduction_factor_odd=reduction_factor_odd)
+        max_scale = max(max_scale, result.scale)
+        max_bits = max(max_bits, result.coefficient_bits)
+    return max_scale, max_bits
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from xgcd.functional_models.xgcd_model_fast import xgcd_model_fast
+    from xgcd.functional_models.xgcd_widths import adversarial_inputs
+
+    parser = argparse.ArgumentParser(description="XGCD deferred-halving Bezout coefficient mode")
+    parser.add_argument('--bit_length', type=int, default=1024, help="bitwidth for XGCD")
+    parser.add_argument('--num_tests', type=int, default=1000, help="number of random tests (on top of the adversarial inputs)")
+    parser.add_argument('--reduction_factor_even', type=int, default=8, help="reduction factor for even cases")
+    parser.add_argument('--reduction_factor_odd', type=int, default=4, help="reduction factor for odd cases")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the random tests")
+    args = parser.parse_args()
+
+    print(args)
+
+    rng = random.Random(args.seed)
+    tests = adversarial_inputs(args.bit_length) + deferred_adversarial_inputs(args.bit_length)
+    tests += [(rng.randint(1, 2 ** args.bit_length - 1), rng.randint(1, 2 ** args.bit_length - 1)) for i in range(args.num_tests)]
+
+    kwargs = dict(bit_length=args.bit_length,
+                  reduction_factor_even=args.reduction_factor_even,
+                  reduction_factor_odd=args.reduction_factor_odd)
+
+    scales = []
+    for (A, B) in tests:
+        result = xgcd_model_deferred(A, B, **kwargs)
+        gcd, _, _, iterations, _ = xgcd_model_fast(A, B, **kwargs)
+        assert abs(result.gcd) == abs(gcd) and result.iterations == iterations
+        assert result.u * A + result.l * B == abs(result.gcd)
+        scales.append(result.scale)
+
+    max_scale, max_bits = deferred_widths(tests, **kwargs)
+    print()
+    print(f"{len(tests)} tests match xgcd_model_fast (gcd, iterations)")
+    print(f"scale (post-processing halvings): average {sum(scales) / len(scales):.1f}, max {max_scale}")
+    print(f"scaled coefficient width: max {max_bits} bits (inter_bit_length default: {args.bit_length + 5})")
@@ -0,0 +1,269 @@
+import math
+
+from xgcd.functional_models.xgcd_helper import EvenCase, bezout_table, bezout_div_pow2, log2_reduction_factor, trailing_zeros, idle_fast_forward
+from xgcd.functional_models.xgcd_backend import get_backend
+
+
+# Fast engine for the XGCD functional model
+#
+# Returns the same (gcd, u, l, iterations, cases) as xgcd_model, but
+# - never formats strings (xgcd_model builds its debug f-strings before
+#   print_debug checks debug_print, which converts every large integer to
+#   decimal several times per iteration)
+# - only records case transitions if record_cases is set
+# - skips the Bezout identity asserts (tests compare against xgcd_model instead)
+# - supports the same big integer backends as xgcd_model (see xgcd_backend)
+# Use xgcd_model for debugging, and this engine for large test vector runs.
+
+
+def xgcd_pre_processing(a, b):
+    # remove common factors of 2
+    k = 0
+    while (a & 1) == 0 and (b & 1) == 0:
+        k += 1
+        a >>= 1
+        b >>= 1
+
+    # make both inputs to iterations odd
+    even_case = EvenCase.BOTH_ODD
+    if (a & 1) == 0:
+        a = a + b
+        even_case = EvenCase.A_EVEN
+    elif (b & 1) == 0:
+        b = a + b
+        even_case = EvenCase.B_EVEN
+
+    return a, b, k, even_case
+
+
+def xgcd_post_processing(a, b, u, l, y, n, k, even_case, start_a, start_b, min_pair_bezout):
+    gcd = (a + b) << k
+    u = u + y
+    l = l + n
+
+    if even_case == EvenCase.A_EVEN:
+        l = u + l
+    elif even_case == EvenCase.B_EVEN:
+        u = u + l
+
+    if min_pair_bezout:
+        k = u // (start_b // gcd)
+        if k != 0:
+            u = u - k * (start_b // gcd)
+            l = l + k * (start_a // gcd)
+
+    if gcd < 0:
+        u = -u
+        l = -l
+
+    return int(gcd), int(u), int(l)
+
+
+def xgcd_model_fast(a,
+                    b,
+                    bit_length=1024,
+                    constant_time=False,
+                    min_pair_bezout=False,
+                    reduction_factor_even=4,
+                    reduction_factor_odd=4,
+                    record_cases=False,
+                    backend=None):
+
+    start_a, start_b = a, b
+
+    iterations = 0
+    cases = []
+
+    assert reduction_factor_even in [2, 4, 8] and reduction_factor_odd in [2, 4, 8], \
+        "xgcd_model_fast supports reduction factors 2, 4 and 8, use xgcd_model or xgcd_iterations for larger factors."
+
+    to_backend = get_backend(backend)
+    a, b, k, even_case = xgcd_pre_processing(to_backend(a), to_backend(b))
+
+    u, l, y, n = 1, 0, 0, 1
+    delta = 0
+    og_a, og_b = a, b
+    table = bezout_table(og_b, og_a)
+
+    # reduction factor configuration is fixed for the whole run, so
+    # resolve it once instead of every iteration
+    even_8 = reduction_factor_even >= 8
+    even_4 = reduction_factor_even >= 4
+    odd_8 = reduction_factor_odd >= 8
+    odd_4 = reduction_factor_odd >= 4
+    odd_2 = reduction_factor_odd == 2
+    log_even = log2_reduction_factor(reduction_factor_even)
+
+    if constant_time:
+        constant_time_iterations = math.ceil(1.51 * bit_length + 1)
+
+    sample_break_iterations = 1 if constant_time else 4
+    break_condition = True
+    while break_condition:
+        for i in range(sample_break_iterations):
+
+            iterations += 1
+
+            # see xgcd_model for a description of each case
+            if even_8 and (a & 7) == 0:
+                a >>= 3
+                u, l = bezout_div_pow2(u, l, table, 3)
+                delta -= 3
+                case = 9
+
+            elif even_4 and (a & 3) == 0:
+                a >>= 2
+                u, l = bezout_div_pow2(u, l, table, 2)
+                delta -= 2
+                case = 1
+
+            elif (a & 1) == 0:
+                a >>= 1
+                u, l = bezout_div_pow2(u, l, table, 1)
+                delta -= 1
+                case = 2
+
+            elif even_8 and (b & 7) == 0:
+                b >>= 3
+                y, n = bezout_div_pow2(y, n, table, 3)
+                delta += 3
+                case = 10
+
+            elif even_4 and (b & 3) == 0:
+                b >>= 2
+                y, n = bezout_div_pow2(y, n, table, 2)
+                delta += 2
+                case = 3
+
+            elif (b & 1) == 0:
+                b >>= 1
+                y, n = bezout_div_pow2(y, n, table, 1)
+                delta += 1
+                case = 4
+
+            elif odd_4:
+                # a and b are odd, so exactly one of a + b, a - b is
+                # divisible by 4
+                if ((a + b) & 3) == 0:
+                    a_b, u_y, l_n = a + b, u + y, l + n
+                    sub = False
+                else:
+                    a_b, u_y, l_n = a - b, u - y, l - n
+                    sub = True
+
+                if delta >= 0:
+                    a = a_b >> 2
+                    u, l = bezout_div_pow2(u_y, l_n, table, 2)
+                    delta -= 1
+                    case = 6 if sub else 5
+
+                    # (a +/- b) was divisible by 8
+                    if odd_8 and (a & 1) == 0:
+                        if record_cases:
+                            cases.append(case)
+                        a >>= 1
+                        u, l = bezout_div_pow2(u, l, table, 1)
+                        delta -= 1
+                        case = 18 if sub else 16
+                else:
+                    b = a_b >> 2
+                    y, n = bezout_div_pow2(u_y, l_n, table, 2)
+                    delta += 1
+                    case = 8 if sub else 7
+
+                    if odd_8 and (b & 1) == 0:
+                        if record_cases:
+                            cases.append(case)
+                        b >>= 1
+                        y, n = bezout_div_pow2(y, n, table, 1)
+                        delta += 1
+                        case = 22 if sub else 20
+
+            elif odd_2 and delta >= 0:
+                a = (a - b) >> 1
+                u, l = bezout_div_pow2(u - y, l - n, table, 1)
+                delta -= 1
+                case = 11
+
+            elif odd_2:
+                b = (a - b) >> 1
+                y, n = bezout_div_pow2(u - y, l - n, table, 1)
+                delta += 1
+                case = 12
+
+            if record_cases:
+                cases.append(case)
+
+            # a or b is 0, do the remaining idle iterations at once (see xgcd_model)
+            if a == 0 or b == 0:
+                remaining = constant_time_iterations - iterations if constant_time else sample_break_iterations - 1 - i
+                if remaining > 0:
+                    u, l, y, n, delta = idle_fast_forward(remaining, a, u, l, y, n, delta, table, log_even,
+                                                          cases if record_cases else None)
+                    iterations += remaining
+                break
+
+        if constant_time:
+            break_condition = iterations < constant_time_iterations
+        else:
+            break_condition = a != 0 and b != 0
+
+    gcd, u, l = xgcd_post_processing(a, b, u, l, y, n, k, even_case,
+                                     start_a, start_b, min_pair_bezout)
+
+    return gcd, u, l, iterations, cases
+
+
+def xgcd_iterations(a,
+                    b,
+                    bit_length=1024,
+                    constant_time=False,
+                    reduction_factor_even=4,
+                    reduction_factor_odd=4,
+                    backend=None):
+    # number of iterations xgcd_model takes (cycles in the XGCD iterations loop)
+    # the case taken only depends on a, b and delta, so u, l, y, n are not tracked
+    # supports any power of 2 reduction factors, like xgcd_model
+
+    if constant_time:
+        return math.ceil(1.51 * bit_length + 1)
+
+    iterations = 0
+
+    to_backend = get_backend(backend)
+    a, b, _, _ = xgcd_pre_processing(to_backend(a), to_backend(b))
+    delta = 0
+
+    # any power of 2 reduction factors (see xgcd_model)
+    log_even = log2_reduction_factor(reduction_factor_even)
+    log_odd = log2_reduction_factor(reduction_factor_odd)
+
+    while True:
+        for i in range(4):
+            if (a & 1) == 0:
+                s = trailing_zeros(a, log_even)
+                a >>= s
+                delta -= s
+            elif (b & 1) == 0:
+                s = trailing_zeros(b, log_even)
+                b >>= s
+                delta += s
+            elif log_odd >= 2:
+                a_b = a + b if ((a + b) & 3) == 0 else a - b
+                s = trailing_zeros(a_b, log_odd)
+                if delta >= 0:
+                    a = a_b >> s
+                    delta -= s - 1
+                else:
+                    b = a_b >> s
+                    delta += s - 1
+            elif delta >= 0:
+                a = (a - b) >> 1
+                delta -= 1
+            else:
+                b = (a - b) >> 1
+                delta += 1
+
+        iterations += 4
+        if a == 0 or b == 0:
+            return iterations
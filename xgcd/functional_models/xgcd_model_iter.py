@@ -0,0 +1,124 @@
+import math
+from collections import namedtuple
+
+from xgcd.functional_models.xgcd_helper import *
+from xgcd.functional_models.xgcd_model_fast import xgcd_pre_processing, xgcd_post_processing
+from xgcd.functional_models.xgcd_backend import get_backend
+
+
+# Streaming per-iteration state for the XGCD functional model
+#
+# xgcd_model_iter is a generator that yields one IterationRecord after each
+# iteration of the XGCD iterations loop, so a trace can be stopped early,
+# sampled or streamed to disk without keeping it in memory.
+#
+# - iteration: iteration index (starting from 1, same as the cycle count)
+# - case: case id (see xgcd_model and xgcd_helper), for iterations that divide
+#   (a +/- b) by 8 or more this is the case id of the extra divide (e.g. 16, 18,
+#   20 or 22, xgcd_model records 5, 6, 7 or 8 before these)
+# - delta: delta after the update
+# - a, b, u, l, y, n: carry-propagated values after the update if
+#   record_state is set, otherwise None
+#
+# The return value of the generator (e.g. from yield from) is the same
+# (gcd, u, l, iterations) as xgcd_model.
+
+IterationRecord = namedtuple("IterationRecord", ["iteration", "case", "delta", "a", "b", "u", "l", "y", "n"])
+
+
+def xgcd_model_iter(a,
+                    b,
+                    bit_length=1024,
+                    constant_time=False,
+                    min_pair_bezout=False,
+                    reduction_factor_even=4,
+                    reduction_factor_odd=4,
+                    record_state=False,
+                    backend=None):
+
+    start_a, start_b = a, b
+
+    iterations = 0
+
+    to_backend = get_backend(backend)
+    a, b, k, even_case = xgcd_pre_processing(to_backend(a), to_backend(b))
+
+    u, l, y, n = 1, 0, 0, 1
+    delta = 0
+    og_a, og_b = a, b
+    log_even = log2_reduction_factor(reduction_factor_even)
+    log_odd = log2_reduction_factor(reduction_factor_odd)
+    table = bezout_table(og_b, og_a)
+
+    if constant_time:
+        constant_time_iterations = math.ceil(1.51 * bit_length + 1)
+
+    sample_break_iterations = 1 if constant_time else 4
+    break_condition = True
+    while break_condition:
+        for i in range(sample_break_iterations):
+
+            iterations += 1
+
+            # see xgcd_model for a description of each case
+            if (a & 1) == 0:
+                s = trailing_zeros(a, log_even)
+                a >>= s
+                u, l = bezout_div_pow2(u, l, table, s)
+                delta -= s
+                case = even_case_id(True, s)
+
+            elif (b & 1) == 0:
+                s = trailing_zeros(b, log_even)
+                b >>= s
+                y, n = bezout_div_pow2(y, n, table, s)
+                delta += s
+                case = even_case_id(False, s)
+
+            elif log_odd >= 2:
+                if ((a + b) & 3) == 0:
+                    a_b, u_y, l_n = a + b, u + y, l + n
+                    sub = False
+                else:
+                    a_b, u_y, l_n = a - b, u - y, l - n
+                    sub = True
+                # (a +/- b) was divisible by 8 (or more)
+                s = trailing_zeros(a_b, log_odd)
+
+                if delta >= 0:
+                    a = a_b >> s
+                    u, l = bezout_div_pow2(u_y, l_n, table, s)
+                    delta -= s - 1
+                    case = odd_extra_case_id(True, sub, s - 2) if s > 2 else (6 if sub else 5)
+                else:
+                    b = a_b >> s
+                    y, n = bezout_div_pow2(u_y, l_n, table, s)
+                    delta += s - 1
+                    case = odd_extra_case_id(False, sub, s - 2) if s > 2 else (8 if sub else 7)
+
+            elif delta >= 0:
+                a = (a - b) >> 1
+                u, l = bezout_div_pow2(u - y, l - n, table, 1)
+                delta -= 1
+                case = 11
+
+            else:
+                b = (a - b) >> 1
+                y, n = bezout_div_pow2(u - y, l - n, table, 1)
+                delta += 1
+                case = 12
+
+            if record_state:
+                yield IterationRecord(iterations, case, delta, int(a), int(b), int(u), int(l), int(y), int(n))
+            else:
+                yield IterationRecord(iterations, case, delta, None, None, None, None, None, None)
+
+        if constant_time:
+            break_condition = iterations < constant_time_iterations
+        else:
+            break_condition = a != 0 and b != 0
+
+    gcd, u, l = xgcd_post_processing(a, b, u, l, y, n, k, even_case,
+                                     start_a, start_b, min_pair_bezout)
+
+    return gcd, u, l, iterations
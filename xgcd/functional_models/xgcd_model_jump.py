@@ -0,0 +1,191 @@
+import math
+
+from xgcd.functional_models.xgcd_helper import inverse_mod_pow2
+from xgcd.functional_models.xgcd_model_fast import xgcd_pre_processing, xgcd_post_processing
+
+
+# Jump-ahead engine for the XGCD functional model
+#
+# The case taken in each iteration only depends on a, b, a + b mod 8 and the
+# sign of delta, and the Bezout coefficient corrections (+og_b / -og_a) only
+# depend on u, y mod 8. So jump_iterations iterations can be decided from the
+# low bits of a, b, u, y alone (each iteration shifts out at most 3 bits). While
+# deciding, we accumulate the combined update (scaled by 2^shift so that every
+# entry is an integer):
+#
+#   2^shift * a' = t_aa * a + t_ab * b
+#   2^shift * b' = t_ba * a + t_bb * b
+#   2^shift * u' = t_aa * u + t_ab * y + c_u * og_b
+#   2^shift * y' = t_ba * u + t_bb * y + c_y * og_b
+#   2^shift * l' = t_aa * l + t_ab * n - c_u * og_a
+#   2^shift * n' = t_ba * l + t_bb * n - c_y * og_a
+#
+# and then apply it once to the full width variables, similar to the
+# divstep matrices in Bernstein-Yang safegcd.
+
+
+def jump_matrix(a, b, u, y, delta, og_b, inv_og_b, count,
+                even_8, even_4, odd_8, odd_4, odd_2, cases):
+    # a, b, u, y, og_b only need to be correct in the lowest 3 * count + 3 bits
+
+    t_aa, t_ab, t_ba, t_bb = 1, 0, 0, 1
+    c_u, c_y = 0, 0
+    shift = 0
+
+    for i in range(count):
+        # update_a: a, u (and l) are updated with (a + sel * b) / 2^s
+        #           otherwise b, y (and n) are updated with (sel * a + b) / 2^s,
+        #           xgcd_model updates b with (a - b) in the subtract cases
+        if even_8 and (a & 7) == 0:
+            update_a, sel, s, delta = True, 0, 3, delta - 3
+            case = 9
+        elif even_4 and (a & 3) == 0:
+            update_a, sel, s, delta = True, 0, 2, delta - 2
+            case = 1
+        elif (a & 1) == 0:
+            update_a, sel, s, delta = True, 0, 1, delta - 1
+            case = 2
+        elif even_8 and (b & 7) == 0:
+            update_a, sel, s, delta = False, 0, 3, delta + 3
+            case = 10
+        elif even_4 and (b & 3) == 0:
+            update_a, sel, s, delta = False, 0, 2, delta + 2
+            case = 3
+        elif (b & 1) == 0:
+            update_a, sel, s, delta = False, 0, 1, delta + 1
+            case = 4
+        elif odd_4:
+            update_a = delta >= 0
+            sel = 1 if ((a + b) & 3) == 0 else -1
+            # (a +/- b) divisible by 8 does one more divide by 2 in the same iteration
+            s = 3 if odd_8 and ((a + sel * b) & 7) == 0 else 2
+            if update_a:
+                delta = delta - (s - 1)
+                case = 5 if sel > 0 else 6
+                extra_case = 16 if sel > 0 else 18
+            else:
+                delta = delta + (s - 1)
+                case = 7 if sel > 0 else 8
+                extra_case = 20 if sel > 0 else 22
+            if cases is not None and s == 3:
+                cases.append(case)
+                case = extra_case
+        elif odd_2:
+            update_a = delta >= 0
+            sel, s = -1, 1
+            if update_a:
+                delta, case = delta - 1, 11
+            else:
+                delta, case = delta + 1, 12
+
+        if cases is not None:
+            cases.append(case)
+
+        if update_a:
+            if sel > 0:
+                a_c, u_c = a + b, u + y
+                t_aa, t_ab, c_u = t_aa + t_ba, t_ab + t_bb, c_u + c_y
+            elif sel < 0:
+                a_c, u_c = a - b, u - y
+                t_aa, t_ab, c_u = t_aa - t_ba, t_ab - t_bb, c_u - c_y
+            else:
+                a_c, u_c = a, u
+            # number of og_b's bezout_update adds while dividing by 2^s
+            m = (-u_c * inv_og_b) & ((1 << s) - 1)
+            a = a_c >> s
+            u = (u_c + m * og_b) >> s
+            c_u += m << shift
+            t_ba, t_bb, c_y = t_ba << s, t_bb << s, c_y << s
+        else:
+            if sel > 0:
+                b_c, y_c = a + b, u + y
+                t_ba, t_bb, c_y = t_aa + t_ba, t_ab + t_bb, c_u + c_y
+            elif sel < 0:
+                b_c, y_c = a - b, u - y
+                t_ba, t_bb, c_y = t_aa - t_ba, t_ab - t_bb, c_u - c_y
+            else:
+                b_c, y_c = b, y
+            m = (-y_c * inv_og_b) & ((1 << s) - 1)
+            b = b_c >> s
+            y = (y_c + m * og_b) >> s
+            c_y += m << shift
+            t_aa, t_ab, c_u = t_aa << s, t_ab << s, c_u << s
+        shift += s
+
+    return t_aa, t_ab, t_ba, t_bb, c_u, c_y, shift, delta
+
+
+def xgcd_model_jump(a,
+                    b,
+                    bit_length=1024,
+                    constant_time=False,
+                    min_pair_bezout=False,
+                    reduction_factor_even=4,
+                    reduction_factor_odd=4,
+                    record_cases=False,
+                    jump_iterations=62):
+
+    assert reduction_factor_even in [2, 4, 8] and reduction_factor_odd in [2, 4, 8], \
+        "xgcd_model_jump supports reduction factors 2, 4 and 8, use xgcd_model or xgcd_iterations for larger factors."
+    assert jump_iterations > 0, "jump_iterations must be positive"
+
+    start_a, start_b = a, b
+
+    iterations = 0
+    cases = [] if record_cases else None
+
+    a, b, k, even_case = xgcd_pre_processing(a, b)
+
+    u, l, y, n = 1, 0, 0, 1
+    delta = 0
+    og_a, og_b = a, b
+    # og_b is odd
+    inv_og_b = inverse_mod_pow2(og_b, 8)
+
+    flags = (reduction_factor_even >= 8,
+             reduction_factor_even >= 4,
+             reduction_factor_odd >= 8,
+             reduction_factor_odd >= 4,
+             reduction_factor_odd == 2)
+
+    def jump(count):
+        nonlocal a, b, u, l, y, n, delta, iterations
+        mask = (1 << (3 * count + 3)) - 1
+        t_aa, t_ab, t_ba, t_bb, c_u, c_y, shift, delta = \
+            jump_matrix(a & mask, b & mask, u & mask, y & mask, delta,
+                        og_b & mask, inv_og_b, count, *flags, cases)
+        a, b = (t_aa * a + t_ab * b) >> shift, (t_ba * a + t_bb * b) >> shift
+        u, y = (t_aa * u + t_ab * y + c_u * og_b) >> shift, (t_ba * u + t_bb * y + c_y * og_b) >> shift
+        l, n = (t_aa * l + t_ab * n - c_u * og_a) >> shift, (t_ba * l + t_bb * n - c_y * og_a) >> shift
+        iterations += count
+
+    if constant_time:
+        constant_time_iterations = math.ceil(1.51 * bit_length + 1)
+        # xgcd_model always runs at least one iteration
+        while True:
+            jump(min(jump_iterations, max(1, constant_time_iterations - iterations)))
+            if iterations >= constant_time_iterations:
+                break
+    else:
+        # xgcd_model samples the termination condition every 4 iterations,
+        # and once a or b is 0 it stays 0, so if a or b is 0 after a jump,
+        # redo the jump 4 iterations at a time to find where it stopped
+        while True:
+            snapshot = (a, b, u, l, y, n, delta, iterations, len(cases) if record_cases else 0)
+            jump(jump_iterations)
+            if a != 0 and b != 0:
+                continue
+
+            a, b, u, l, y, n, delta, iterations, num_cases = snapshot
+            if record_cases:
+                del cases[num_cases:]
+            while True:
+                jump(4 - iterations % 4)
+                if a == 0 or b == 0:
+                    break
+            break
+
+    gcd, u, l = xgcd_post_processing(a, b, u, l, y, n, k, even_case,
+                                     start_a, start_b, min_pair_bezout)
+
+    return gcd, u, l, iterations, cases if record_cases else []
@@ -0,0 +1,177 @@
+import zipfile
+
+import numpy as np
+
+from xgcd.functional_models.xgcd_model_fast import xgcd_model_fast, xgcd_pre_processing
+
+
+# Structured batch results for the XGCD functional model
+#
+# xgcd_model_many runs xgcd_model_fast on many (A, B) pairs and returns one
+# row per pair in a NumPy structured array (or a dict of columns), so results
+# can be analyzed with vectorized NumPy operations (histograms, percentiles,
+# comparisons against hardware cycle counts, ...):
+#
+# - a, b, gcd, bezout_a, bezout_b: big integers stored as num_words 64-bit
+#   two's complement words (least significant first), see words_to_ints
+# - iterations: number of iterations (cycles) from the model
+# - even_case: EvenCase of the inputs (A_EVEN, B_EVEN or BOTH_ODD)
+#
+# write_xgcd_model_many streams the rows to a .npy file (one array) or a
+# .npz file (one array per chunk) chunk_size rows at a time, so the results
+# never have to fit in memory, and read_xgcd_model_many loads either back.
+
+int_fields = ["a", "b", "gcd", "bezout_a", "bezout_b"]
+
+
+def num_words(bit_length):
+    # Bezout coefficients and pre-processed inputs need a few bits more than
+    # bit_length (see xgcd_widths.py), plus the sign bit
+    return (bit_length + 8) // 64 + 1
+
+
+def result_dtype(bit_length):
+    words = num_words(bit_length)
+    return np.dtype([(name, "<u8", (words,)) for name in int_fields] +
+                    [("iterations", "<i4"), ("even_case", "i1")])
+
+
+def ints_to_words(values, words):
+    # (len(values), words) uint64 array of two's complement words
+    try:
+        data = b"".join(int(x).to_bytes(8 * words, "little", signed=True) for x in values)
+    except OverflowError:
+        raise ValueError(f"Value does not fit in {words} 64-bit words.")
+    return np.frombuffer(data, dtype="<u8").reshape(-1, words)
+
+
+def words_to_ints(column):
+    # Python ints for a big integer column (e.g. results["bezout_a"])
+    column = np.ascontiguousarray(column, dtype="<u8")
+    row_bytes = column.shape[-1] * 8
+    data = column.tobytes()
+    return [int.from_bytes(data[i:i + row_bytes], "little", signed=True)
+            for i in range(0, len(data), row_bytes)]
+
+
+def fill_rows(rows, pairs, bit_length, **kwargs):
+    # runs the model on pairs and fills the preallocated rows
+    words = rows.dtype["a"].shape[0]
+    results = [xgcd_model_fast(A, B, bit_length=bit_length, **kwargs) for (A, B) in pairs]
+    rows["a"] = ints_to_words([A for (A, B) in pairs], words)
+    rows["b"] = ints_to_words([B for (A, B) in pairs], words)
+    for i, name in enumerate(["gcd", "bezout_a", "bezout_b"]):
+        rows[name] = ints_to_words([result[i] for result in results], words)
+    rows["iterations"] = [result[3] for result in results]
+    rows["even_case"] = [int(xgcd_pre_processing(A, B)[3]) for (A, B) in pairs]
+
+
+def iter_chunks(pairs, chunk_size):
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def xgcd_model_many(pairs,
+                    bit_length=1024,
+                    constant_time=False,
+                    min_pair_bezout=False,
+                    reduction_factor_even=4,
+                    reduction_factor_odd=4,
+                    columns=False,
+                    count=None,
+                    chunk_size=4096):
+    # pairs: iterable of (A, B), count: number of pairs if pairs has no len
+    # returns a structured array with one row per pair, or a dict of column
+    # arrays if columns is set
+
+    kwargs = dict(constant_time=constant_time,
+                  min_pair_bezout=min_pair_bezout,
+                  reduction_factor_even=reduction_factor_even,
+                  reduction_factor_odd=reduction_factor_odd)
+    dtype = result_dtype(bit_length)
+
+    if count is None and hasattr(pairs, "__len__"):
+        count = len(pairs)
+
+    if count is not None:
+        results = np.empty(count, dtype=dtype)
+        start = 0
+        for chunk in iter_chunks(pairs, chunk_size):
+            assert start + len(chunk) <= count, f"More than count = {count} pairs."
+            fill_rows(results[start:start + len(chunk)], chunk, bit_length, **kwargs)
+            start += len(chunk)
+        results = results[:start]
+    else:
+        chunks = []
+        for chunk in iter_chunks(pairs, chunk_size):
+            rows = np.empty(len(chunk), dtype=dtype)
+            fill_rows(rows, chunk, bit_length, **kwargs)
+            chunks.append(rows)
+        results = np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+    if columns:
+        return {name: results[name] for name in dtype.names}
+    return results
+
+
+def npy_header(dtype, count, length=None):
+    # .npy version 1.0 header, padded with spaces to length bytes
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(dtype), count)
+    if length is None:
+        # same as numpy, the data starts at a multiple of 64 bytes
+        length = -(-(10 + len(header) + 1) // 64) * 64
+    header = header + " " * (length - 10 - len(header) - 1) + "\n"
+    return np.lib.format.magic(1, 0) + len(header).to_bytes(2, "little") + header.encode("latin1")
+
+
+def write_xgcd_model_many(path,
+                          pairs,
+                          bit_length=1024,
+                          chunk_size=4096,
+                          **kwargs):
+    # streams xgcd_model_many results for pairs to path (.npy or .npz), one
+    # chunk of rows at a time, returns the number of rows written
+    # kwargs are passed to xgcd_model_many
+    dtype = result_dtype(bit_length)
+    count = 0
+
+    if path.endswith(".npz"):
+        with zipfile.ZipFile(path, "w") as f:
+            for i, chunk in enumerate(iter_chunks(pairs, chunk_size)):
+                rows = xgcd_model_many(chunk, bit_length=bit_length, **kwargs)
+                with f.open(f"chunk_{i:06d}.npy", "w", force_zip64=True) as g:
+                    np.lib.format.write_array(g, rows)
+                count += len(rows)
+            if count == 0:
+                with f.open("chunk_000000.npy", "w") as g:
+                    np.lib.format.write_array(g, np.empty(0, dtype=dtype))
+
+    else:
+        # the header is written again with the number of rows at the end,
+        # reserve room for the largest count
+        header_length = len(npy_header(dtype, 10 ** 18))
+        with open(path, "wb") as f:
+            f.write(npy_header(dtype, 10 ** 18))
+            for chunk in iter_chunks(pairs, chunk_size):
+                rows = xgcd_model_many(chunk, bit_length=bit_length, **kwargs)
+                f.write(rows.tobytes())
+                count += len(rows)
+            f.seek(0)
+            f.write(npy_header(dtype, count, header_length))
+
+    return count
+
+
+def read_xgcd_model_many(path, mmap_mode=None):
+    # structured array written by write_xgcd_model_many (.npy files can be
+    # memory-mapped with mmap_mode="r")
+    if path.endswith(".npz"):
+        with np.load(path) as f:
+            return np.concatenate([f[name] for name in sorted(f.files)])
+    return np.load(path, mmap_mode=mmap_mode)
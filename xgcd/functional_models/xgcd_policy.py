@@ -0,0 +1,167 @@
+import math
+import random
+
+
+# Update selection (delta) policies for the XGCD iterations loop
+#
+# When a and b are both odd, xgcd_model updates a (with (a +/- b) / 4) if
+# policy.update_a(delta, a, b) is True and b otherwise. delta estimates
+# log2(b) - log2(a) and is updated by the policy after every update:
+#
+# - shift_a(delta, s), shift_b(delta, s): a (b) was divided by 2^s
+# - odd_a(delta), odd_b(delta): a (b) was replaced by (a +/- b) / 4 (or
+#   (a - b) / 2 for odd reduction factor 2), followed by shift_a (shift_b)
+#   if (a +/- b) was divisible by 8 or more
+#
+# DeltaPolicy is the rule in xgcd_model and XGCDTop.update_delta, the others
+# are control logic variants to compare (see compare_policies).
+
+
+class DeltaPolicy:
+    # update a if delta >= 0, delta moves by the number of bits shifted
+    # (1 for the first 2 bits of an odd update)
+
+    name = "delta"
+
+    def update_a(self, delta, a, b):
+        return delta >= 0
+
+    def shift_a(self, delta, s):
+        return delta - s
+
+    def shift_b(self, delta, s):
+        return delta + s
+
+    def odd_a(self, delta):
+        return delta - 1
+
+    def odd_b(self, delta):
+        return delta + 1
+
+
+class ThresholdPolicy(DeltaPolicy):
+    # update a if delta >= threshold
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.name = f"threshold_{threshold}"
+
+    def update_a(self, delta, a, b):
+        return delta >= self.threshold
+
+
+class SaturatingDeltaPolicy(DeltaPolicy):
+    # delta saturates at the range of a bit_width-bit signed register
+    # (instead of needing clog2(bit_length) + 1 bits)
+
+    def __init__(self, bit_width):
+        self.min_delta = -2 ** (bit_width - 1)
+        self.max_delta = 2 ** (bit_width - 1) - 1
+        self.name = f"saturating_{bit_width}"
+
+    def saturate(self, delta):
+        return min(max(delta, self.min_delta), self.max_delta)
+
+    def shift_a(self, delta, s):
+        return self.saturate(delta - s)
+
+    def shift_b(self, delta, s):
+        return self.saturate(delta + s)
+
+    def odd_a(self, delta):
+        return self.saturate(delta - 1)
+
+    def odd_b(self, delta):
+        return self.saturate(delta + 1)
+
+
+class BitLengthPolicy(DeltaPolicy):
+    # update the larger of a, b by comparing their exact bit lengths (delta is
+    # still tracked but not used)
+
+    name = "bit_length"
+
+    def update_a(self, delta, a, b):
+        return abs(a).bit_length() >= abs(b).bit_length()
+
+
+def default_policies(bit_length):
+    return [DeltaPolicy(),
+            BitLengthPolicy(),
+            ThresholdPolicy(1),
+            ThresholdPolicy(-1),
+            SaturatingDeltaPolicy(4),
+            SaturatingDeltaPolicy(max(1, math.ceil(math.log2(bit_length))) + 1)]
+
+
+def compare_policies(policies,
+                     tests,
+                     bit_length=1024,
+                     reduction_factor_even=4,
+                     reduction_factor_odd=4):
+    # runs xgcd_model with each policy on the same tests, returns a dict of
+    # policy name: (average iterations, max iterations, failures), where
+    # failures is the number of tests that did not finish correctly within the
+    # constant-time number of iterations (1.51 * bit_length + 1), the average
+    # and max only include tests that finish within 4x that (None if none do)
+    from xgcd.functional_models.xgcd_model import xgcd_model
+
+    constant_time_iterations = math.ceil(1.51 * bit_length + 1)
+    kwargs = dict(bit_length=bit_length,
+                  reduction_factor_even=reduction_factor_even,
+                  reduction_factor_odd=reduction_factor_odd)
+
+    results = {}
+    for policy in policies:
+        iterations = []
+        failures = 0
+        for (A, B) in tests:
+            try:
+                iterations.append(xgcd_model(A, B, policy=policy, max_iterations=4 * constant_time_iterations, **kwargs)[3])
+            except RuntimeError:
+                pass
+            try:
+                xgcd_model(A, B, constant_time=True, policy=policy, **kwargs)
+            except AssertionError:
+                failures += 1
+        if iterations:
+            results[policy.name] = (sum(iterations) / len(iterations), max(iterations), failures)
+        else:
+            results[policy.name] = (None, None, failures)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from xgcd.functional_models.xgcd_widths import adversarial_inputs
+
+    parser = argparse.ArgumentParser(description="Compare XGCD update selection (delta) policies")
+    parser.add_argument('--bit_length', type=int, default=1024, help="bitwidth for XGCD")
+    parser.add_argument('--num_tests', type=int, default=200, help="number of random tests (on top of the adversarial inputs)")
+    parser.add_argument('--reduction_factor_even', type=int, default=8, help="reduction factor for even cases")
+    parser.add_argument('--reduction_factor_odd', type=int, default=4, help="reduction factor for odd cases")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the random tests")
+    args = parser.parse_args()
+
+    print(args)
+
+    rng = random.Random(args.seed)
+    tests = adversarial_inputs(args.bit_length)
+    tests += [(rng.randint(1, 2 ** args.bit_length - 1), rng.randint(1, 2 ** args.bit_length - 1)) for i in range(args.num_tests)]
+
+    results = compare_policies(default_policies(args.bit_length),
+                               tests,
+                               bit_length=args.bit_length,
+                               reduction_factor_even=args.reduction_factor_even,
+                               reduction_factor_odd=args.reduction_factor_odd)
+
+    constant_time_iterations = math.ceil(1.51 * args.bit_length + 1)
+    print()
+    print(f"{len(tests)} tests, constant-time iterations: {constant_time_iterations}")
+    print(f"{'policy':>16} {'average':>9} {'max':>6} {'max/bit':>8} {'constant-time failures':>23}")
+    for name, (average, max_iterations, failures) in results.items():
+        if average is None:
+            print(f"{name:>16} {'-':>9} {'-':>6} {'-':>8} {failures:>23}")
+            continue
+        print(f"{name:>16} {average:>9.1f} {max_iterations:>6} {max_iterations / args.bit_length:>8.3f} {failures:>23}")
@@ -0,0 +1,85 @@
+import math
+
+
+# Running aggregates and result sinks for main_testing
+#
+# Results are folded into IterationStats one test at a time (and optionally
+# written to a CSV or JSONL file as they are produced), so memory does not
+# grow with the number of tests. csv and json are only imported when a
+# ResultsWriter is created.
+
+
+def percentile_rank(count, p):
+    # index of the nearest-rank p-th percentile in count sorted values
+    return max(0, math.ceil(p / 100 * count) - 1)
+
+
+def percentile(sorted_values, p):
+    # nearest-rank percentile of sorted values
+    return sorted_values[percentile_rank(len(sorted_values), p)]
+
+
+class IterationStats:
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        # number of tests for each number of iterations
+        self.histogram = {}
+
+    def add(self, iterations):
+        self.count += 1
+        self.total += iterations
+        self.max = max(self.max, iterations)
+        self.histogram[iterations] = self.histogram.get(iterations, 0) + 1
+
+    def merge(self, stats):
+        self.count += stats.count
+        self.total += stats.total
+        self.max = max(self.max, stats.max)
+        for iterations, count in stats.histogram.items():
+            self.histogram[iterations] = self.histogram.get(iterations, 0) + count
+
+    def mean(self):
+        return self.total / self.count
+
+    def percentile(self, p):
+        # nearest-rank percentile from the histogram
+        rank = percentile_rank(self.count, p)
+        for iterations in sorted(self.histogram):
+            rank -= self.histogram[iterations]
+            if rank < 0:
+                return iterations
+
+
+class ResultsWriter:
+    # writes one row (dict with keys fields) per test, as JSON lines if path
+    # ends with .jsonl and CSV otherwise
+
+    def __init__(self, path, fields):
+        self.fields = fields
+        self.jsonl = path.endswith(".jsonl")
+        self.file = open(path, "w", newline="")
+        if self.jsonl:
+            import json
+            self.dumps = json.dumps
+        else:
+            import csv
+            self.writer = csv.DictWriter(self.file, fieldnames=fields)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.jsonl:
+            self.file.write(self.dumps(row) + "\n")
+        else:
+            self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
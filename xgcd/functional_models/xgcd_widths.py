@@ -0,0 +1,257 @@
+import argparse
+import math
+import random
+
+from xgcd.functional_models.xgcd_helper import *
+from xgcd.functional_models.xgcd_model_fast import xgcd_pre_processing
+
+
+# Register bit-width tracking for the XGCD datapath
+#
+# xgcd_model_widths runs the XGCD iterations (same cases as xgcd_model) and
+# records the maximum signed (two's complement) width reached by each
+# variable, including the intermediates the hardware computes in carry-save
+# form before shifting:
+#
+# - og_a, og_b: inputs to the iterations loop (after pre-processing)
+# - og_multiple: m * og_b and m * og_a added to make u, l divisible by 2^shift
+#   (og_b2 ... og_b7 in PreProcessing for reduction factors up to 8)
+# - a_b, u_y, l_n: a +/- b, u +/- y, l +/- n before shifting
+# - u_og, l_og: u +/- y + m * og_b and l +/- n - m * og_a before shifting in
+#   odd updates (updates that divide by 8 first divide by 4, as in
+#   UpdateBezoutOdd)
+# - u_og_even, l_og_even: u + m * og_b and l - m * og_a before shifting in even
+#   updates (Update_Bezout)
+# - a, b, u, l, y, n: values stored in the registers after each update
+# - bezout: sums computed by PostProcessing (u + y, l + n, ...)
+# - delta: only while a and b are both non-zero (delta is only used to pick
+#   the odd case, and wraps around in the hardware in constant-time idle
+#   iterations)
+#
+# All of these share inter_bit_length in XGCDTop, so the recommended
+# inter_bit_length is the maximum over them (see recommend_widths), plus one
+# guard bit for u_og_even and l_og_even: the CSA emulator (xgcd_csa_emulator)
+# shows that the CSA shift of u + m * og_b in Update_Bezout is not exact
+# without it for the adversarial inputs (carry + sum can wrap around), while
+# all the other values shift exactly at their own width.
+
+datapath_variables = ["og_a", "og_b", "og_multiple", "a_b", "u_y", "l_n", "u_og", "l_og",
+                      "a", "b", "u", "l", "y", "n", "bezout"]
+guard_bit_variables = ["u_og_even", "l_og_even"]
+
+
+def signed_width(x):
+    # number of bits to store x as a two's complement signed value
+    return (x if x >= 0 else ~x).bit_length() + 1
+
+
+class WidthStats:
+
+    def __init__(self):
+        self.count = 0
+        # maximum signed width of each variable
+        self.widths = {}
+
+    def record(self, name, value):
+        width = signed_width(value)
+        if width > self.widths.get(name, 0):
+            self.widths[name] = width
+
+    def merge(self, stats):
+        self.count += stats.count
+        for name, width in stats.widths.items():
+            self.widths[name] = max(self.widths.get(name, 0), width)
+
+
+def xgcd_model_widths(a,
+                      b,
+                      stats,
+                      bit_length=1024,
+                      constant_time=False,
+                      reduction_factor_even=4,
+                      reduction_factor_odd=4):
+
+    stats.count += 1
+    iterations = 0
+
+    a, b, k, even_case = xgcd_pre_processing(a, b)
+    stats.record("og_a", a)
+    stats.record("og_b", b)
+
+    u, l, y, n = 1, 0, 0, 1
+    delta = 0
+    table = bezout_table(b, a)
+    log_even = log2_reduction_factor(reduction_factor_even)
+    log_odd = log2_reduction_factor(reduction_factor_odd)
+
+    if constant_time:
+        constant_time_iterations = math.ceil(1.51 * bit_length + 1)
+
+    def divide(u_y, l_n, s, suffix=""):
+        # same as bezout_div_pow2, recording the values before the shift
+        m_og_b, m_og_a = bezout_table_lookup(table, u_y, s)
+        stats.record("og_multiple", m_og_b)
+        stats.record("og_multiple", m_og_a)
+        u_og, l_og = u_y + m_og_b, l_n - m_og_a
+        stats.record("u_og" + suffix, u_og)
+        stats.record("l_og" + suffix, l_og)
+        return u_og >> s, l_og >> s
+
+    sample_break_iterations = 1 if constant_time else 4
+    break_condition = True
+    while break_condition:
+        for i in range(sample_break_iterations):
+
+            iterations += 1
+
+            if a != 0 and b != 0:
+                stats.record("delta", delta)
+
+            # see xgcd_model for a description of each case
+            if (a & 1) == 0:
+                s = trailing_zeros(a, log_even)
+                a >>= s
+                u, l = divide(u, l, s, "_even")
+                delta -= s
+
+            elif (b & 1) == 0:
+                s = trailing_zeros(b, log_even)
+                b >>= s
+                y, n = divide(y, n, s, "_even")
+                delta += s
+
+            else:
+                if log_odd >= 2 and ((a + b) & 3) == 0:
+                    a_b, u_y, l_n = a + b, u + y, l + n
+                else:
+                    a_b, u_y, l_n = a - b, u - y, l - n
+                stats.record("a_b", a_b)
+                stats.record("u_y", u_y)
+                stats.record("l_n", l_n)
+
+                # reduction factor 2 only divides (a - b) by 2
+                s = trailing_zeros(a_b, log_odd) if log_odd >= 2 else 1
+
+                # the hardware divides u +/- y by 4 and then by 2 for 8
+                # (see UpdateBezoutOdd), instead of adding up to 7 * og_b
+                u_y, l_n = divide(u_y, l_n, 2) if s > 2 else (u_y, l_n)
+
+                if delta >= 0:
+                    a = a_b >> s
+                    u, l = divide(u_y, l_n, s - 2) if s > 2 else divide(u_y, l_n, s)
+                    delta -= max(s - 1, 1)
+                else:
+                    b = a_b >> s
+                    y, n = divide(u_y, l_n, s - 2) if s > 2 else divide(u_y, l_n, s)
+                    delta += max(s - 1, 1)
+
+            for name, value in (("a", a), ("b", b), ("u", u), ("l", l), ("y", y), ("n", n)):
+                stats.record(name, value)
+
+        if constant_time:
+            break_condition = iterations < constant_time_iterations
+        else:
+            break_condition = a != 0 and b != 0
+
+    # same sums as xgcd_post_processing
+    u, l = u + y, l + n
+    stats.record("bezout", u)
+    stats.record("bezout", l)
+    if even_case != EvenCase.BOTH_ODD:
+        stats.record("bezout", u + l)
+
+    return iterations
+
+
+def adversarial_inputs(bit_length):
+    # corner cases for register widths: extreme magnitudes, long runs of even
+    # or odd cases, and consecutive Fibonacci numbers (most subtract steps)
+    max_value = 2 ** bit_length - 1
+    half = 2 ** (bit_length - 1)
+    pairs = [(max_value, 1), (1, max_value),
+             (max_value, max_value), (max_value, max_value - 2),
+             (max_value, max_value - 1), (max_value - 1, max_value),
+             (max_value, half), (half, max_value),
+             (half, 1), (1, half),
+             (half + 1, half - 1), (half - 1, half + 1),
+             (max_value, 3), (3, max_value),
+             (max_value, half + 1), (half + 1, max_value)]
+
+    # alternating bit patterns
+    pattern = int("10" * bit_length, 2) & max_value
+    pairs += [(pattern, max_value), (max_value, pattern), (pattern | 1, (pattern >> 1) | 1)]
+
+    f0, f1 = 1, 1
+    while f0 + f1 <= max_value:
+        f0, f1 = f1, f0 + f1
+    pairs += [(f1, f0), (f0, f1)]
+
+    return pairs
+
+
+def width_sweep(bit_length,
+                num_tests,
+                reduction_factors,
+                constant_time=False,
+                seed=0):
+    # reduction_factors: list of (reduction_factor_even, reduction_factor_odd)
+    # returns a WidthStats for each configuration over random and adversarial
+    # inputs (the same inputs for every configuration)
+    rng = random.Random(seed)
+    pairs = adversarial_inputs(bit_length)
+    pairs += [(rng.randint(1, 2 ** bit_length - 1), rng.randint(1, 2 ** bit_length - 1)) for i in range(num_tests)]
+
+    results = {}
+    for reduction_factor_even, reduction_factor_odd in reduction_factors:
+        stats = WidthStats()
+        for A, B in pairs:
+            xgcd_model_widths(A, B, stats,
+                              bit_length=bit_length,
+                              constant_time=constant_time,
+                              reduction_factor_even=reduction_factor_even,
+                              reduction_factor_odd=reduction_factor_odd)
+        results[(reduction_factor_even, reduction_factor_odd)] = stats
+    return results
+
+
+def recommend_widths(stats, margin=0):
+    # returns (inter_bit_length, delta_bit_width) for XGCDTop, margin adds
+    # guard bits on top of the widths observed
+    inter_bit_length = max([stats.widths[name] for name in datapath_variables if name in stats.widths] +
+                           [stats.widths[name] + 1 for name in guard_bit_variables if name in stats.widths])
+    delta_bit_width = max(stats.widths.get("delta", 0), 2)
+    return inter_bit_length + margin, delta_bit_width + margin
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="XGCD register bit-width tracking")
+    parser.add_argument('--bit_length', type=int, default=1024, help="bitwidth for XGCD")
+    parser.add_argument('--num_tests', type=int, default=1000, help="number of random tests (on top of the adversarial inputs)")
+    parser.add_argument('--constant_time', default=False, action="store_true", help="(default: False) constant-time XGCD (worst-case number of iterations)")
+    parser.add_argument('--reduction_factors', type=str, default="2:2,4:4,8:4,8:8", help="comma-separated even:odd reduction factor configurations")
+    parser.add_argument('--margin', type=int, default=0, help="guard bits added to the recommended widths")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the random tests")
+    args = parser.parse_args()
+
+    print(args)
+
+    reduction_factors = [tuple(int(x) for x in config.split(":")) for config in args.reduction_factors.split(",")]
+    results = width_sweep(args.bit_length,
+                          args.num_tests,
+                          reduction_factors,
+                          constant_time=args.constant_time,
+                          seed=args.seed)
+
+    default_inter_bit_length = args.bit_length + 5
+    default_delta_bit_width = max(1, math.ceil(math.log2(args.bit_length))) + 1
+    print()
+    print(f"Default widths: inter_bit_length = {default_inter_bit_length}, delta_bit_width = {default_delta_bit_width}")
+    for (reduction_factor_even, reduction_factor_odd), stats in results.items():
+        inter_bit_length, delta_bit_width = recommend_widths(stats, margin=args.margin)
+        print()
+        print(f"Reduction factors even = {reduction_factor_even}, odd = {reduction_factor_odd} ({stats.count} tests)")
+        for name in datapath_variables + guard_bit_variables + ["delta"]:
+            print(f"  {name}: {stats.widths[name]} bits")
+        print(f"  recommended: inter_bit_length = {inter_bit_length} (bit_length + {inter_bit_length - args.bit_length}), "
+              f"delta_bit_width = {delta_bit_width}")
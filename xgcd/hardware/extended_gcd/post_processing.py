@@ -9,13 +9,21 @@ class PostProcessing(Generator):
                  inter_bit_length,
                  bit_length,
                  DW=True,
-                 debug_print=False):
+                 debug_print=False,
+                 deferred_halving=False,
+                 bezout_bit_length=None,
+                 scale_bit_width=None):
         super().__init__(f"PostProcessing", debug=True)
 
         self.inter_bit_length = inter_bit_length
         self.bit_length = bit_length
         self.DW = DW
         self.debug_print = debug_print
+        # deferred halving: u, l, y, n are scaled by 2^scale and
+        # bezout_bit_length bits wide, see add_deferred_halving
+        self.deferred_halving = deferred_halving
+        self.bezout_bit_length = self.inter_bit_length if bezout_bit_length is None else bezout_bit_length
+        self.scale_bit_width = scale_bit_width
 
         self.clk = self.clock("clk")
         self.rst_n = self.reset("rst_n", 1)
@@ -23,14 +31,14 @@ class PostProcessing(Generator):
         self.a_out_carry_preshift = self.input("a_out_carry_preshift", self.inter_bit_length)
         self.a_out_sum_preshift = self.input("a_out_sum_preshift", self.inter_bit_length)
 
-        self.u_carry_in = self.input("u_carry_in", self.inter_bit_length)
-        self.u_sum_in = self.input("u_sum_in", self.inter_bit_length)
-        self.y_carry_in = self.input("y_carry_in", self.inter_bit_length)
-        self.y_sum_in = self.input("y_sum_in", self.inter_bit_length)
-        self.n_carry_in = self.input("n_carry_in", self.inter_bit_length)
-        self.n_sum_in = self.input("n_sum_in", self.inter_bit_length)
-        self.l_carry_in = self.input("l_carry_in", self.inter_bit_length)
-        self.l_sum_in = self.input("l_sum_in", self.inter_bit_length)
+        self.u_carry_in = self.input("u_carry_in", self.bezout_bit_length)
+        self.u_sum_in = self.input("u_sum_in", self.bezout_bit_length)
+        self.y_carry_in = self.input("y_carry_in", self.bezout_bit_length)
+        self.y_sum_in = self.input("y_sum_in", self.bezout_bit_length)
+        self.n_carry_in = self.input("n_carry_in", self.bezout_bit_length)
+        self.n_sum_in = self.input("n_sum_in", self.bezout_bit_length)
+        self.l_carry_in = self.input("l_carry_in", self.bezout_bit_length)
+        self.l_sum_in = self.input("l_sum_in", self.bezout_bit_length)
 
         self.done_inter = self.input("done_inter", 1)
         self.prev_done_inter = self.var("prev_done_inter", 1)
@@ -41,65 +49,189 @@ class PostProcessing(Generator):
         self.ab_lsb_bl1 = self.var("ab_lsb_bl1", 1)
         self.wire(self.ab_lsb_bl1, self.ab[self.bit_length - 1])
 
-        self.yu_carry = self.var("yu_carry", self.inter_bit_length)
-        self.yu_sum = self.var("yu_sum", self.inter_bit_length)
-        self.y_u = self.var("y_u", self.inter_bit_length)
-        self.wire(self.y_u, self.yu_carry + self.yu_sum)
-        self.neg_y_u = self.var("neg_y_u", self.inter_bit_length)
-        self.wire(self.neg_y_u, ~self.yu_carry + ~self.yu_sum + 2)
-        
-        DW01_csa_4_yu = DW01_csa_4(self.inter_bit_length, True, DW=self.DW)
-        self.add_child("DW01_csa_4_yu",
-                    DW01_csa_4_yu,
-                    a_carry=self.u_carry_in,
-                    a_sum=self.u_sum_in,
-                    b_carry=self.y_carry_in,
-                    b_sum=self.y_sum_in,
-                    final_out_carry=self.yu_carry,
-                    final_out_sum=self.yu_sum)
-
-        self.nl_carry = self.var("nl_carry", self.inter_bit_length)
-        self.nl_sum = self.var("nl_sum", self.inter_bit_length)
-        self.n_l = self.var("n_l", self.inter_bit_length)
-        self.wire(self.n_l, self.nl_carry + self.nl_sum)
-        self.neg_n_l = self.var("neg_n_l", self.inter_bit_length)
-        self.wire(self.neg_n_l, ~self.nl_carry + ~self.nl_sum + 2)
-
-        DW01_csa_4_nl = DW01_csa_4(self.inter_bit_length, True, DW=self.DW)
-        self.add_child("DW01_csa_4_nl",
-                    DW01_csa_4_nl,
-                    a_carry=self.n_carry_in,
-                    a_sum=self.n_sum_in,
-                    b_carry=self.l_carry_in,
-                    b_sum=self.l_sum_in,
-                    final_out_carry=self.nl_carry,
-                    final_out_sum=self.nl_sum)
-
-        self.yunl_carry = self.var("yunl_carry", self.inter_bit_length)
-        self.yunl_sum = self.var("yunl_sum", self.inter_bit_length)
-        self.yunl = self.var("yunl", self.inter_bit_length)
-        self.wire(self.yunl, self.yunl_carry + self.yunl_sum)
-        self.neg_yunl = self.var("neg_yunl", self.inter_bit_length)
-        self.wire(self.neg_yunl, ~self.yunl_carry + ~self.yunl_sum + 2)
-
-        DW01_csa_4_yunl = DW01_csa_4(self.inter_bit_length, True, DW=self.DW)
-        self.add_child("DW01_csa_4_yunl",
-                    DW01_csa_4_yunl,
-                    a_carry=self.nl_carry,
-                    a_sum=self.nl_sum,
-                    b_carry=self.yu_carry,
-                    b_sum=self.yu_sum,
-                    final_out_carry=self.yunl_carry,
-                    final_out_sum=self.yunl_sum)
-
         # Bezout coefficients
         self.bezout_a = self.output("bezout_a", self.inter_bit_length)
         self.bezout_b = self.output("bezout_b", self.inter_bit_length)
         self.done_output = self.output("done_output", 1)
 
-        self.add_code(self.set_bezouts)
-        self.add_code(self.set_done_output)
+        if self.deferred_halving:
+            self.add_deferred_halving()
+        else:
+            self.yu_carry = self.var("yu_carry", self.inter_bit_length)
+            self.yu_sum = self.var("yu_sum", self.inter_bit_length)
+            self.y_u = self.var("y_u", self.inter_bit_length)
+            self.wire(self.y_u, self.yu_carry + self.yu_sum)
+            self.neg_y_u = self.var("neg_y_u", self.inter_bit_length)
+            self.wire(self.neg_y_u, ~self.yu_carry + ~self.yu_sum + 2)
+        
+            DW01_csa_4_yu = DW01_csa_4(self.inter_bit_length, True, DW=self.DW)
+            self.add_child("DW01_csa_4_yu",
+                        DW01_csa_4_yu,
+                        a_carry=self.u_carry_in,
+                        a_sum=self.u_sum_in,
+                        b_carry=self.y_carry_in,
+                        b_sum=self.y_sum_in,
+                        final_out_carry=self.yu_carry,
+                        final_out_sum=self.yu_sum)
+
+            self.nl_carry = self.var("nl_carry", self.inter_bit_length)
+            self.nl_sum = self.var("nl_sum", self.inter_bit_length)
+            self.n_l = self.var("n_l", self.inter_bit_length)
+            self.wire(self.n_l, self.nl_carry + self.nl_sum)
+            self.neg_n_l = self.var("neg_n_l", self.inter_bit_length)
+            self.wire(self.neg_n_l, ~self.nl_carry + ~self.nl_sum + 2)
+
+            DW01_csa_4_nl = DW01_csa_4(self.inter_bit_length, True, DW=self.DW)
+            self.add_child("DW01_csa_4_nl",
+                        DW01_csa_4_nl,
+                        a_carry=self.n_carry_in,
+                        a_sum=self.n_sum_in,
+                        b_carry=self.l_carry_in,
+                        b_sum=self.l_sum_in,
+                        final_out_carry=self.nl_carry,
+                        final_out_sum=self.nl_sum)
+
+            self.yunl_carry = self.var("yunl_carry", self.inter_bit_length)
+            self.yunl_sum = self.var("yunl_sum", self.inter_bit_length)
+            self.yunl = self.var("yunl", self.inter_bit_length)
+            self.wire(self.yunl, self.yunl_carry + self.yunl_sum)
+            self.neg_yunl = self.var("neg_yunl", self.inter_bit_length)
+            self.wire(self.neg_yunl, ~self.yunl_carry + ~self.yunl_sum + 2)
+
+            DW01_csa_4_yunl = DW01_csa_4(self.inter_bit_length, True, DW=self.DW)
+            self.add_child("DW01_csa_4_yunl",
+                        DW01_csa_4_yunl,
+                        a_carry=self.nl_carry,
+                        a_sum=self.nl_sum,
+                        b_carry=self.yu_carry,
+                        b_sum=self.yu_sum,
+                        final_out_carry=self.yunl_carry,
+                        final_out_sum=self.yunl_sum)
+
+            self.add_code(self.set_bezouts)
+            self.add_code(self.set_done_output)
+
         self.add_code(self.set_prev_done_inter)
+
+    def add_deferred_halving(self):
+        # the coefficients of the non-zero one of a, b (u, l if b is 0,
+        # otherwise y, n) satisfy u * og_a + l * og_b = 2^scale * gcd, divide
+        # them by 2^scale modulo og_b (og_a), one halving per cycle: if u is
+        # odd (so is l), add og_b to u and subtract og_a from l, then shift
+        # both right by 1 (same as remove_scale in
+        # functional_models/xgcd_model_deferred.py)
+        self.scale = self.input("scale", self.scale_bit_width)
+        self.b_carry = self.input("b_carry", self.inter_bit_length)
+        self.b_sum = self.input("b_sum", self.inter_bit_length)
+        self.og_a = self.input("og_a", self.inter_bit_length)
+        self.og_b = self.input("og_b", self.inter_bit_length)
+
+        self.b_zero = self.var("b_zero", 1)
+        self.wire(self.b_zero, (self.b_carry + self.b_sum) == 0)
+
+        self.u_scaled = self.var("u_scaled", self.bezout_bit_length)
+        self.l_scaled = self.var("l_scaled", self.bezout_bit_length)
+
+        # halving registers
+        self.u_half = self.var("u_half", self.bezout_bit_length)
+        self.l_half = self.var("l_half", self.bezout_bit_length)
+        self.halvings = self.var("halvings", self.scale_bit_width)
+        self.halved = self.var("halved", 1)
+
+        self.u_half_ogb = self.var("u_half_ogb", self.bezout_bit_length)
+        self.l_half_oga = self.var("l_half_oga", self.bezout_bit_length)
+        self.wire(self.u_half_ogb, self.u_half + concat(const(0, self.bezout_bit_length - self.inter_bit_length), self.og_b))
+        self.wire(self.l_half_oga, self.l_half - concat(const(0, self.bezout_bit_length - self.inter_bit_length), self.og_a))
+
+        # results (inter_bit_length bits after halving)
+        self.u_final = self.var("u_final", self.inter_bit_length)
+        self.l_final = self.var("l_final", self.inter_bit_length)
+        self.wire(self.u_final, self.u_half[self.inter_bit_length - 1, 0])
+        self.wire(self.l_final, self.l_half[self.inter_bit_length - 1, 0])
+        self.ul_final = self.var("ul_final", self.inter_bit_length)
+        self.wire(self.ul_final, self.u_final + self.l_final)
+
+        self.add_code(self.set_scaled)
+        self.add_code(self.set_halving)
+        self.add_code(self.set_halved)
+        self.add_code(self.set_bezouts_deferred)
+        self.add_code(self.set_done_output_deferred)
+
+    @always_comb
+    def set_scaled(self):
+        if self.b_zero:
+            self.u_scaled = self.u_carry_in + self.u_sum_in
+            self.l_scaled = self.l_carry_in + self.l_sum_in
+        else:
+            self.u_scaled = self.y_carry_in + self.y_sum_in
+            self.l_scaled = self.n_carry_in + self.n_sum_in
+
+    @always_ff((posedge, "clk"), (negedge, "rst_n"))
+    def set_halving(self):
+        if ~self.rst_n:
+            self.u_half = 0
+            self.l_half = 0
+            self.halvings = 0
+        elif self.done_inter & ~self.prev_done_inter:
+            self.u_half = self.u_scaled
+            self.l_half = self.l_scaled
+            self.halvings = self.scale
+        elif self.done_inter & (self.halvings != 0):
+            # arithmetic right shift
+            if self.u_half[0]:
+                self.u_half = concat(self.u_half_ogb[self.bezout_bit_length - 1], self.u_half_ogb[self.bezout_bit_length - 1, 1])
+                self.l_half = concat(self.l_half_oga[self.bezout_bit_length - 1], self.l_half_oga[self.bezout_bit_length - 1, 1])
+            else:
+                self.u_half = concat(self.u_half[self.bezout_bit_length - 1], self.u_half[self.bezout_bit_length - 1, 1])
+                self.l_half = concat(self.l_half[self.bezout_bit_length - 1], self.l_half[self.bezout_bit_length - 1, 1])
+            self.halvings = self.halvings - 1
+
+    @always_ff((posedge, "clk"), (negedge, "rst_n"))
+    def set_halved(self):
+        if ~self.rst_n:
+            self.halved = 0
+        elif ~self.done_inter | ~self.prev_done_inter:
+            self.halved = 0
+        elif self.halvings == 0:
+            self.halved = 1
+
+    @always_ff((posedge, "clk"), (negedge, "rst_n"))
+    def set_done_output_deferred(self):
+        if ~self.rst_n:
+            self.done_output = 0
+        else:
+            self.done_output = self.halved
+
+    @always_ff((posedge, "clk"), (negedge, "rst_n"))
+    def set_bezouts_deferred(self):
+        if ~self.rst_n:
+            self.bezout_a = 0
+            self.bezout_b = 0
+        elif ~self.halved:
+            self.bezout_a = 0
+            self.bezout_b = 0
+        # same even cases and sign as set_bezouts
+        elif self.even_case == 2:
+            if self.ab_lsb_bl1:
+                self.bezout_a = ~self.ul_final + 1
+                self.bezout_b = ~self.l_final + 1
+            else:
+                self.bezout_a = self.ul_final
+                self.bezout_b = self.l_final
+        elif self.even_case == 1:
+            if self.ab_lsb_bl1:
+                self.bezout_a = ~self.u_final + 1
+                self.bezout_b = ~self.ul_final + 1
+            else:
+                self.bezout_a = self.u_final
+                self.bezout_b = self.ul_final
+        else:
+            if self.ab_lsb_bl1:
+                self.bezout_a = ~self.u_final + 1
+                self.bezout_b = ~self.l_final + 1
+            else:
+                self.bezout_a = self.u_final
+                self.bezout_b = self.l_final
     
     @always_ff((posedge, "clk"), (negedge, "rst_n"))
     def set_done_output(self):
@@ -0,0 +1,100 @@
+import kratos
+from kratos import *
+
+
+class Update_Bezout_Deferred(Generator):
+    def __init__(self,
+                 bezout_bit_length,
+                 initial_0,
+                 debug_print=False):
+        super().__init__(f"Update_Bezout_Deferred_{bezout_bit_length}", debug=True)
+
+        # Notes:
+        # - Bezout coefficient register for the deferred_halving option of
+        #   XGCDTop (see functional_models/xgcd_model_deferred.py), the
+        #   coefficients are kept scaled by 2^scale, so there are no og_b / og_a
+        #   corrections and no divisibility (late select) signals
+        # - if this coefficient's variable (a for u, l, b for y, n) is updated,
+        #   the coefficient is unchanged (even update) or set to u +/- y
+        #   (odd update, computed once in XGCDTop for both coefficients)
+        # - otherwise the other variable was divided by 2^shift, so the
+        #   coefficient is shifted left by shift (carry and sum separately)
+
+        # parameters
+        self.bezout_bit_length = bezout_bit_length
+        self.initial_0 = initial_0
+        self.debug_print = debug_print
+
+        self.clk = self.clock("clk")
+        self.rst_n = self.reset("rst_n", 1)
+        self.start = self.input("start", 1)
+        self.done = self.input("done", 1)
+
+        # control signals
+        self.update = self.input("update", 1)
+        self.odd = self.input("odd", 1)
+        self.shift_2 = self.input("shift_2", 1)
+        self.shift_3 = self.input("shift_3", 1)
+
+        # u +/- y for odd updates
+        self.u_y_carry_in = self.input("u_y_carry_in", self.bezout_bit_length)
+        self.u_y_sum_in = self.input("u_y_sum_in", self.bezout_bit_length)
+
+        # Bezout coefficient (output)
+        self.u_carry = self.var("u_carry", self.bezout_bit_length)
+        self.u_sum = self.var("u_sum", self.bezout_bit_length)
+        self.u_carry_out = self.output("u_carry_out", self.bezout_bit_length)
+        self.u_sum_out = self.output("u_sum_out", self.bezout_bit_length)
+        self.wire(self.u_carry_out, self.u_carry)
+        self.wire(self.u_sum_out, self.u_sum)
+
+        # u * 2, u * 4, u * 8 in CSA form
+        self.u_carry_2 = self.var("u_carry_2", self.bezout_bit_length)
+        self.u_sum_2 = self.var("u_sum_2", self.bezout_bit_length)
+        self.wire(self.u_carry_2, concat(self.u_carry[self.bezout_bit_length - 2, 0], const(0, 1)))
+        self.wire(self.u_sum_2, concat(self.u_sum[self.bezout_bit_length - 2, 0], const(0, 1)))
+
+        self.u_carry_4 = self.var("u_carry_4", self.bezout_bit_length)
+        self.u_sum_4 = self.var("u_sum_4", self.bezout_bit_length)
+        self.wire(self.u_carry_4, concat(self.u_carry[self.bezout_bit_length - 3, 0], const(0, 2)))
+        self.wire(self.u_sum_4, concat(self.u_sum[self.bezout_bit_length - 3, 0], const(0, 2)))
+
+        self.u_carry_8 = self.var("u_carry_8", self.bezout_bit_length)
+        self.u_sum_8 = self.var("u_sum_8", self.bezout_bit_length)
+        self.wire(self.u_carry_8, concat(self.u_carry[self.bezout_bit_length - 4, 0], const(0, 3)))
+        self.wire(self.u_sum_8, concat(self.u_sum[self.bezout_bit_length - 4, 0], const(0, 3)))
+
+        self.add_code(self.set_u)
+
+    @always_ff((posedge, "clk"), (negedge, "rst_n"))
+    def set_u(self):
+        if ~self.rst_n:
+            self.u_carry = 0
+            self.u_sum = 0
+
+        elif self.start:
+            self.u_carry = 0
+            if self.initial_0:
+                self.u_sum = 0
+            else:
+                self.u_sum = 1
+
+        elif ~self.done:
+            if self.update:
+                if self.odd:
+                    self.u_carry = self.u_y_carry_in
+                    self.u_sum = self.u_y_sum_in
+            elif self.shift_3:
+                self.u_carry = self.u_carry_8
+                self.u_sum = self.u_sum_8
+            elif self.shift_2:
+                self.u_carry = self.u_carry_4
+                self.u_sum = self.u_sum_4
+            else:
+                self.u_carry = self.u_carry_2
+                self.u_sum = self.u_sum_2
+
+
+if __name__ == "__main__":
+    dut = Update_Bezout_Deferred(2 * 1024 + 12, False)
+    verilog(dut, filename="Update_Bezout_Deferred.v")
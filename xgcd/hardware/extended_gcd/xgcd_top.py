@@ -4,6 +4,7 @@ import math
 import argparse
 
 from xgcd.hardware.extended_gcd.update_bezout import Update_Bezout
+from xgcd.hardware.extended_gcd.update_bezout_deferred import Update_Bezout_Deferred
 from xgcd.hardware.extended_gcd.post_processing import PostProcessing
 from xgcd.hardware.extended_gcd.termination_condition import TerminationCondition
 from xgcd.hardware.extended_gcd.pre_processing import PreProcessing
@@ -26,12 +27,18 @@ class XGCDTop(Generator):
                  shift_factor_b=4,
                  shift_factor_b_odd=4,
                  constant_time_support=False,
-                 add_clk_en=True):
+                 add_clk_en=True,
+                 inter_bit_length=None,
+                 delta_bit_width=None,
+                 deferred_halving=False,
+                 bezout_bit_length=None):
         super().__init__(f"XGCDTop", debug=True)
 
         print()
         print(f"Generating {bit_length}-bit XGCD...")
         print(f"- with{'out' if constant_time_support is False else ''} constant-time-support")
+        if deferred_halving:
+            print("- with deferred-halving Bezout coefficients")
         if DW:
             print("- with DesignWare CSA module")
         else:
@@ -42,7 +49,11 @@ class XGCDTop(Generator):
         self.debug_print = debug_print
         # use synopsys DC DW modules or genus CW modules for CSA
         self.DW = DW
-        self.inter_bit_length = self.bit_length + 5
+        # width of a, b, u, l, y, n and their carry-save intermediates,
+        # defaults to bit_length + 5 (see functional_models/xgcd_widths.py
+        # for the widths each reduction factor configuration needs)
+        self.inter_bit_length = self.bit_length + 5 if inter_bit_length is None else inter_bit_length
+        assert self.inter_bit_length >= self.bit_length + 2, "inter_bit_length must be at least bit_length + 2"
         self.bit_length_msb = self.inter_bit_length - 1
         self.final_clock_factor = final_clock_factor
         self.start_clock_factor = start_clock_factor
@@ -67,7 +78,28 @@ class XGCDTop(Generator):
                                   self.shift_factor_b_odd >= 8
 
         self.constant_time_support = constant_time_support
-        self.delta_msb = max(1, clog2(self.bit_length))
+        if delta_bit_width is None:
+            self.delta_msb = max(1, clog2(self.bit_length))
+        else:
+            assert delta_bit_width >= 2, "delta_bit_width must be at least 2"
+            self.delta_msb = delta_bit_width - 1
+
+        # deferred halving: u, l, y, n are kept scaled by 2^scale (no og_b /
+        # og_a corrections in the iterations) and PostProcessing divides by
+        # 2^scale, one halving per clk cycle (see
+        # functional_models/xgcd_model_deferred.py)
+        # - the scaled coefficients need about bit_length + 200 bits for random
+        #   1024-bit inputs, but a small odd input with an all-ones input
+        #   reaches 2 * bit_length + 9 bits (deferred_adversarial_inputs), so
+        #   the default keeps 7 bits of margin over that
+        # - scale is at most about 3 * bit_length (plus 3 per idle iteration)
+        # - not constant-time: the number of halvings depends on the inputs
+        self.deferred_halving = deferred_halving
+        if self.deferred_halving:
+            assert not self.constant_time_support, "deferred_halving is not supported with constant_time_support"
+            self.bezout_bit_length = 2 * self.bit_length + 16 if bezout_bit_length is None else bezout_bit_length
+            assert self.bezout_bit_length > self.inter_bit_length, "bezout_bit_length must be more than inter_bit_length"
+            self.scale_bit_width = clog2(3 * self.bit_length + 64)
 
         # I/O
         self.clk = self.clock("clk")
@@ -227,7 +259,10 @@ class XGCDTop(Generator):
             start_clock_ = self.var("start_clock_", 1)
             self.start_clock = k.util.clock(start_clock_)
             self.wire(start_clock_, k.util.clock(self.start_counter[clog2(self.start_clock_factor) - 1]))
-            self.add_code(self.set_start_counter)
+            if self.deferred_halving:
+                self.add_code(self.set_start_counter_deferred)
+            else:
+                self.add_code(self.set_start_counter)
 
         og_vals = PreProcessing(inter_bit_length=self.inter_bit_length,
                                 bit_length=self.bit_length,
@@ -252,6 +287,110 @@ class XGCDTop(Generator):
                        og_a_div4=self.og_a_div4, og_b_div4=self.og_b_div4,
                        og_a_div4_plus=self.og_a_div4_plus)
 
+        if self.deferred_halving:
+            self.add_deferred_bezout_updates()
+        else:
+            self.add_bezout_updates()
+
+        if self.final_clock_factor == 0:
+            self.final_clock = self.clk
+        else:
+            self.final_counter = self.var("final_counter", clog2(self.final_clock_factor))
+            final_clock_ = self.var("final_clock_", 1)
+            self.final_clock = k.util.clock(final_clock_)
+            self.wire(final_clock_, k.util.clock(self.final_counter[clog2(self.final_clock_factor) - 1]))
+            self.add_code(self.set_final_counter)
+
+        final_update = PostProcessing(self.inter_bit_length,
+                                      self.bit_length,
+                                      DW=self.DW,
+                                      deferred_halving=self.deferred_halving,
+                                      bezout_bit_length=self.bezout_bit_length if self.deferred_halving else None,
+                                      scale_bit_width=self.scale_bit_width if self.deferred_halving else None)
+
+        # deferred halving: one halving per clk cycle after done_inter
+        self.add_child("final_update",
+                       final_update,
+                       clk=self.clk if self.deferred_halving else self.final_clock,
+                       rst_n=self.rst_n,
+                       a_out_carry_preshift=self.a_out_carry_preshift,
+                       a_out_sum_preshift=self.a_out_sum_preshift,
+                       u_carry_in=self.u_carry,
+                       u_sum_in=self.u_sum,
+                       y_carry_in=self.y_carry,
+                       y_sum_in=self.y_sum,
+                       n_carry_in=self.n_carry,
+                       n_sum_in=self.n_sum,
+                       l_carry_in=self.l_carry,
+                       l_sum_in=self.l_sum,
+                       done_inter=self.done_inter,
+                       even_case=self.even_case,
+                       bezout_a=self.bezout_a,
+                       bezout_b=self.bezout_b,
+                       done_output=self.done)
+
+        if self.deferred_halving:
+            self.wire(final_update.ports.scale, self.scale)
+            self.wire(final_update.ports.b_carry, self.b_carry)
+            self.wire(final_update.ports.b_sum, self.b_sum)
+            self.wire(final_update.ports.og_a, self.og_a)
+            self.wire(final_update.ports.og_b, self.og_b)
+
+        if self.debug_print:
+            self.case = self.output("case_", 10)
+
+            self.a = self.var("a", self.inter_bit_length)
+            self.b = self.var("b", self.inter_bit_length)
+
+            self.a = self.var("a", self.inter_bit_length)
+            self.wire(self.a, self.a_carry + self.a_sum)
+            self.b = self.var("b", self.inter_bit_length)
+            self.wire(self.b, self.b_carry + self.b_sum)
+            self.y = self.var("y", self.y_carry.width)
+            self.wire(self.y, self.y_carry + self.y_sum)
+            self.u = self.var("u", self.u_carry.width)
+            self.wire(self.u, self.u_carry + self.u_sum)
+            self.n = self.var("n", self.n_carry.width)
+            self.wire(self.n, self.n_carry + self.n_sum)
+            self.l = self.var("l", self.l_carry.width)
+            self.wire(self.l, self.l_carry + self.l_sum)
+
+            self.add_code(self.debug_case)
+
+        termination_condition = TerminationCondition(self.bit_length, 
+                                        self.inter_bit_length, 
+                                        self.delta_msb,
+                                        cycle_count_bit_width=self.cycle_count_bit_width,
+                                        constant_time_support=self.constant_time_support)
+
+        self.add_child("termination_condition",
+                        termination_condition,
+                        clk=self.final_clock,
+                        rst_n=self.rst_n,
+                        a_carry=self.a_carry,
+                        a_sum=self.a_sum,
+                        b_carry=self.b_carry,
+                        b_sum=self.b_sum,
+                        done=self.done_inter)
+
+        if self.constant_time_support:
+            self.wire(termination_condition.ports.constant_time, self.constant_time)
+            self.wire(termination_condition.ports.total_cycle_count, self.total_cycle_count_inter)
+
+        self.wire(self.compute, self.done_inter | self.og_cycle)
+
+        self.add_code(self.set_internal_start)
+        self.add_code(self.set_keep_start)
+        self.add_code(self.update_delta)
+
+        # add clock enable
+        if self.add_clk_en:
+            self.clk_en = self.clock_en("clk_en", 1)
+            k.passes.auto_insert_clock_enable(self.internal_generator)
+
+    def add_bezout_updates(self):
+        # u, l, y, n divided by 2, 4 or 8 every iteration (late select
+        # between the og_b / og_a corrections), see Update_Bezout
         self.u_carry = self.var("u_carry", self.inter_bit_length)
         self.u_sum = self.var("u_sum", self.inter_bit_length)
         self.l_carry = self.var("l_carry", self.inter_bit_length)
@@ -581,91 +720,165 @@ class XGCDTop(Generator):
         self.wire(l_csa_bezout_inter.ports.u_ogb_carry_8_ogb_by_2_out, n_csa_bezout_inter.ports.u_ogb_carry_8_ogb_by_2_out)
         self.wire(l_csa_bezout_inter.ports.u_ogb_sum_8_ogb_by_2_out, n_csa_bezout_inter.ports.u_ogb_sum_8_ogb_by_2_out)
 
-        if self.final_clock_factor == 0:
-            self.final_clock = self.clk
-        else:
-            self.final_counter = self.var("final_counter", clog2(self.final_clock_factor))
-            final_clock_ = self.var("final_clock_", 1)
-            self.final_clock = k.util.clock(final_clock_)
-            self.wire(final_clock_, k.util.clock(self.final_counter[clog2(self.final_clock_factor) - 1]))
-            self.add_code(self.set_final_counter)
-
-        final_update = PostProcessing(self.inter_bit_length,
-                                      self.bit_length,
-                                      DW=self.DW)
+        self.add_code(self.set_lsbs)
 
-        self.add_child("final_update",
-                       final_update,
-                       clk=self.final_clock,
+    def add_deferred_bezout_updates(self):
+        # u, l, y, n scaled by 2^scale (deferred_halving), see
+        # Update_Bezout_Deferred and functional_models/xgcd_model_deferred.py
+        self.u_carry = self.var("u_carry", self.bezout_bit_length)
+        self.u_sum = self.var("u_sum", self.bezout_bit_length)
+        self.l_carry = self.var("l_carry", self.bezout_bit_length)
+        self.l_sum = self.var("l_sum", self.bezout_bit_length)
+        self.y_carry = self.var("y_carry", self.bezout_bit_length)
+        self.y_sum = self.var("y_sum", self.bezout_bit_length)
+        self.n_carry = self.var("n_carry", self.bezout_bit_length)
+        self.n_sum = self.var("n_sum", self.bezout_bit_length)
+
+        # number of halvings left for PostProcessing
+        self.scale = self.var("scale", self.scale_bit_width)
+
+        # a, b both odd (odd update) and shift of the updated variable
+        # (1 unless bezout_shift_2 or bezout_shift_3)
+        self.odd_update = self.var("odd_update", 1)
+        self.wire(self.odd_update, self.a_after_lsb & self.b_after_lsb)
+        self.bezout_shift_2 = self.var("bezout_shift_2", 1)
+        self.bezout_shift_3 = self.var("bezout_shift_3", 1)
+
+        # u +/- y and l +/- n, shared by the a and b coefficient updates
+        self.u_plus_y_carry = self.var("u_plus_y_carry", self.bezout_bit_length)
+        self.u_plus_y_sum = self.var("u_plus_y_sum", self.bezout_bit_length)
+        self.u_minus_y_carry = self.var("u_minus_y_carry", self.bezout_bit_length)
+        self.u_minus_y_sum = self.var("u_minus_y_sum", self.bezout_bit_length)
+        self.l_plus_n_carry = self.var("l_plus_n_carry", self.bezout_bit_length)
+        self.l_plus_n_sum = self.var("l_plus_n_sum", self.bezout_bit_length)
+        self.l_minus_n_carry = self.var("l_minus_n_carry", self.bezout_bit_length)
+        self.l_minus_n_sum = self.var("l_minus_n_sum", self.bezout_bit_length)
+
+        DW01_csa_4_u_plus_y = DW01_csa_4(self.bezout_bit_length, True, DW=self.DW)
+        self.add_child("DW01_csa_4_u_plus_y",
+                       DW01_csa_4_u_plus_y,
+                       a_carry=self.u_carry,
+                       a_sum=self.u_sum,
+                       b_carry=self.y_carry,
+                       b_sum=self.y_sum,
+                       final_out_carry=self.u_plus_y_carry,
+                       final_out_sum=self.u_plus_y_sum)
+
+        DW01_csa_4_u_minus_y = DW01_csa_4(self.bezout_bit_length, False, DW=self.DW)
+        self.add_child("DW01_csa_4_u_minus_y",
+                       DW01_csa_4_u_minus_y,
+                       a_carry=self.u_carry,
+                       a_sum=self.u_sum,
+                       b_carry=self.y_carry,
+                       b_sum=self.y_sum,
+                       final_out_carry=self.u_minus_y_carry,
+                       final_out_sum=self.u_minus_y_sum)
+
+        DW01_csa_4_l_plus_n = DW01_csa_4(self.bezout_bit_length, True, DW=self.DW)
+        self.add_child("DW01_csa_4_l_plus_n",
+                       DW01_csa_4_l_plus_n,
+                       a_carry=self.l_carry,
+                       a_sum=self.l_sum,
+                       b_carry=self.n_carry,
+                       b_sum=self.n_sum,
+                       final_out_carry=self.l_plus_n_carry,
+                       final_out_sum=self.l_plus_n_sum)
+
+        DW01_csa_4_l_minus_n = DW01_csa_4(self.bezout_bit_length, False, DW=self.DW)
+        self.add_child("DW01_csa_4_l_minus_n",
+                       DW01_csa_4_l_minus_n,
+                       a_carry=self.l_carry,
+                       a_sum=self.l_sum,
+                       b_carry=self.n_carry,
+                       b_sum=self.n_sum,
+                       final_out_carry=self.l_minus_n_carry,
+                       final_out_sum=self.l_minus_n_sum)
+
+        # u +/- y, l +/- n for the odd update: (a + b) / 4 if a + b is
+        # divisible by 4, otherwise (a - b) / 4 ((a - b) / 2 for odd
+        # reduction factor 2), see set_u_y
+        self.u_y_carry = self.var("u_y_carry", self.bezout_bit_length)
+        self.u_y_sum = self.var("u_y_sum", self.bezout_bit_length)
+        self.l_n_carry = self.var("l_n_carry", self.bezout_bit_length)
+        self.l_n_sum = self.var("l_n_sum", self.bezout_bit_length)
+
+        # u, l are updated with a, y, n with b (the coefficients of the
+        # variable that is not updated are shifted left)
+        u_bezout_deferred = Update_Bezout_Deferred(self.bezout_bit_length,
+                                                   initial_0=False,
+                                                   debug_print=self.debug_print)
+        self.add_child("u_bezout_deferred",
+                       u_bezout_deferred,
+                       clk=self.clk,
                        rst_n=self.rst_n,
-                       a_out_carry_preshift=self.a_out_carry_preshift,
-                       a_out_sum_preshift=self.a_out_sum_preshift,
-                       u_carry_in=self.u_carry,
-                       u_sum_in=self.u_sum,
-                       y_carry_in=self.y_carry,
-                       y_sum_in=self.y_sum,
-                       n_carry_in=self.n_carry,
-                       n_sum_in=self.n_sum,
-                       l_carry_in=self.l_carry,
-                       l_sum_in=self.l_sum,
-                       done_inter=self.done_inter,
-                       even_case=self.even_case,
-                       bezout_a=self.bezout_a,
-                       bezout_b=self.bezout_b,
-                       done_output=self.done)
-
-        if self.debug_print:
-            self.case = self.output("case_", 10)
-
-            self.a = self.var("a", self.inter_bit_length)
-            self.b = self.var("b", self.inter_bit_length)
-
-            self.a = self.var("a", self.inter_bit_length)
-            self.wire(self.a, self.a_carry + self.a_sum)
-            self.b = self.var("b", self.inter_bit_length)
-            self.wire(self.b, self.b_carry + self.b_sum)
-            self.y = self.var("y", self.inter_bit_length)
-            self.wire(self.y, self.y_carry + self.y_sum)
-            self.u = self.var("u", self.inter_bit_length)
-            self.wire(self.u, self.u_carry + self.u_sum)
-            self.n = self.var("n", self.inter_bit_length)
-            self.wire(self.n, self.n_carry + self.n_sum)
-            self.l = self.var("l", self.inter_bit_length)
-            self.wire(self.l, self.l_carry + self.l_sum)
-
-            self.add_code(self.debug_case)
-
-        termination_condition = TerminationCondition(self.bit_length, 
-                                        self.inter_bit_length, 
-                                        self.delta_msb,
-                                        cycle_count_bit_width=self.cycle_count_bit_width,
-                                        constant_time_support=self.constant_time_support)
-
-        self.add_child("termination_condition",
-                        termination_condition,
-                        clk=self.final_clock,
-                        rst_n=self.rst_n,
-                        a_carry=self.a_carry,
-                        a_sum=self.a_sum,
-                        b_carry=self.b_carry,
-                        b_sum=self.b_sum,
-                        done=self.done_inter)
+                       start=self.internal_start,
+                       done=self.compute,
+                       update=self.update_a,
+                       odd=self.odd_update,
+                       shift_2=self.bezout_shift_2,
+                       shift_3=self.bezout_shift_3,
+                       u_y_carry_in=self.u_y_carry,
+                       u_y_sum_in=self.u_y_sum,
+                       u_carry_out=self.u_carry,
+                       u_sum_out=self.u_sum)
 
-        if self.constant_time_support:
-            self.wire(termination_condition.ports.constant_time, self.constant_time)
-            self.wire(termination_condition.ports.total_cycle_count, self.total_cycle_count_inter)
+        l_bezout_deferred = Update_Bezout_Deferred(self.bezout_bit_length,
+                                                   initial_0=True,
+                                                   debug_print=self.debug_print)
+        self.add_child("l_bezout_deferred",
+                       l_bezout_deferred,
+                       clk=self.clk,
+                       rst_n=self.rst_n,
+                       start=self.internal_start,
+                       done=self.compute,
+                       update=self.update_a,
+                       odd=self.odd_update,
+                       shift_2=self.bezout_shift_2,
+                       shift_3=self.bezout_shift_3,
+                       u_y_carry_in=self.l_n_carry,
+                       u_y_sum_in=self.l_n_sum,
+                       u_carry_out=self.l_carry,
+                       u_sum_out=self.l_sum)
 
-        self.wire(self.compute, self.done_inter | self.og_cycle)
+        y_bezout_deferred = Update_Bezout_Deferred(self.bezout_bit_length,
+                                                   initial_0=True,
+                                                   debug_print=self.debug_print)
+        self.add_child("y_bezout_deferred",
+                       y_bezout_deferred,
+                       clk=self.clk,
+                       rst_n=self.rst_n,
+                       start=self.internal_start,
+                       done=self.compute,
+                       update=~self.update_a,
+                       odd=self.odd_update,
+                       shift_2=self.bezout_shift_2,
+                       shift_3=self.bezout_shift_3,
+                       u_y_carry_in=self.u_y_carry,
+                       u_y_sum_in=self.u_y_sum,
+                       u_carry_out=self.y_carry,
+                       u_sum_out=self.y_sum)
 
-        self.add_code(self.set_internal_start)
-        self.add_code(self.set_keep_start)
-        self.add_code(self.set_lsbs)
-        self.add_code(self.update_delta)
+        n_bezout_deferred = Update_Bezout_Deferred(self.bezout_bit_length,
+                                                   initial_0=False,
+                                                   debug_print=self.debug_print)
+        self.add_child("n_bezout_deferred",
+                       n_bezout_deferred,
+                       clk=self.clk,
+                       rst_n=self.rst_n,
+                       start=self.internal_start,
+                       done=self.compute,
+                       update=~self.update_a,
+                       odd=self.odd_update,
+                       shift_2=self.bezout_shift_2,
+                       shift_3=self.bezout_shift_3,
+                       u_y_carry_in=self.l_n_carry,
+                       u_y_sum_in=self.l_n_sum,
+                       u_carry_out=self.n_carry,
+                       u_sum_out=self.n_sum)
 
-        # add clock enable
-        if self.add_clk_en:
-            self.clk_en = self.clock_en("clk_en", 1)
-            k.passes.auto_insert_clock_enable(self.internal_generator)
+        self.add_code(self.set_u_y)
+        self.add_code(self.set_bezout_shift)
+        self.add_code(self.update_scale)
 
     @always_ff((posedge, "clk"), (negedge, "rst_n"))
     def set_internal_start(self):
@@ -792,6 +1005,21 @@ class XGCDTop(Generator):
             self.start_counter = self.start_clock_factor - 1
         else:
             self.start_counter = self.start_counter + 1
+
+    # deferred halving: done rises later after reset, so start can come while
+    # the start clock is already high. In that case the clock falls here and
+    # rises on the next cycle, while internal_start is still high (keep_start),
+    # so PreProcessing loads the inputs
+    @always_ff((posedge, "clk"), (negedge, "rst_n"))
+    def set_start_counter_deferred(self):
+        if ~self.rst_n:
+            self.start_counter = 0
+        elif self.start & self.start_counter[clog2(self.start_clock_factor) - 1]:
+            self.start_counter = self.start_clock_factor // 2 - 1
+        elif self.start:
+            self.start_counter = self.start_clock_factor - 1
+        else:
+            self.start_counter = self.start_counter + 1
                 
     @always_ff((posedge, "clk"), (negedge, "rst_n"))
     def update_delta(self):
@@ -836,6 +1064,64 @@ class XGCDTop(Generator):
                 else:
                     self.delta = self.delta + 1
 
+    @always_comb
+    def set_u_y(self):
+        if self.ab_after_lsb_2 & ~self.shift_b_2_odd:
+            self.u_y_carry = self.u_plus_y_carry
+            self.u_y_sum = self.u_plus_y_sum
+            self.l_n_carry = self.l_plus_n_carry
+            self.l_n_sum = self.l_plus_n_sum
+        else:
+            self.u_y_carry = self.u_minus_y_carry
+            self.u_y_sum = self.u_minus_y_sum
+            self.l_n_carry = self.l_minus_n_carry
+            self.l_n_sum = self.l_minus_n_sum
+
+    @always_comb
+    def set_bezout_shift(self):
+        # power of 2 the updated variable is divided by (same cases as update_delta)
+        if self.shift_a_8 & ~self.a_after_lsb_3 & ~self.a_after_lsb_2 & ~self.a_after_lsb:
+            self.bezout_shift_2 = 0
+            self.bezout_shift_3 = 1
+        elif self.shift_a_4 & ~self.a_after_lsb_2 & ~self.a_after_lsb:
+            self.bezout_shift_2 = 1
+            self.bezout_shift_3 = 0
+        elif ~self.a_after_lsb:
+            self.bezout_shift_2 = 0
+            self.bezout_shift_3 = 0
+        elif self.shift_b_8 & ~self.b_after_lsb_3 & ~self.b_after_lsb_2 & ~self.b_after_lsb:
+            self.bezout_shift_2 = 0
+            self.bezout_shift_3 = 1
+        elif self.shift_b_4 & ~self.b_after_lsb_2 & ~self.b_after_lsb:
+            self.bezout_shift_2 = 1
+            self.bezout_shift_3 = 0
+        elif ~self.b_after_lsb:
+            self.bezout_shift_2 = 0
+            self.bezout_shift_3 = 0
+        elif self.shift_b_2_odd:
+            self.bezout_shift_2 = 0
+            self.bezout_shift_3 = 0
+        elif self.ab_after_lsb_2:
+            self.bezout_shift_2 = ~(self.shift_b_8_odd & self.ab_after_lsb_3)
+            self.bezout_shift_3 = self.shift_b_8_odd & self.ab_after_lsb_3
+        else:
+            self.bezout_shift_2 = ~(self.shift_b_8_odd & self.a_minus_b_after_lsb_3)
+            self.bezout_shift_3 = self.shift_b_8_odd & self.a_minus_b_after_lsb_3
+
+    @always_ff((posedge, "clk"), (negedge, "rst_n"))
+    def update_scale(self):
+        if ~self.rst_n:
+            self.scale = 0
+        elif self.internal_start:
+            self.scale = 0
+        elif ~(self.compute):
+            if self.bezout_shift_3:
+                self.scale = self.scale + 3
+            elif self.bezout_shift_2:
+                self.scale = self.scale + 2
+            else:
+                self.scale = self.scale + 1
+
     @always_ff((posedge, "clk"), (negedge, "rst_n"))
     def debug_case(self):
         if ~self.rst_n:
@@ -892,6 +1178,10 @@ if __name__ == "__main__":
     parser.add_argument('--reduction_factor_even', type=int, default=8, help="Factor of 2 to reduce b by each cycle if even")
     parser.add_argument('--reduction_factor_odd', type=int, default=4, help="Factor of 2 to reduce b when odd by each cycle if even")
     parser.add_argument('--csa_handwritten', default=False, action="store_true", help="(default: False) if used, use CSA handwritten module instead of DesignWare CSA module")
+    parser.add_argument('--inter_bit_length', type=int, default=None, help="(default: bit_length + 5) width of a, b and the Bezout coefficient registers")
+    parser.add_argument('--delta_bit_width', type=int, default=None, help="(default: clog2(bit_length) + 1) width of the delta register")
+    parser.add_argument('--deferred_halving', default=False, action="store_true", help="(default: False) keep Bezout coefficients scaled by 2^k and divide by 2^k in post-processing")
+    parser.add_argument('--bezout_bit_length', type=int, default=None, help="(default: 2 * bit_length + 16) width of the scaled Bezout coefficient registers (deferred_halving only)")
     parser.add_argument('--output', default="XGCDTop.v", help="name of output Verilog file")
     args = parser.parse_args()
 
@@ -905,7 +1195,11 @@ if __name__ == "__main__":
                   shift_factor_b=args.reduction_factor_even,
                   shift_factor_b_odd=args.reduction_factor_odd,
                   constant_time_support=args.constant_time_support,
-                  DW=(not args.csa_handwritten))
+                  DW=(not args.csa_handwritten),
+                  inter_bit_length=args.inter_bit_length,
+                  delta_bit_width=args.delta_bit_width,
+                  deferred_halving=args.deferred_halving,
+                  bezout_bit_length=args.bezout_bit_length)
 
     verilog(dut, filename=args.output)
 
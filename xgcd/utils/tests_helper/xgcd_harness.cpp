@@ -0,0 +1,152 @@
+// Verilator testbench for XGCDTop (see xgcd_sim.py)
+//
+// Reads one vector per line from stdin:
+//
+//     A B constant_time timeout
+//
+// (A, B in hex), and for each vector resets the design, sets start for the
+// first cycle (cycle 1) and steps clk until done rises: done is first waited
+// on to be low, and the cycle it is next seen high is the done cycle. Stops
+// after timeout cycles if done does not rise, then writes one line to stdout:
+//
+//     done done_cycle bezout_a bezout_b total_cycle_count
+//
+// (done_cycle is the cycle done rose, or timeout, bezout_a, bezout_b,
+// total_cycle_count in hex, bezout_a and bezout_b are two's complement).
+//
+// The reset sequence is the same as the fault testbench in xgcd_test_core.py,
+// followed by idle cycles (start low) until done is high: the termination
+// condition registers are 0 after reset, so done rises a few cycles after
+// reset and stays high while idle. Started right after reset instead, done
+// would rise a few cycles after start (before the inputs reach the
+// termination condition) and fall again, see early_done in
+// xgcd_control_model.py. The clock counters run freely while idle, so this
+// also shifts the final clock by one cycle (idle_before_start in
+// xgcd_control_model.py models this testbench).
+
+#include <cstdint>
+#include <cstdio>
+#include <iostream>
+#include <string>
+#include <vector>
+
+#include "VXGCDTop.h"
+#include "verilated.h"
+
+typedef std::vector<uint32_t> Words;
+
+// number of 32-bit words in a port, ports wider than 64 bits are WData arrays
+template <typename T>
+static inline size_t num_words(const T& port) {
+    return (sizeof(port) + sizeof(uint32_t) - 1) / sizeof(uint32_t);
+}
+
+template <typename T>
+static inline void set_port(T& port, const Words& words) {
+    for (size_t i = 0; i < num_words(port); i++)
+        port[i] = words[i];
+}
+static inline void set_port(CData& port, const Words& words) { port = words[0]; }
+static inline void set_port(SData& port, const Words& words) { port = words[0]; }
+static inline void set_port(IData& port, const Words& words) { port = words[0]; }
+static inline void set_port(QData& port, const Words& words) { port = ((QData)words[1] << 32) | words[0]; }
+
+template <typename T>
+static inline Words get_port(const T& port) {
+    Words words(num_words(port));
+    for (size_t i = 0; i < words.size(); i++)
+        words[i] = port[i];
+    return words;
+}
+static inline Words get_port(const CData& port) { return Words(1, port); }
+static inline Words get_port(const SData& port) { return Words(1, port); }
+static inline Words get_port(const IData& port) { return Words(1, port); }
+static inline Words get_port(const QData& port) { return Words{(uint32_t)port, (uint32_t)(port >> 32)}; }
+
+static inline Words from_hex(const std::string& hex, size_t size) {
+    Words words(size, 0);
+    size_t bit = 0;
+    for (size_t i = hex.size(); i-- > 0 && bit < 32 * size; bit += 4) {
+        char c = hex[i];
+        uint32_t digit = (c <= '9') ? (uint32_t)(c - '0') : (uint32_t)((c | 0x20) - 'a' + 10);
+        words[bit / 32] |= digit << (bit % 32);
+    }
+    return words;
+}
+
+static inline std::string to_hex(const Words& words) {
+    std::string hex;
+    char digits[9];
+    for (size_t i = words.size(); i-- > 0;) {
+        std::snprintf(digits, sizeof(digits), "%08x", words[i]);
+        hex += digits;
+    }
+    return hex;
+}
+
+// one clk cycle, ends with the rising edge (tester.step(2))
+static inline void step(VXGCDTop* top) {
+    top->clk = 0;
+    top->eval();
+    top->clk = 1;
+    top->eval();
+}
+
+// at most this many idle cycles after reset for done to rise
+static const int MAX_IDLE_CYCLES = 1024;
+
+static inline void reset(VXGCDTop* top) {
+    top->clk_en = 1;
+    top->rst_n = 1;
+    top->start = 0;
+    top->constant_time = 0;
+    top->clk = 1;
+    top->eval();
+    step(top);
+    top->rst_n = 0;
+    top->eval();
+    step(top);
+    top->rst_n = 1;
+    top->eval();
+    for (int i = 0; i < MAX_IDLE_CYCLES && !top->done; i++)
+        step(top);
+}
+
+int main(int argc, char** argv) {
+    Verilated::commandArgs(argc, argv);
+    VXGCDTop* top = new VXGCDTop;
+
+    std::string a, b;
+    int constant_time;
+    long timeout;
+    while (std::cin >> a >> b >> constant_time >> timeout) {
+        reset(top);
+
+        top->start = 1;
+        top->constant_time = constant_time;
+        set_port(top->A, from_hex(a, num_words(top->A)));
+        set_port(top->B, from_hex(b, num_words(top->B)));
+        top->eval();
+
+        long cycle = 0;
+        bool done_low = false;
+        while (cycle < timeout) {
+            step(top);
+            top->start = 0;
+            cycle++;
+            if (!top->done)
+                done_low = true;
+            else if (done_low)
+                break;
+        }
+
+        std::cout << (int)top->done << " " << cycle << " "
+                  << to_hex(get_port(top->bezout_a)) << " "
+                  << to_hex(get_port(top->bezout_b)) << " "
+                  << to_hex(get_port(top->total_cycle_count)) << std::endl;
+    }
+
+    top->final();
+    delete top;
+    return 0;
+}
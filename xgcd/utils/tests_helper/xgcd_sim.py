@@ -0,0 +1,619 @@
+import ast
+import fcntl
+import hashlib
+import json
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+
+from xgcd.functional_models.xgcd_model import xgcd_model
+from xgcd.functional_models.xgcd_model_fast import xgcd_iterations
+from xgcd.functional_models.xgcd_model_deferred import xgcd_model_deferred
+from xgcd.functional_models.xgcd_control_model import xgcd_control_timing
+from xgcd.functional_models.xgcd_results import IterationStats
+
+
+# Compile-once, many-vector Verilator simulation of XGCDTop
+#
+# The fault testbench in xgcd_test_core generates and compiles XGCDTop for
+# every pair of inputs. Here, XGCDTop is generated and compiled with
+# Verilator once per hardware configuration (XGCDConfig) together with a
+# small C++ testbench (xgcd_harness.cpp). The simulator reads vectors from
+# stdin, resets the design and sets start for each vector, runs until done
+# rises, and writes the cycle done rose, the Bezout coefficients and
+# total_cycle_count for each vector to stdout, so any number of vectors can
+# be run through one compiled model and every vector measures the latency.
+#
+# The testbench detects the rising edge of done itself: it idles after reset
+# until done is high, sets start, waits for done to be low, and the done
+# cycle is the next cycle done is high (see xgcd_harness.cpp). The
+# functional model is only used for the timeout: the simulation of a vector
+# stops after twice the conservative number of cycles from xgcd_expected if
+# done does not rise.
+#
+# The done cycle and total_cycle_count of every vector are compared with
+# xgcd_control_timing (the functional model iterations plus the control
+# overhead), except for deferred_halving (the halvings are not modeled) and
+# reduction_factor_odd 2 (the hardware iterations differ from the model).
+# A vector passes if the Bezout coefficients match (passed) and its cycles
+# match the model (cycles_passed, always True if the configuration is not
+# modeled). xgcd_test_core fails on either (check_cycles=False only checks the
+# Bezout coefficients), and cycle_mismatches in the LatencyReport counts the
+# vectors whose cycles differ.
+# latency_reports summarizes the done cycles of the vectors run in this
+# process that finished (done rose) per configuration (min / mean / p50 /
+# p99 / max, cycles per bit), from running aggregates (IterationStats of the
+# done cycles), so memory does not grow with the number of vectors.
+#
+# get_xgcd_sim compiles each configuration once, run_vectors checks the
+# results against the functional model and returns a pass/fail per vector.
+#
+# Builds are kept in an on-disk cache (XGCD_SIM_CACHE, default
+# ~/.cache/xgcd_sim) shared by all processes that use it (pytest sessions,
+# pytest-xdist workers, CI jobs with a cached directory). Each build is stored
+# under a hash of everything it depends on (cache_key): the XGCDConfig, the
+# Verilator flags, the source of the xgcd/hardware modules and of every xgcd
+# module they import (generator_sources), the testbench, the kratos and
+# Verilator versions and the DW_PATH file contents, so changes to the tests or
+# the functional model reuse the builds. The least recently used builds are
+# removed once the cache is larger than XGCD_SIM_CACHE_SIZE (MB, default
+# 4096), and temporary directories left by killed processes once they are
+# older than XGCD_SIM_TMP_TIMEOUT (seconds, default 86400). A process holds a
+# shared lock on the LOCK file of each build it loaded, and builds (or
+# temporary directories) that are locked are never removed.
+# XGCD_SIM_REBUILD=1 (pytest --rebuild) rebuilds each configuration once per
+# process.
+
+HARNESS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "xgcd_harness.cpp")
+HARDWARE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "hardware")
+# directory containing the xgcd package
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(HARDWARE_PATH))
+
+VERILATOR_FLAGS = ["-Wno-fatal", "--cc", "--exe", "--build", "--top-module", "XGCDTop", "-o", "xgcd_sim"]
+
+# written last in a build directory, a build is complete if it exists
+METADATA = "xgcd_sim.json"
+# shared-locked by every process that loaded the build (see evict)
+LOCK = "xgcd_sim.lock"
+
+XGCDConfig = namedtuple("XGCDConfig", ["bit_length",
+                                       "shift_factor_a",
+                                       "shift_factor_b",
+                                       "shift_factor_b_odd",
+                                       "constant_time_support",
+                                       "use_external",
+                                       "final_clock_factor",
+                                       "start_clock_factor",
+                                       "inter_bit_length",
+                                       "delta_bit_width",
+                                       "deferred_halving",
+                                       "bezout_bit_length"],
+                        defaults=[True, 4, 2, None, None, False, None])
+
+SimResult = namedtuple("SimResult", ["done", "done_cycle", "bezout_a", "bezout_b", "total_cycle_count"])
+
+VectorResult = namedtuple("VectorResult", ["A", "B", "constant_time", "cycles", "expected_a", "expected_b",
+                                           "done", "done_cycle", "bezout_a", "bezout_b", "total_cycle_count",
+                                           "passed", "iterations", "expected_done_cycle",
+                                           "expected_total_cycle_count", "cycles_passed"])
+
+LatencyReport = namedtuple("LatencyReport", ["vectors", "min", "mean", "p50", "p99", "max", "cycles_per_bit",
+                                             "cycle_mismatches"])
+
+
+def xgcd_expected(config, A, B, constant_time):
+    # returns (s, t, gcd_cycles, iterations): the Bezout coefficients the
+    # hardware outputs for A, B (gcd 1), the number of cycles to step before
+    # checking done and the results and the iterations, from the functional
+    # model
+    gcd, s, t, cycles, _, = \
+        xgcd_model(a=A,
+                   b=B,
+                   bit_length=config.bit_length,
+                   constant_time=(constant_time == 1),
+                   reduction_factor_even=config.shift_factor_b,
+                   reduction_factor_odd=config.shift_factor_b_odd)
+
+    # cycles-only model (used for design-space sweeps) must agree with the full model
+    assert cycles == xgcd_iterations(a=A,
+                                     b=B,
+                                     bit_length=config.bit_length,
+                                     constant_time=(constant_time == 1),
+                                     reduction_factor_even=config.shift_factor_b,
+                                     reduction_factor_odd=config.shift_factor_b_odd), \
+        "xgcd_iterations does not match xgcd_model"
+
+    # - this is conservative, not all will require final_clock_factor * 2 cycles
+    # - + 4 for extra cycle spillover due to running termination condition at a
+    # slower clock frequency
+    gcd_cycles = cycles + config.start_clock_factor * 2 + config.final_clock_factor * 2 + 4
+
+    if config.deferred_halving:
+        # different (but equally valid) Bezout coefficients, plus one cycle
+        # per halving in post-processing (3 more for each idle iteration the
+        # hardware runs before the termination condition is sampled)
+        _, s, t, _, scale, _ = xgcd_model_deferred(a=A,
+                                                   b=B,
+                                                   bit_length=config.bit_length,
+                                                   reduction_factor_even=config.shift_factor_b,
+                                                   reduction_factor_odd=config.shift_factor_b_odd)
+        gcd_cycles += scale + 3 * (config.final_clock_factor * 2 + 4) + 2
+
+    return s, t, gcd_cycles, cycles
+
+
+def xgcd_timing(config, A, B, constant_time):
+    # ControlTiming of the hardware for A, B
+    return xgcd_control_timing(A, B,
+                               bit_length=config.bit_length,
+                               constant_time=(constant_time == 1),
+                               reduction_factor_even=config.shift_factor_b,
+                               reduction_factor_odd=config.shift_factor_b_odd,
+                               start_clock_factor=config.start_clock_factor,
+                               final_clock_factor=config.final_clock_factor)
+
+
+def timing_modeled(config):
+    # whether xgcd_control_timing predicts the done cycle of config
+    return not config.deferred_halving and config.shift_factor_b_odd >= 4
+
+
+def latency_report(stats, cycle_mismatches, bit_length):
+    # LatencyReport from an IterationStats of done cycles
+    return LatencyReport(stats.count,
+                         min(stats.histogram),
+                         stats.mean(),
+                         stats.percentile(50),
+                         stats.percentile(99),
+                         stats.max,
+                         stats.mean() / bit_length,
+                         cycle_mismatches)
+
+
+def to_signed(value, width):
+    value &= (1 << width) - 1
+    return value - (1 << width) if value >> (width - 1) else value
+
+
+class XGCDSim:
+    # compiled Verilator model of one XGCDTop configuration
+
+    def __init__(self, config, binary, bezout_width, lock=None):
+        self.config = config
+        self.binary = binary
+        # width of the bezout_a, bezout_b outputs (two's complement)
+        self.bezout_width = bezout_width
+        # open LOCK file of the build (shared lock held while in use)
+        self.lock = lock
+
+    def run(self, vectors):
+        # vectors: (A, B, constant_time, timeout), runs all vectors through
+        # one simulator process and returns a SimResult per vector
+        stdin = "".join(f"{A:x} {B:x} {constant_time} {timeout}\n"
+                        for (A, B, constant_time, timeout) in vectors)
+        process = subprocess.run([self.binary],
+                                 input=stdin,
+                                 stdout=subprocess.PIPE,
+                                 universal_newlines=True,
+                                 check=True)
+        results = [self.parse(line) for line in process.stdout.splitlines()]
+        assert len(results) == len(vectors), f"Simulator returned {len(results)} results for {len(vectors)} vectors"
+        return results
+
+    def parse(self, line):
+        done, done_cycle, bezout_a, bezout_b, total_cycle_count = line.split()
+        return SimResult(int(done),
+                         int(done_cycle),
+                         to_signed(int(bezout_a, 16), self.bezout_width),
+                         to_signed(int(bezout_b, 16), self.bezout_width),
+                         int(total_cycle_count, 16))
+
+
+def build_xgcd_sim(config, directory, dw_path=None):
+    # generates XGCDTop for config and compiles it with the testbench in
+    # directory, returns an XGCDSim
+
+    # hardware generation dependencies are only imported here (see xgcd_test_core)
+    import kratos as k
+    from xgcd.hardware.extended_gcd.xgcd_top import XGCDTop
+
+    dut = XGCDTop(bit_length=config.bit_length,
+                  final_clock_factor=config.final_clock_factor,
+                  start_clock_factor=config.start_clock_factor,
+                  shift_factor_a=config.shift_factor_a,
+                  shift_factor_b=config.shift_factor_b,
+                  shift_factor_b_odd=config.shift_factor_b_odd,
+                  constant_time_support=config.constant_time_support,
+                  DW=config.use_external,
+                  inter_bit_length=config.inter_bit_length,
+                  delta_bit_width=config.delta_bit_width,
+                  deferred_halving=config.deferred_halving,
+                  bezout_bit_length=config.bezout_bit_length)
+
+    k.verilog(dut, filename=os.path.join(directory, "XGCDTop.v"))
+
+    sources = ["XGCDTop.v"]
+    if config.use_external:
+        assert dw_path is not None, "DW_PATH must be set to use the DesignWare CSA module"
+        shutil.copy(dw_path, directory)
+        sources.append(os.path.basename(dw_path))
+    shutil.copy(HARNESS_PATH, directory)
+    sources.append(os.path.basename(HARNESS_PATH))
+
+    subprocess.run(["verilator"] + VERILATOR_FLAGS + sources,
+                   cwd=directory,
+                   check=True)
+
+    # only the simulator and the generated Verilog are kept
+    os.rename(os.path.join(directory, "obj_dir", "xgcd_sim"), os.path.join(directory, "xgcd_sim"))
+    shutil.rmtree(os.path.join(directory, "obj_dir"))
+    for source in sources[1:]:
+        os.remove(os.path.join(directory, source))
+
+    with open(os.path.join(directory, METADATA), "w") as f:
+        json.dump({"config": config._asdict(), "bezout_width": dut.bezout_a.width}, f)
+
+    return load_xgcd_sim(config, directory)
+
+
+def lock_build(directory):
+    # shared lock on the build in directory, so evict does not remove it while
+    # this process uses it, returns the open LOCK file (None if the build was
+    # removed or renamed by evict in the meantime)
+    try:
+        lock = open(os.path.join(directory, LOCK), "a")
+    except FileNotFoundError:
+        return None
+    fcntl.flock(lock, fcntl.LOCK_SH)
+    if not os.path.exists(os.path.join(directory, METADATA)):
+        lock.close()
+        return None
+    return lock
+
+
+def load_xgcd_sim(config, directory, lock=None):
+    # XGCDSim from a build directory
+    with open(os.path.join(directory, METADATA)) as f:
+        metadata = json.load(f)
+    return XGCDSim(config, os.path.join(directory, "xgcd_sim"), metadata["bezout_width"], lock)
+
+
+def package_version(name):
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        # Python 3.7
+        import pkg_resources
+        return pkg_resources.get_distribution(name).version
+    return version(name)
+
+
+def verilator_version():
+    return subprocess.run(["verilator", "--version"],
+                          stdout=subprocess.PIPE,
+                          universal_newlines=True,
+                          check=True).stdout.strip()
+
+
+def module_path(name):
+    # source file of the xgcd module name (None if it is not a module, e.g.
+    # a class imported from a module)
+    path = os.path.join(PACKAGE_ROOT, *name.split("."))
+    if os.path.isfile(path + ".py"):
+        return path + ".py"
+    if os.path.isfile(os.path.join(path, "__init__.py")):
+        return os.path.join(path, "__init__.py")
+    return None
+
+
+def generator_sources():
+    # source files the generated Verilog depends on: the xgcd/hardware modules
+    # (and Verilog sources), and every xgcd module they import, directly or
+    # through other xgcd modules (e.g. helpers in xgcd/utils)
+    sources = set()
+    for root, dirs, files in os.walk(HARDWARE_PATH):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for name in files:
+            if name.endswith(".py") or name.endswith(".v"):
+                sources.add(os.path.join(root, name))
+
+    todo = [path for path in sources if path.endswith(".py")]
+    while todo:
+        with open(todo.pop(), "rb") as f:
+            tree = ast.parse(f.read())
+        names = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names += [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module is not None:
+                names += [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+        for name in names:
+            parts = name.split(".")
+            if parts[0] != "xgcd":
+                continue
+            # the packages of the module are imported too
+            for i in range(1, len(parts) + 1):
+                path = module_path(".".join(parts[:i]))
+                if path is not None and path not in sources:
+                    sources.add(path)
+                    todo.append(path)
+
+    return sorted(sources)
+
+
+def cache_key(config, dw_path=None):
+    # hash of everything a build of config depends on
+    h = hashlib.sha256()
+
+    def add(name, data):
+        h.update(name.encode())
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+
+    add("config", repr(config).encode())
+    add("verilator flags", " ".join(VERILATOR_FLAGS).encode())
+    add("kratos", package_version("kratos").encode())
+    add("verilator", verilator_version().encode())
+
+    for path in generator_sources():
+        with open(path, "rb") as f:
+            add(os.path.relpath(path, PACKAGE_ROOT), f.read())
+
+    with open(HARNESS_PATH, "rb") as f:
+        add("harness", f.read())
+
+    if config.use_external and dw_path is not None:
+        with open(dw_path, "rb") as f:
+            add("DW_PATH", f.read())
+
+    return h.hexdigest()
+
+
+def cache_directory():
+    return os.environ.get("XGCD_SIM_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "xgcd_sim"))
+
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, dirs, files in os.walk(directory)
+               for name in files)
+
+
+def remove_unlocked(cache, path):
+    # removes the build (or temporary directory) path unless a process holds
+    # a lock on it, returns whether it was removed. The build is renamed to a
+    # temporary directory while locked, so a process loading it either locks
+    # it first or finds it gone (see lock_build)
+    try:
+        lock = open(os.path.join(path, LOCK), "a")
+    except FileNotFoundError:
+        # no lock file (removed by another process, or an in-progress build)
+        return False
+    with lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        if not os.path.basename(path).startswith("tmp_"):
+            aside = tempfile.mkdtemp(prefix="tmp_", dir=cache)
+            try:
+                os.rename(path, aside)
+            except OSError:
+                # removed by another process
+                os.rmdir(aside)
+                return False
+            path = aside
+    shutil.rmtree(path, ignore_errors=True)
+    return True
+
+
+def evict(cache, keep=None):
+    # removes the least recently used builds (directory mtime, updated on
+    # every use) until the cache is at most XGCD_SIM_CACHE_SIZE MB, keep and
+    # builds other processes have loaded (locked) are never removed.
+    # Temporary directories (tmp_*, in-progress builds and replaced builds)
+    # are removed once they are older than XGCD_SIM_TMP_TIMEOUT seconds
+    # (default 86400), which is only the case if the process that made them
+    # was killed (or, for a replaced build, unless it is still locked)
+    max_size = int(os.environ.get("XGCD_SIM_CACHE_SIZE", 4096)) * 2 ** 20
+    tmp_timeout = int(os.environ.get("XGCD_SIM_TMP_TIMEOUT", 86400))
+
+    builds = []
+    for name in os.listdir(cache):
+        path = os.path.join(cache, name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            # removed by another process
+            continue
+        if name.startswith("tmp_"):
+            if time.time() - mtime > tmp_timeout:
+                if os.path.exists(os.path.join(path, LOCK)):
+                    remove_unlocked(cache, path)
+                else:
+                    shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(os.path.join(path, METADATA)):
+            builds.append((mtime, directory_size(path), path))
+
+    size = sum(build_size for (_, build_size, _) in builds)
+    for (_, build_size, path) in sorted(builds):
+        if size <= max_size:
+            break
+        if path != keep and remove_unlocked(cache, path):
+            size -= build_size
+
+
+# compiled simulators for this process, by XGCDConfig
+_sims = {}
+
+# [IterationStats of the done cycles, number of cycle count mismatches] of
+# the vectors run in this process, by (XGCDConfig, constant_time)
+_latency = {}
+
+
+def get_xgcd_sim(config, dw_path=None, rebuild=None):
+    # XGCDSim for config from the build cache, built if there is no build for
+    # its cache_key (or once per process if rebuild, default XGCD_SIM_REBUILD)
+    if rebuild is None:
+        rebuild = os.environ.get("XGCD_SIM_REBUILD", "0") != "0"
+
+    if config not in _sims:
+        cache = cache_directory()
+        os.makedirs(cache, exist_ok=True)
+        build = os.path.join(cache, cache_key(config, dw_path))
+
+        lock = None
+        while lock is None:
+            if rebuild or not os.path.exists(os.path.join(build, METADATA)):
+                # build in a temporary directory in the cache and rename, so other
+                # processes only see complete builds
+                directory = tempfile.mkdtemp(prefix="tmp_", dir=cache)
+                try:
+                    build_xgcd_sim(config, directory, dw_path)
+                    if rebuild:
+                        # the old build is renamed aside (not removed), so a
+                        # process that is loading or running it is not affected,
+                        # evict removes it later
+                        aside = tempfile.mkdtemp(prefix="tmp_", dir=cache)
+                        try:
+                            os.rename(build, aside)
+                        except OSError:
+                            # no old build (or replaced by another process)
+                            os.rmdir(aside)
+                    try:
+                        os.rename(directory, build)
+                    except OSError:
+                        # built by another process in the meantime
+                        pass
+                finally:
+                    shutil.rmtree(directory, ignore_errors=True)
+
+                rebuild = False
+            # None if evict removed the build in the meantime, built again
+            lock = lock_build(build)
+
+        os.utime(build)
+        _sims[config] = load_xgcd_sim(config, build, lock)
+        evict(cache, keep=build)
+
+    return _sims[config]
+
+
+def prepare_vectors(config, vectors):
+    # vectors: (A, B, constant_time) with gcd(A, B) = 1, returns the
+    # functional model results (xgcd_expected, xgcd_timing) for each vector
+    prepared = []
+    for (A, B, constant_time) in vectors:
+        assert constant_time == 0 or config.constant_time_support, \
+            "Must have hardware with constant_time support to enable constant_time configuration"
+        assert math.gcd(A, B) == 1, f"gcd of the inputs must be 1 ({A}, {B})"
+        prepared.append((xgcd_expected(config, A, B, constant_time), xgcd_timing(config, A, B, constant_time)))
+    return prepared
+
+
+def sim_vectors(vectors, prepared):
+    # simulator inputs (XGCDSim.run) for vectors
+    return [(A, B, constant_time, 2 * cycles)
+            for ((A, B, constant_time), ((s, t, cycles, _), timing)) in zip(vectors, prepared)]
+
+
+def check_vectors(config, vectors, prepared, sim_results):
+    # returns a VectorResult per vector from the simulator results
+    results = []
+    for ((A, B, constant_time), ((s, t, cycles, iterations), timing), r) in zip(vectors, prepared, sim_results):
+        passed = r.done == 1 and r.bezout_a == s and r.bezout_b == t
+        if timing_modeled(config):
+            cycles_passed = r.done_cycle == timing.done_cycle and r.total_cycle_count == timing.total_cycle_count
+            expected_done_cycle, expected_total_cycle_count = timing.done_cycle, timing.total_cycle_count
+        else:
+            cycles_passed = True
+            expected_done_cycle, expected_total_cycle_count = None, None
+        result = VectorResult(A, B, constant_time, cycles, s, t,
+                              r.done, r.done_cycle, r.bezout_a, r.bezout_b, r.total_cycle_count, passed,
+                              iterations, expected_done_cycle, expected_total_cycle_count, cycles_passed)
+        latency = _latency.setdefault((config, constant_time), [IterationStats(), 0])
+        # vectors that time out have no done cycle
+        if r.done == 1:
+            latency[0].add(r.done_cycle)
+        latency[1] += not cycles_passed
+        results.append(result)
+    return results
+
+
+def run_vectors(config, vectors, dw_path=None):
+    # vectors: (A, B, constant_time) with gcd(A, B) = 1, runs all vectors
+    # through the compiled simulator for config and returns a VectorResult
+    # per vector
+    sim = get_xgcd_sim(config, dw_path)
+    prepared = prepare_vectors(config, vectors)
+    sim_results = sim.run(sim_vectors(vectors, prepared))
+    return check_vectors(config, vectors, prepared, sim_results)
+
+
+def latency_reports():
+    # LatencyReport of all vectors run in this process, by (XGCDConfig, constant_time)
+    return {(config, constant_time): latency_report(stats, cycle_mismatches, config.bit_length)
+            for (config, constant_time), (stats, cycle_mismatches) in _latency.items() if stats.count}
+
+
+def format_latency_report(config, constant_time, report):
+    return f"{config.bit_length}-bit, reduction factors {config.shift_factor_b}, {config.shift_factor_b_odd}, " \
+           f"constant_time_support {config.constant_time_support}, constant_time {constant_time}" \
+           f"{', deferred_halving' if config.deferred_halving else ''}: " \
+           f"{report.vectors} vectors, done cycle min {report.min} mean {report.mean:.1f} p50 {report.p50} " \
+           f"p99 {report.p99} max {report.max}, {report.cycles_per_bit:.3f} cycles per bit, " \
+           f"{report.cycle_mismatches} cycle count mismatches"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from xgcd.utils.tests_helper.generate_random_inputs import generate_random_inputs
+
+    parser = argparse.ArgumentParser(description="Run random vectors through one compiled XGCDTop configuration")
+    parser.add_argument('--bit_length', type=int, default=255, help="bitwidth for XGCD")
+    parser.add_argument('--num_tests', type=int, default=100, help="number of random input pairs")
+    parser.add_argument('--reduction_factor_even', type=int, default=8, help="reduction factor for even cases")
+    parser.add_argument('--reduction_factor_odd', type=int, default=4, help="reduction factor for odd cases")
+    parser.add_argument('--constant_time_support', default=False, action="store_true", help="(default: False) constant-time XGCD support")
+    parser.add_argument('--constant_time', type=int, default=0, help="constant_time configuration (0 or 1)")
+    parser.add_argument('--deferred_halving', default=False, action="store_true", help="(default: False) deferred-halving Bezout coefficients")
+    parser.add_argument('--rebuild', default=False, action="store_true", help="(default: False) rebuild the simulator even if it is in the build cache")
+    args = parser.parse_args()
+
+    print(args)
+
+    dw_path = os.getenv("DW_PATH")
+    config = XGCDConfig(bit_length=args.bit_length,
+                        shift_factor_a=args.reduction_factor_even,
+                        shift_factor_b=args.reduction_factor_even,
+                        shift_factor_b_odd=args.reduction_factor_odd,
+                        constant_time_support=args.constant_time_support,
+                        use_external=(dw_path is not None),
+                        deferred_halving=args.deferred_halving)
+
+    vectors = []
+    for (A, B) in generate_random_inputs(args.bit_length, True, args.num_tests):
+        gcd = math.gcd(A, B)
+        A, B = A // gcd, B // gcd
+        # edge case -- initial add if one number is even overflows (see xgcd_test_core)
+        if A + B >= 2 ** args.bit_length and (A % 2 == 0 or B % 2 == 0):
+            continue
+        vectors.append((A, B, args.constant_time))
+
+    get_xgcd_sim(config, dw_path, rebuild=args.rebuild)
+    results = run_vectors(config, vectors, dw_path)
+    for r in results:
+        if not r.passed:
+            print(f"FAILED: A {r.A} B {r.B} done {r.done} bezout_a {r.bezout_a} (expected {r.expected_a}) "
+                  f"bezout_b {r.bezout_b} (expected {r.expected_b})")
+        if not r.cycles_passed:
+            print(f"CYCLES: A {r.A} B {r.B} done cycle {r.done_cycle} (expected {r.expected_done_cycle}) "
+                  f"total_cycle_count {r.total_cycle_count} (expected {r.expected_total_cycle_count})")
+    print(f"{sum(r.passed and r.cycles_passed for r in results)} / {len(results)} vectors passed")
+    for (config, constant_time), report in latency_reports().items():
+        print(format_latency_report(config, constant_time, report))
@@ -0,0 +1,246 @@
+import asyncio
+import collections
+import json
+import os
+
+from xgcd.utils.tests_helper.xgcd_sim import XGCDConfig, VectorResult, get_xgcd_sim, prepare_vectors, \
+    sim_vectors, check_vectors, latency_reports, format_latency_report
+
+
+# Persistent simulation server for bulk vector verification
+#
+# AsyncXGCDSim keeps one compiled simulator (xgcd_sim.py) of an XGCDTop
+# configuration running and writes vectors to its stdin / reads results from
+# its stdout, so vectors can be submitted at any time without compiling or
+# starting a simulator. Results come back in the order the vectors were
+# written, so submit calls can overlap: each call queues a future per
+# vector, and one reader task resolves them in order.
+#
+# serve_xgcd_sim makes an AsyncXGCDSim available to other processes on a
+# local (Unix domain) socket, and XGCDSimClient submits batches to it. The
+# protocol is one JSON line per batch each way:
+#
+#     request:  [[A, B, constant_time], ...]
+#     response: {"results": [VectorResult as a dict, ...]} or {"error": "..."}
+#
+# (a request that is not valid JSON or longer than the stream limit is
+# answered with an error) and responses on a connection are in the order of
+# the requests, so a client can have any number of batches in flight.
+
+# asyncio streams limit lines to 64 KiB by default, but a batch of 200
+# 1024-bit vectors is about 125 KB per request and 430 KB per response
+STREAM_LIMIT = 2 ** 30
+
+
+async def read_line(reader):
+    # next line from reader (b"" at EOF); a line longer than the stream limit
+    # is skipped and raises ValueError, so the next line can still be read
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError:
+        pass
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            break
+        except asyncio.IncompleteReadError:
+            break
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+    raise ValueError("Line is longer than the stream limit")
+
+
+class AsyncXGCDSim:
+    # long-lived simulator process for one XGCDConfig (asyncio)
+
+    def __init__(self, config, dw_path=None):
+        self.config = config
+        self.dw_path = dw_path
+        self.sim = None
+        self.process = None
+        # futures of the vectors written to the simulator, in order
+        self.pending = collections.deque()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        # compiles the configuration if it is not in the build cache
+        self.sim = await loop.run_in_executor(None, get_xgcd_sim, self.config, self.dw_path)
+        self.process = await asyncio.create_subprocess_exec(self.sim.binary,
+                                                            stdin=asyncio.subprocess.PIPE,
+                                                            stdout=asyncio.subprocess.PIPE)
+        self.reader = asyncio.ensure_future(self.read_results())
+        return self
+
+    async def read_results(self):
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+            self.pending.popleft().set_result(self.sim.parse(line.decode()))
+        while self.pending:
+            self.pending.popleft().set_exception(RuntimeError("Simulator exited"))
+
+    async def run(self, vectors):
+        # vectors: (A, B, constant_time, timeout), returns a SimResult per
+        # vector
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for v in vectors]
+        # no await between queuing the futures and writing the vectors, so
+        # overlapping calls keep the futures in the simulator's order
+        self.pending.extend(futures)
+        self.process.stdin.write("".join(f"{A:x} {B:x} {constant_time} {timeout}\n"
+                                         for (A, B, constant_time, timeout) in vectors).encode())
+        await self.process.stdin.drain()
+        return await asyncio.gather(*futures)
+
+    async def submit(self, vectors):
+        # vectors: (A, B, constant_time) with gcd(A, B) = 1, returns a
+        # VectorResult per vector (see run_vectors)
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(None, prepare_vectors, self.config, vectors)
+        sim_results = await self.run(sim_vectors(vectors, prepared))
+        return check_vectors(self.config, vectors, prepared, sim_results)
+
+    async def close(self):
+        self.process.stdin.close()
+        await self.process.wait()
+        await self.reader
+
+
+async def serve_xgcd_sim(sim, path, limit=STREAM_LIMIT):
+    # serves an (started) AsyncXGCDSim on the Unix domain socket path, returns
+    # the asyncio server (limit: maximum request line length)
+
+    async def handle(reader, writer):
+        # batches are submitted as soon as they are read, responses are
+        # written in order
+        responses = asyncio.Queue()
+
+        async def write_responses():
+            while True:
+                task = await responses.get()
+                if task is None:
+                    break
+                try:
+                    response = {"results": [r._asdict() for r in await task]}
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        writer_task = asyncio.ensure_future(write_responses())
+        try:
+            while True:
+                try:
+                    line = await read_line(reader)
+                    if not line:
+                        break
+                    vectors = [tuple(v) for v in json.loads(line)]
+                except (ValueError, TypeError) as e:
+                    # malformed or too long request, answered with an error in order
+                    task = asyncio.get_running_loop().create_future()
+                    task.set_exception(e)
+                else:
+                    task = asyncio.ensure_future(sim.submit(vectors))
+                await responses.put(task)
+        finally:
+            await responses.put(None)
+            try:
+                await writer_task
+            finally:
+                writer.close()
+
+    return await asyncio.start_unix_server(handle, path=path, limit=limit)
+
+
+class XGCDSimClient:
+    # client for serve_xgcd_sim (asyncio), batches can overlap
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        # futures of the batches sent, in order
+        self.pending = collections.deque()
+        self.reader_task = asyncio.ensure_future(self.read_responses())
+
+    @classmethod
+    async def connect(cls, path, limit=STREAM_LIMIT):
+        # limit: maximum response line length
+        reader, writer = await asyncio.open_unix_connection(path, limit=limit)
+        return cls(reader, writer)
+
+    async def read_responses(self):
+        while True:
+            try:
+                line = await read_line(self.reader)
+            except ValueError as e:
+                self.pending.popleft().set_exception(RuntimeError(str(e)))
+                continue
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.pending.popleft()
+            if "error" in response:
+                future.set_exception(RuntimeError(response["error"]))
+            else:
+                future.set_result([VectorResult(**r) for r in response["results"]])
+        while self.pending:
+            self.pending.popleft().set_exception(RuntimeError("Server closed the connection"))
+
+    async def submit(self, vectors):
+        # vectors: (A, B, constant_time) with gcd(A, B) = 1, returns a
+        # VectorResult per vector
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(future)
+        self.writer.write((json.dumps([list(v) for v in vectors]) + "\n").encode())
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.reader_task
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulation server for one XGCDTop configuration")
+    parser.add_argument('--socket', default="xgcd_sim.sock", help="path of the Unix domain socket to serve on")
+    parser.add_argument('--bit_length', type=int, default=1024, help="bitwidth for XGCD")
+    parser.add_argument('--reduction_factor_even', type=int, default=8, help="reduction factor for even cases")
+    parser.add_argument('--reduction_factor_odd', type=int, default=4, help="reduction factor for odd cases")
+    parser.add_argument('--constant_time_support', default=False, action="store_true", help="(default: False) constant-time XGCD support")
+    parser.add_argument('--deferred_halving', default=False, action="store_true", help="(default: False) deferred-halving Bezout coefficients")
+    args = parser.parse_args()
+
+    print(args)
+
+    dw_path = os.getenv("DW_PATH")
+    config = XGCDConfig(bit_length=args.bit_length,
+                        shift_factor_a=args.reduction_factor_even,
+                        shift_factor_b=args.reduction_factor_even,
+                        shift_factor_b_odd=args.reduction_factor_odd,
+                        constant_time_support=args.constant_time_support,
+                        use_external=(dw_path is not None),
+                        deferred_halving=args.deferred_halving)
+
+    async def main():
+        sim = await AsyncXGCDSim(config, dw_path).start()
+        server = await serve_xgcd_sim(sim, args.socket)
+        print(f"Serving on {args.socket}")
+        try:
+            await server.serve_forever()
+        finally:
+            server.close()
+            await sim.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        for (config, constant_time), report in latency_reports().items():
+            print(format_latency_report(config, constant_time, report))
+    finally:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
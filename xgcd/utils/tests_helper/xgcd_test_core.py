@@ -1,14 +1,9 @@
-import magma as m
-from magma import *
-import fault
 import tempfile
-import kratos as k
 import math
 import os
 import sys
 
-from xgcd.hardware.extended_gcd.xgcd_top import XGCDTop
-from xgcd.functional_models.xgcd_model import xgcd_model
+from xgcd.utils.tests_helper.xgcd_sim import XGCDConfig, run_vectors, xgcd_expected
 from xgcd.utils.util import *
 import shutil
 
@@ -28,7 +23,16 @@ def xgcd_test_core(bit_length,
                    odd_inputs_only=False,
                    write_cycles_to_csv=False,
                    # use DW01_csa csa module
-                   use_external=True):
+                   use_external=True,
+                   # register widths (default: XGCDTop defaults)
+                   inter_bit_length=None,
+                   delta_bit_width=None,
+                   # deferred-halving Bezout coefficients
+                   deferred_halving=False,
+                   bezout_bit_length=None,
+                   # fail if the done cycle or total_cycle_count differs from
+                   # the control timing model (configurations it models)
+                   check_cycles=True):
 
     assert shift_factor_a == shift_factor_b, "Even reduction factor must be the same for a and b in the functional model."
     assert constant_time == 0 or constant_time == 1, "constant_time configuration must be 0 or 1."
@@ -38,36 +42,6 @@ def xgcd_test_core(bit_length,
     if constant_time == 1:
         assert constant_time_support, "Must have hardware with constant_time support to enable constant_time configuration"
 
-    dut = XGCDTop(bit_length=bit_length,
-                  debug_print=debug_print,
-                  final_clock_factor=final_clock_factor,
-                  start_clock_factor=start_clock_factor,
-                  shift_factor_a=shift_factor_a,
-                  shift_factor_b=shift_factor_b, 
-                  shift_factor_b_odd=shift_factor_b_odd,
-                  constant_time_support=constant_time_support,
-                  DW=use_external)
-
-    magma_dut = k.util.to_magma(dut, flatten_array=True)
-    tester = fault.Tester(magma_dut, magma_dut.clk)
-
-    tester.circuit.clk_en = 1
-    tester.circuit.rst_n = 1
-    tester.circuit.clk = 1
-    tester.step(2)
-    tester.circuit.rst_n = 0
-
-    tester.step(2)
-    tester.circuit.rst_n = 1
-
-    tester.circuit.start = 1
-
-    if constant_time_support:
-        # configuration
-        tester.circuit.constant_time = constant_time
-    else:
-        tester.circuit.constant_time = 0
-
     A, B = abs(A), abs(B)
 
     # ensure gcd is 1 for inputs
@@ -91,6 +65,91 @@ def xgcd_test_core(bit_length,
     if (A + B >= 2 ** bit_length and (A % 2 == 0 or B % 2 == 0)):
         return
 
+    config = XGCDConfig(bit_length=bit_length,
+                        shift_factor_a=shift_factor_a,
+                        shift_factor_b=shift_factor_b,
+                        shift_factor_b_odd=shift_factor_b_odd,
+                        constant_time_support=constant_time_support,
+                        use_external=use_external,
+                        final_clock_factor=final_clock_factor,
+                        start_clock_factor=start_clock_factor,
+                        inter_bit_length=inter_bit_length,
+                        delta_bit_width=delta_bit_width,
+                        deferred_halving=deferred_halving,
+                        bezout_bit_length=bezout_bit_length)
+
+    if not debug_print:
+        # compiled once per hardware configuration (see xgcd_sim.py)
+        result, = run_vectors(config, [(A, B, constant_time)], dw_path)
+
+        if write_cycles_to_csv:
+            # same columns as the fault testbench (cycles stepped from the
+            # functional model), then the measured done cycle, hardware
+            # total_cycle_count and the functional model iterations
+            with open("gcd_cycles.csv", "a") as f:
+                f.write(f"{shift_factor_a}, {shift_factor_b}, {result.cycles}, {A}, {B}, "
+                        f"{result.done_cycle}, {result.total_cycle_count}, {result.iterations}\n")
+
+        assert result.passed, f"XGCD hardware result does not match the functional model for {A}, {B} " \
+                              f"(done {result.done} at cycle {result.done_cycle})"
+        if check_cycles:
+            assert result.cycles_passed, f"XGCD hardware cycles do not match the control timing model for {A}, {B}: " \
+                                         f"done cycle {result.done_cycle} (expected {result.expected_done_cycle}), " \
+                                         f"total_cycle_count {result.total_cycle_count} " \
+                                         f"(expected {result.expected_total_cycle_count})"
+        return
+
+    # fault testbench with waveforms (see Debugging in the README)
+    xgcd_test_core_fault(config, dw_path, A, B, constant_time,
+                         debug_print=debug_print,
+                         write_cycles_to_csv=write_cycles_to_csv)
+
+
+def xgcd_test_core_fault(config,
+                         dw_path,
+                         A,
+                         B,
+                         constant_time,
+                         debug_print=False,
+                         write_cycles_to_csv=False):
+    # generates XGCDTop and compiles and runs a fault testbench for one pair
+    # of inputs (in XGCD_debug with waveforms if debug_print)
+
+    # hardware generation and simulation dependencies are only imported
+    # here, so importing this module (e.g. from test collection) is fast
+    import fault
+    import kratos as k
+    from xgcd.hardware.extended_gcd.xgcd_top import XGCDTop
+
+    dut = XGCDTop(bit_length=config.bit_length,
+                  debug_print=debug_print,
+                  final_clock_factor=config.final_clock_factor,
+                  start_clock_factor=config.start_clock_factor,
+                  shift_factor_a=config.shift_factor_a,
+                  shift_factor_b=config.shift_factor_b,
+                  shift_factor_b_odd=config.shift_factor_b_odd,
+                  constant_time_support=config.constant_time_support,
+                  DW=config.use_external,
+                  inter_bit_length=config.inter_bit_length,
+                  delta_bit_width=config.delta_bit_width,
+                  deferred_halving=config.deferred_halving,
+                  bezout_bit_length=config.bezout_bit_length)
+
+    magma_dut = k.util.to_magma(dut, flatten_array=True)
+    tester = fault.Tester(magma_dut, magma_dut.clk)
+
+    tester.circuit.clk_en = 1
+    tester.circuit.rst_n = 1
+    tester.circuit.clk = 1
+    tester.step(2)
+    tester.circuit.rst_n = 0
+
+    tester.step(2)
+    tester.circuit.rst_n = 1
+
+    tester.circuit.start = 1
+    tester.circuit.constant_time = constant_time
+
     tester.circuit.A = A
     tester.circuit.B = B
 
@@ -98,32 +157,18 @@ def xgcd_test_core(bit_length,
     # from functional model and expected results
     # for bezout coefficients
     print("Using our functional model")
-    gcd, s, t, cycles, _, = \
-        xgcd_model(a=A, 
-                    b=B, 
-                    bit_length=bit_length,
-                    constant_time=(constant_time == 1),
-                    reduction_factor_even=shift_factor_b,
-                    reduction_factor_odd=shift_factor_b_odd,
-                    debug_print=debug_print)
-
-    print_debug(debug_print, "INPUTS: ", A, B, gcd)
-
-    # - this is conservative, not all will require final_clock_factor * 2 cycles
-    # - + 4 for extra cycle spillover due to running termination condition at a 
-    # slower clock frequency
-    gcd_cycles = cycles + start_clock_factor * 2 + final_clock_factor * 2 + 4
+    s, t, gcd_cycles, _ = xgcd_expected(config, A, B, constant_time)
 
     for i in range(gcd_cycles):
         tester.step(2)
         tester.circuit.start = 0
 
     print_debug(debug_print, "EXPECTED: ", gcd_cycles, s, t)
-    print_debug(debug_print, "Reduction factors: ", shift_factor_a, shift_factor_b, shift_factor_b_odd)
+    print_debug(debug_print, "Reduction factors: ", config.shift_factor_a, config.shift_factor_b, config.shift_factor_b_odd)
 
     if write_cycles_to_csv:
         with open("gcd_cycles.csv", "a") as f:
-            f.write(f"{shift_factor_a}, {shift_factor_b}, {gcd_cycles}, {A}, {B}\n")
+            f.write(f"{config.shift_factor_a}, {config.shift_factor_b}, {gcd_cycles}, {A}, {B}\n")
 
     tester.circuit.done.expect(1)
     tester.circuit.bezout_a.expect(s)
@@ -137,7 +182,7 @@ def xgcd_test_core(bit_length,
             tempdir = "XGCD_debug"
             flags = ["-Wno-fatal", "--trace"]
 
-        if not use_external:
+        if not config.use_external:
             print("Using handwritten CSA module for test.")
         else:
             print("Using DesignWare CSA module for test.")